@@ -33,14 +33,15 @@ class AxisAlignedBoundingBox(object):
             self.expand_by(other.min_point)
             self.expand_by(other.max_point)
         elif isinstance(other, PointCloud):
-            for point in other.point_list:
-                self.expand_by(point)
+            for chunk in other.yield_chunks():
+                self.expand_by(Vector(*chunk.min(axis=0).tolist()))
+                self.expand_by(Vector(*chunk.max(axis=0).tolist()))
         elif isinstance(other, Triangle):
             self.expand_by(other.point_a)
             self.expand_by(other.point_b)
             self.expand_by(other.point_c)
         elif isinstance(other, TriangleMesh):
-            for triangle in other.yield_triangles():
+            for triangle in other.yield_triangles(copy=False):
                 self.expand_by(triangle)
         elif type(other) is list:
             for thing in other:
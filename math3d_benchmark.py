@@ -0,0 +1,104 @@
+# math3d_benchmark.py
+
+import math
+import time
+import tracemalloc
+
+from math3d_triangle_mesh import TriangleMesh, Polyhedron
+from math3d_triangle import Triangle
+from math3d_vector import Vector
+from math3d_sphere import Sphere
+from math3d_plane import Plane
+from math3d_side import Side
+
+def measure(func, *args, **kwargs):
+    # Run the given function, returning its result along with the elapsed time and peak traced memory.
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def benchmark_memory_per_object(count=100000):
+    print('Memory per object (averaged over %d instances):' % count)
+    def make_vectors():
+        return [Vector(float(i), 0.0, 0.0) for i in range(count)]
+    def make_triangles():
+        return [Triangle(Vector(float(i), 0.0, 0.0), Vector(0.0, 1.0, 0.0), Vector(0.0, 0.0, 1.0), copy=False) for i in range(count)]
+    def make_planes():
+        return [Plane(Vector(float(i), 0.0, 0.0), Vector(0.0, 0.0, 1.0), copy=False) for i in range(count)]
+    for name, func in [('Vector', make_vectors), ('Triangle', make_triangles), ('Plane', make_planes)]:
+        result, elapsed, peak = measure(func)
+        print('    %-10s %8.1f bytes %8.3f sec' % (name, float(peak) / float(count), elapsed))
+
+def make_split_meshes(subdivision_level=2):
+    # These are the same meshes that math3d_test.py splits.
+    tri_mesh_a = TriangleMesh.make_polyhedron(Polyhedron.HEXAHEDRON)
+    radius = (Vector(math.sqrt(2.0), math.sqrt(2.0), 0.0) - Vector(0.0, 1.0, 0.0)).length()
+    tri_mesh_b = Sphere(Vector(math.sqrt(2.0), math.sqrt(2.0), 0.0), radius).make_mesh(subdivision_level=subdivision_level)
+    return tri_mesh_a, tri_mesh_b
+
+def benchmark_split_against_plane(count=2000):
+    print('Triangle.split_against_plane (%d triangles):' % count)
+    plane = Plane(Vector(0.0, 0.0, 0.0), Vector(1.0, 1.0, 1.0))
+    triangle_list = [Triangle(Vector(-1.0, 0.0, 0.0), Vector(1.0, float(i) / float(count), 0.0), Vector(0.0, 0.0, 1.0)) for i in range(count)]
+    def split_all():
+        return [triangle.split_against_plane(plane) for triangle in triangle_list]
+    result, elapsed, peak = measure(split_all)
+    print('    %8.3f sec, peak %d bytes' % (elapsed, peak))
+
+def legacy_split_against_mesh(tri_mesh_a, tri_mesh_b):
+    # This is TriangleMesh.split_against_mesh as it was before it was given a broad-phase, kept here for comparison.
+    back_mesh_list = []
+    front_mesh_list = []
+    triangle_list = tri_mesh_a.to_triangle_list()
+    while len(triangle_list) > 0:
+        triangle = triangle_list.pop(0)
+        side_list = [tri_mesh_b.side(triangle[i]) for i in range(3)]
+        if all([side == Side.BACK for side in side_list]):
+            back_mesh_list.append(triangle)
+        else:
+            for cutting_triangle in tri_mesh_b.yield_triangles(copy=False):
+                result = triangle.intersect_with(cutting_triangle)
+                if result is not None:
+                    cutting_plane = cutting_triangle.calc_plane()
+                    back_list, front_list = triangle.split_against_plane(cutting_plane)
+                    if len(back_list) > 0 and len(front_list) > 0:
+                        triangle_list += back_list + front_list
+                        break
+            else:
+                front_mesh_list.append(triangle)
+    return TriangleMesh().from_triangle_list(back_mesh_list), TriangleMesh().from_triangle_list(front_mesh_list)
+
+def calc_mesh_area(tri_mesh):
+    return sum([triangle.area() for triangle in tri_mesh.yield_triangles(copy=False)])
+
+def benchmark_split_against_mesh(subdivision_level=1, include_legacy=True):
+    print('TriangleMesh.split_against_mesh (sphere subdivision level %d):' % subdivision_level)
+    tri_mesh_a, tri_mesh_b = make_split_meshes(subdivision_level)
+    func_list = [('current', tri_mesh_a.split_against_mesh)]
+    if include_legacy:
+        func_list.append(('legacy', lambda tri_mesh: legacy_split_against_mesh(tri_mesh_a, tri_mesh)))
+    for name, func in func_list:
+        (back_mesh, front_mesh), elapsed, peak = measure(func, tri_mesh_b)
+        print('    %-8s %8.3f sec, peak %d bytes, %d back and %d front triangles, back area %.6f, front area %.6f' % (
+            name, elapsed, peak, len(back_mesh.triangle_list), len(front_mesh.triangle_list), calc_mesh_area(back_mesh), calc_mesh_area(front_mesh)))
+
+def benchmark_parallel_split_against_mesh(subdivision_level=4, worker_count_list=(1, 2, 4, 8)):
+    # Here the sphere is cut by the cube, so that there are many source triangles to divide among the workers.
+    print('TriangleMesh.split_against_mesh in parallel (sphere subdivision level %d):' % subdivision_level)
+    tri_mesh_a, tri_mesh_b = make_split_meshes(subdivision_level)
+    for worker_count in worker_count_list:
+        start = time.perf_counter()
+        back_mesh, front_mesh = tri_mesh_b.split_against_mesh(tri_mesh_a, worker_count=worker_count)
+        elapsed = time.perf_counter() - start
+        print('    %2d workers %8.3f sec, %d back and %d front triangles' % (worker_count, elapsed, len(back_mesh.triangle_list), len(front_mesh.triangle_list)))
+
+if __name__ == '__main__':
+    benchmark_memory_per_object()
+    benchmark_split_against_plane()
+    for subdivision_level in range(1, 4):
+        benchmark_split_against_mesh(subdivision_level, include_legacy=subdivision_level < 3)
+    benchmark_parallel_split_against_mesh()
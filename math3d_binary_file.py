@@ -0,0 +1,133 @@
+# math3d_binary_file.py
+
+import struct
+import numpy
+
+from math3d_vector_array import VectorArray
+
+class BinaryFileKind:
+    POINT_CLOUD = 0
+    TRIANGLE_MESH = 1
+
+class BinaryFile(object):
+    # A compact binary file holding the vertices of a point-cloud or mesh, and the triangles of a mesh.
+    # The layout is a fixed 32-byte header followed by two contiguous, little-endian blocks:
+    #
+    #   offset  size  contents
+    #   0       4     the magic number b'M3DB'
+    #   4       2     the format version (1)
+    #   6       1     the kind of file (a BinaryFileKind value)
+    #   7       1     the size of a vertex coordinate in bytes (4 for float32, 8 for float64)
+    #   8       8     the vertex count V
+    #   16      8     the triangle count T
+    #   24      8     reserved (zero)
+    #   32            the V x 3 vertex block, followed by the T x 3 block of int32 vertex offsets
+    #
+    # The blocks are opened with numpy.memmap, so opening even a very large file is instant, and its pages
+    # are only read as they're touched.  Nothing is copied out of the file until asked for.
+
+    MAGIC = b'M3DB'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHBBQQQ')
+
+    def __init__(self, path=None, mode='r'):
+        self.path = None
+        self.mode = mode
+        self.kind = None
+        self.vertex_array = None
+        self.index_array = None
+        if path is not None:
+            self.open(path, mode)
+
+    def open(self, path, mode='r'):
+        # The mode is that of numpy.memmap; 'r+' lets the blocks be changed in place, and 'c' copy-on-write.
+        with open(path, 'rb') as handle:
+            header = handle.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+            raise Exception('The file is too short to be a binary mesh file.')
+        magic, version, kind, coordinate_size, vertex_count, triangle_count, reserved = self.HEADER.unpack(header)
+        if magic != self.MAGIC:
+            raise Exception('The file is not a binary mesh file.')
+        if version != self.VERSION:
+            raise Exception('Unsupported binary mesh file version: %d' % version)
+        if coordinate_size not in (4, 8):
+            raise Exception('Unsupported coordinate size: %d' % coordinate_size)
+        self.path = path
+        self.mode = mode
+        self.kind = kind
+        vertex_dtype = numpy.dtype('<f4') if coordinate_size == 4 else numpy.dtype('<f8')
+        offset = self.HEADER.size
+        self.vertex_array = self._map(path, vertex_dtype, offset, vertex_count, mode)
+        offset += vertex_count * 3 * vertex_dtype.itemsize
+        self.index_array = self._map(path, numpy.dtype('<i4'), offset, triangle_count, mode)
+        return self
+
+    @staticmethod
+    def _map(path, dtype, offset, count, mode='r'):
+        # numpy.memmap can't map an empty block, so we hand back an empty array instead.
+        if count == 0:
+            return numpy.zeros((0, 3), dtype=dtype)
+        return numpy.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(count, 3))
+
+    @staticmethod
+    def write(path, vertex_array, index_array=None, kind=None, single_precision=False):
+        # Write the given V x 3 vertex array, and T x 3 index array if given, to the given path.
+        # The blocks are written straight from the arrays, without building the file in memory.
+        vertex_dtype = numpy.dtype('<f4') if single_precision else numpy.dtype('<f8')
+        vertex_array = numpy.asarray(vertex_array).reshape(-1, 3)
+        index_array = numpy.asarray(index_array if index_array is not None else numpy.zeros((0, 3)), dtype=numpy.int64).reshape(-1, 3)
+        if len(vertex_array) > 0x7fffffff:
+            raise Exception('Too many vertices for 32-bit vertex offsets.')
+        if kind is None:
+            kind = BinaryFileKind.TRIANGLE_MESH if len(index_array) > 0 else BinaryFileKind.POINT_CLOUD
+        header = BinaryFile.HEADER.pack(BinaryFile.MAGIC, BinaryFile.VERSION, kind, vertex_dtype.itemsize, len(vertex_array), len(index_array), 0)
+        with open(path, 'wb') as handle:
+            handle.write(header)
+            numpy.ascontiguousarray(vertex_array, dtype=vertex_dtype).tofile(handle)
+            numpy.ascontiguousarray(index_array, dtype=numpy.dtype('<i4')).tofile(handle)
+
+    @staticmethod
+    def write_chunks(path, chunk_iter, kind=BinaryFileKind.POINT_CLOUD, single_precision=False):
+        # Write the vertices given as a sequence of N x 3 arrays to the given path, one array at a time, so that
+        # a point-cloud too big for memory can be written out.  The vertex count goes into the header at the end.
+        vertex_dtype = numpy.dtype('<f4') if single_precision else numpy.dtype('<f8')
+        vertex_count = 0
+        with open(path, 'wb') as handle:
+            handle.write(BinaryFile.HEADER.pack(BinaryFile.MAGIC, BinaryFile.VERSION, kind, vertex_dtype.itemsize, 0, 0, 0))
+            for chunk in chunk_iter:
+                chunk = numpy.ascontiguousarray(numpy.asarray(chunk).reshape(-1, 3), dtype=vertex_dtype)
+                chunk.tofile(handle)
+                vertex_count += len(chunk)
+            handle.seek(0)
+            handle.write(BinaryFile.HEADER.pack(BinaryFile.MAGIC, BinaryFile.VERSION, kind, vertex_dtype.itemsize, vertex_count, 0, 0))
+
+    @staticmethod
+    def write_dict(path, data, single_precision=False):
+        # Write the to_dict representation of a TriangleMesh (or of a PointCloud) to the given path.
+        if 'point_list' in data:
+            vertex_list = data.get('point_list', [])
+            kind = BinaryFileKind.POINT_CLOUD
+        else:
+            vertex_list = data.get('vertex_list', [])
+            kind = BinaryFileKind.TRIANGLE_MESH
+        vertex_array = numpy.array([(vertex.get('x', 0.0), vertex.get('y', 0.0), vertex.get('z', 0.0)) for vertex in vertex_list], dtype=numpy.float64)
+        index_array = numpy.array([(triple[0], triple[1], triple[2]) for triple in data.get('triangle_list', [])], dtype=numpy.int64)
+        BinaryFile.write(path, vertex_array, index_array, kind, single_precision)
+
+    def to_dict(self):
+        # This is what to_dict gives for the TriangleMesh (or PointCloud) stored in the file.
+        vertex_list = [{'x': x, 'y': y, 'z': z} for x, y, z in self.vertex_array.tolist()]
+        if self.kind == BinaryFileKind.POINT_CLOUD:
+            return {'point_list': vertex_list}
+        return {
+            'vertex_list': vertex_list,
+            'triangle_list': [(i, j, k) for i, j, k in self.index_array.tolist()]
+        }
+
+    def to_triangle_mesh(self):
+        from math3d_triangle_mesh import TriangleMesh
+        return TriangleMesh().from_arrays(self.vertex_array, self.index_array)
+
+    def to_point_cloud(self):
+        from math3d_point_cloud import PointCloud
+        return PointCloud(VectorArray(self.vertex_array).to_vector_list())
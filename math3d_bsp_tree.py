@@ -1,6 +1,167 @@
 # math3d_bsp_tree.py
 
+import random
+
+from math3d_side import Side
+
+class BspHeuristic:
+    FIRST = 0           # Split on the first remaining triangle.
+    RANDOM = 1          # Split on a randomly chosen triangle.
+    LEAST_SPLITS = 2    # Split on the sampled triangle whose plane cuts the fewest others.
+    BALANCED = 3        # Like LEAST_SPLITS, but also favor an even number of triangles on each side.
+
+class BspNode(object):
+    # An interior node of the tree.  A missing back child is a solid (inside) leaf,
+    # and a missing front child is an empty (outside) leaf.
+    __slots__ = ('plane', 'back', 'front', 'triangle_list')
+
+    def __init__(self, plane):
+        self.plane = plane
+        self.back = None
+        self.front = None
+        self.triangle_list = []
+
 class BspTree(object):
-    def __init__(self):
-        pass
+    # A solid-leaf BSP tree built from the triangles of a closed mesh whose triangles
+    # are wound CCW as seen from outside.  Unlike TriangleMesh.side, the mesh need not
+    # be convex.  Each node partitions space by the plane of one of the triangles, and
+    # the triangles co-planar with that plane are kept at the node.
+
+    def __init__(self, tri_mesh=None, heuristic=BspHeuristic.BALANCED, sample_size=8, eps=1e-7):
+        self.root = None
+        self.heuristic = heuristic
+        self.sample_size = sample_size
+        self.eps = eps
+        if tri_mesh is not None:
+            self.build(tri_mesh)
+
+    def build(self, tri_mesh):
+        triangle_list = [triangle for triangle in tri_mesh.yield_triangles() if triangle.area() >= self.eps]
+        self.root = None
+        if len(triangle_list) == 0:
+            return self
+        stack = [(None, None, triangle_list)]
+        while len(stack) > 0:
+            parent, side, triangle_list = stack.pop()
+            splitter = self._choose_splitter(triangle_list)
+            node = BspNode(splitter.calc_plane())
+            if parent is None:
+                self.root = node
+            elif side == Side.BACK:
+                parent.back = node
+            else:
+                parent.front = node
+            back_list = []
+            front_list = []
+            for triangle in triangle_list:
+                if triangle is splitter or self._is_co_planar(triangle, node.plane, self.eps):
+                    node.triangle_list.append(triangle)
+                else:
+                    back_pieces, front_pieces = triangle.split_against_plane(node.plane, self.eps)
+                    back_list += back_pieces
+                    front_list += front_pieces
+            if len(back_list) > 0:
+                stack.append((node, Side.BACK, back_list))
+            if len(front_list) > 0:
+                stack.append((node, Side.FRONT, front_list))
+        return self
+
+    def _is_co_planar(self, triangle, plane, eps=1e-7):
+        return all([plane.side(triangle[i], eps) == Side.NEITHER for i in range(3)])
+
+    def _choose_splitter(self, triangle_list):
+        if self.heuristic == BspHeuristic.FIRST or len(triangle_list) == 1:
+            return triangle_list[0]
+        if self.heuristic == BspHeuristic.RANDOM:
+            return random.choice(triangle_list)
+        if len(triangle_list) <= self.sample_size:
+            candidate_list = triangle_list
+        else:
+            candidate_list = random.sample(triangle_list, self.sample_size)
+        best_score = None
+        best_candidate = None
+        for candidate in candidate_list:
+            plane = candidate.calc_plane()
+            split_count = 0
+            back_count = 0
+            front_count = 0
+            for triangle in triangle_list:
+                side_list = [plane.side(triangle[i], self.eps) for i in range(3)]
+                if Side.BACK in side_list and Side.FRONT in side_list:
+                    split_count += 1
+                elif Side.BACK in side_list:
+                    back_count += 1
+                elif Side.FRONT in side_list:
+                    front_count += 1
+            score = split_count
+            if self.heuristic == BspHeuristic.BALANCED:
+                score = 8 * split_count + abs(front_count - back_count)
+            if best_score is None or score < best_score:
+                best_score = score
+                best_candidate = candidate
+        return best_candidate
+
+    def side(self, point, eps=1e-7):
+        # Tell us whether the given point is inside (BACK), outside (FRONT) or on (NEITHER) the solid.
+        # This is O(depth), unless the point lies on a splitting plane, in which case we must look
+        # down both sides of it; the point is on the surface if the two sides disagree.
+        return self._point_side(self.root, Side.FRONT, point, eps)
+
+    def _point_side(self, node, leaf_side, point, eps):
+        while node is not None:
+            side = node.plane.side(point, eps)
+            if side == Side.BACK:
+                node, leaf_side = node.back, Side.BACK
+            elif side == Side.FRONT:
+                node, leaf_side = node.front, Side.FRONT
+            else:
+                back_side = self._point_side(node.back, Side.BACK, point, eps)
+                front_side = self._point_side(node.front, Side.FRONT, point, eps)
+                return back_side if back_side == front_side else Side.NEITHER
+        return leaf_side
+
+    def contains_point(self, point, eps=1e-7):
+        return self.side(point, eps) != Side.FRONT
+
+    def split_triangle_list(self, triangle_list, eps=1e-7):
+        # Cut the given triangles up along the surface of the solid, and return the pieces inside
+        # it and the pieces outside it.  As with TriangleMesh.side, pieces lying on the surface are
+        # considered inside.  We do this by pushing each triangle down the tree, splitting it at each
+        # node whose plane crosses it.  Pieces co-planar with a node's plane go down the back side,
+        # where the rest of the tree decides whether they lie on the surface or beyond it.
+        back_list = []
+        front_list = []
+        stack = [(self.root, Side.FRONT, triangle_list)]
+        while len(stack) > 0:
+            node, leaf_side, triangle_list = stack.pop()
+            if node is None:
+                if leaf_side == Side.BACK:
+                    back_list += triangle_list
+                else:
+                    front_list += triangle_list
+                continue
+            node_back_list = []
+            node_front_list = []
+            for triangle in triangle_list:
+                if self._is_co_planar(triangle, node.plane, eps):
+                    node_back_list.append(triangle)
+                else:
+                    back_pieces, front_pieces = triangle.split_against_plane(node.plane, eps)
+                    node_back_list += back_pieces
+                    node_front_list += front_pieces
+            if len(node_back_list) > 0:
+                stack.append((node.back, Side.BACK, node_back_list))
+            if len(node_front_list) > 0:
+                stack.append((node.front, Side.FRONT, node_front_list))
+        return back_list, front_list
 
+    def calc_depth(self):
+        depth = 0
+        stack = [(self.root, 1)] if self.root is not None else []
+        while len(stack) > 0:
+            node, node_depth = stack.pop()
+            depth = max(depth, node_depth)
+            for child in [node.back, node.front]:
+                if child is not None:
+                    stack.append((child, node_depth + 1))
+        return depth
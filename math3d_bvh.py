@@ -0,0 +1,377 @@
+# math3d_bvh.py
+
+import math
+import numpy
+
+from math3d_vector import Vector
+from math3d_triangle import Triangle
+from math3d_aabb import AxisAlignedBoundingBox
+
+def closest_point_on_triangle(point, point_a, point_b, point_c):
+    # Given points as (x, y, z) tuples, return the point of triangle ABC nearest the given point.
+    # This works out which Voronoi region of the triangle (vertex, edge or face) the point lies in.
+    # See "Real-Time Collision Detection" by Christer Ericson, section 5.1.5.
+    def sub(u, v):
+        return (u[0] - v[0], u[1] - v[1], u[2] - v[2])
+    def dot(u, v):
+        return u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
+    def lerp(u, v, t):
+        return (u[0] + (v[0] - u[0]) * t, u[1] + (v[1] - u[1]) * t, u[2] + (v[2] - u[2]) * t)
+    ab = sub(point_b, point_a)
+    ac = sub(point_c, point_a)
+    ap = sub(point, point_a)
+    d1 = dot(ab, ap)
+    d2 = dot(ac, ap)
+    if d1 <= 0.0 and d2 <= 0.0:
+        return point_a
+    bp = sub(point, point_b)
+    d3 = dot(ab, bp)
+    d4 = dot(ac, bp)
+    if d3 >= 0.0 and d4 <= d3:
+        return point_b
+    vc = d1 * d4 - d3 * d2
+    if vc <= 0.0 and d1 >= 0.0 and d3 <= 0.0:
+        return lerp(point_a, point_b, d1 / (d1 - d3))
+    cp = sub(point, point_c)
+    d5 = dot(ab, cp)
+    d6 = dot(ac, cp)
+    if d6 >= 0.0 and d5 <= d6:
+        return point_c
+    vb = d5 * d2 - d1 * d6
+    if vb <= 0.0 and d2 >= 0.0 and d6 <= 0.0:
+        return lerp(point_a, point_c, d2 / (d2 - d6))
+    va = d3 * d6 - d5 * d4
+    if va <= 0.0 and (d4 - d3) >= 0.0 and (d5 - d6) >= 0.0:
+        return lerp(point_b, point_c, (d4 - d3) / ((d4 - d3) + (d5 - d6)))
+    denom = va + vb + vc
+    if denom == 0.0:
+        return point_a  # The triangle is degenerate.
+    v = vb / denom
+    w = vc / denom
+    return (point_a[0] + ab[0] * v + ac[0] * w, point_a[1] + ab[1] * v + ac[1] * w, point_a[2] + ab[2] * v + ac[2] * w)
+
+class BoundingVolumeHierarchy(object):
+    # A binary tree of axis-aligned boxes over the triangles of a mesh, stored as flat arrays.
+    # Node 0 is the root.  For node i, node_min[i] and node_max[i] bound everything beneath it.
+    # A leaf has node_count[i] > 0 and owns the triangles triangle_order[node_start[i]:node_start[i] + node_count[i]].
+    # An interior node has node_count[i] == 0, and its children are nodes node_start[i] and node_start[i] + 1.
+    # The tree is built top-down, splitting each node where the surface area heuristic (SAH),
+    # evaluated over a fixed number of bins along each axis, says it is cheapest to do so.
+
+    def __init__(self, tri_mesh=None, bin_count=12, max_leaf_size=4):
+        self.bin_count = bin_count
+        self.max_leaf_size = max_leaf_size
+        self.index_array = None
+        self.vertex_array = None
+        if tri_mesh is not None:
+            self.build(tri_mesh)
+
+    def _calc_triangle_bounds(self):
+        corner_array = self.vertex_array[self.index_array]
+        self.triangle_min = corner_array.min(axis=1)
+        self.triangle_max = corner_array.max(axis=1)
+
+    def calc_triangle_aabb(self, i):
+        return AxisAlignedBoundingBox(Vector(*self.triangle_min[i].tolist()), Vector(*self.triangle_max[i].tolist()))
+
+    def calc_node_aabb(self, i):
+        return AxisAlignedBoundingBox(Vector(*self.node_min[i].tolist()), Vector(*self.node_max[i].tolist()))
+
+    @staticmethod
+    def _half_area(box_min, box_max):
+        extent = numpy.maximum(box_max - box_min, 0.0)
+        return extent[..., 0] * extent[..., 1] + extent[..., 1] * extent[..., 2] + extent[..., 2] * extent[..., 0]
+
+    def build(self, tri_mesh):
+        self.vertex_array, self.index_array = tri_mesh.to_arrays()
+        self._calc_triangle_bounds()
+        triangle_count = len(self.index_array)
+        centroid_array = (self.triangle_min + self.triangle_max) * 0.5
+        self.triangle_order = numpy.arange(triangle_count, dtype=numpy.int64)
+
+        node_min_list = []
+        node_max_list = []
+        node_start_list = []
+        node_count_list = []
+        def add_node():
+            node_min_list.append(None)
+            node_max_list.append(None)
+            node_start_list.append(0)
+            node_count_list.append(0)
+            return len(node_start_list) - 1
+
+        stack = [(add_node(), 0, triangle_count)] if triangle_count > 0 else []
+        while len(stack) > 0:
+            node, start, end = stack.pop()
+            order = self.triangle_order[start:end]
+            box_min = self.triangle_min[order].min(axis=0)
+            box_max = self.triangle_max[order].max(axis=0)
+            node_min_list[node] = box_min
+            node_max_list[node] = box_max
+            split = self._find_split(order, centroid_array[order], box_min, box_max)
+            if split is None:
+                node_start_list[node] = start
+                node_count_list[node] = end - start
+                continue
+            left_mask = split
+            self.triangle_order[start:end] = numpy.concatenate([order[left_mask], order[~left_mask]])
+            middle = start + int(numpy.count_nonzero(left_mask))
+            left_child = add_node()
+            right_child = add_node()
+            node_start_list[node] = left_child
+            stack.append((right_child, middle, end))
+            stack.append((left_child, start, middle))
+
+        self.node_min = numpy.array(node_min_list, dtype=numpy.float64).reshape(-1, 3)
+        self.node_max = numpy.array(node_max_list, dtype=numpy.float64).reshape(-1, 3)
+        self.node_start = numpy.array(node_start_list, dtype=numpy.int64)
+        self.node_count = numpy.array(node_count_list, dtype=numpy.int64)
+        self._calc_node_depth()
+        self._update_node_lists()
+        return self
+
+    def _find_split(self, order, centroid_array, box_min, box_max):
+        # Return a mask selecting the triangles to go left, or None if the node should be a leaf.
+        # Nodes of at most max_leaf_size triangles are always leaves; larger ones are always split.
+        count = len(order)
+        if count <= self.max_leaf_size:
+            return None
+        centroid_min = centroid_array.min(axis=0)
+        centroid_max = centroid_array.max(axis=0)
+        # All three axes are binned at once; bins[k, b] holds the triangles in bin b along axis k.
+        bin_total = self.bin_count
+        extent = centroid_max - centroid_min
+        scale = numpy.where(extent > 0.0, bin_total / numpy.where(extent > 0.0, extent, 1.0), 0.0)
+        bin_array = ((centroid_array - centroid_min) * scale).astype(numpy.int64)
+        numpy.clip(bin_array, 0, bin_total - 1, out=bin_array)
+        flat_array = (bin_array + numpy.arange(3) * bin_total).T.ravel()
+        bin_count = numpy.bincount(flat_array, minlength=3 * bin_total).reshape(3, bin_total)
+        bin_min = numpy.full((3 * bin_total, 3), numpy.inf)
+        bin_max = numpy.full((3 * bin_total, 3), -numpy.inf)
+        numpy.minimum.at(bin_min, flat_array, numpy.tile(self.triangle_min[order], (3, 1)))
+        numpy.maximum.at(bin_max, flat_array, numpy.tile(self.triangle_max[order], (3, 1)))
+        bin_min = bin_min.reshape(3, bin_total, 3)
+        bin_max = bin_max.reshape(3, bin_total, 3)
+        left_area = self._half_area(numpy.minimum.accumulate(bin_min, axis=1)[:, :-1], numpy.maximum.accumulate(bin_max, axis=1)[:, :-1])
+        right_area = self._half_area(numpy.minimum.accumulate(bin_min[:, ::-1], axis=1)[:, ::-1][:, 1:], numpy.maximum.accumulate(bin_max[:, ::-1], axis=1)[:, ::-1][:, 1:])
+        left_count = numpy.cumsum(bin_count, axis=1)[:, :-1]
+        right_count = count - left_count
+        cost = left_count * left_area + right_count * right_area
+        cost[(left_count == 0) | (right_count == 0)] = numpy.inf
+        axis, i = numpy.unravel_index(int(numpy.argmin(cost)), cost.shape)
+        if not numpy.isfinite(cost[axis, i]):
+            # The centroids all coincide, so no binning can separate them.  Just halve the list.
+            mask = numpy.zeros(count, dtype=bool)
+            mask[:count // 2] = True
+            return mask
+        return bin_array[:, axis] <= i
+
+    def _calc_node_depth(self):
+        self.node_depth = numpy.zeros(len(self.node_start), dtype=numpy.int64)
+        for node in range(len(self.node_start)):
+            if self.node_count[node] == 0:
+                child = self.node_start[node]
+                self.node_depth[child] = self.node_depth[child + 1] = self.node_depth[node] + 1
+
+    def _update_node_lists(self):
+        # Traversal is done in plain Python, where lists are much faster to index than numpy arrays.
+        self._node_list = list(zip(self.node_min.tolist(), self.node_max.tolist(), self.node_start.tolist(), self.node_count.tolist()))
+        self._order_list = self.triangle_order.tolist()
+        self._corner_list = self.vertex_array[self.index_array].tolist()
+
+    def refit(self, tri_mesh=None):
+        # Recompute all of the boxes for the current vertex positions, keeping the tree structure.
+        # This is what to do after the mesh has been animated or transformed, but not re-triangulated.
+        if tri_mesh is not None:
+            self.vertex_array, index_array = tri_mesh.to_arrays()
+            assert(index_array.shape == self.index_array.shape)
+            self.index_array = index_array
+        self._calc_triangle_bounds()
+        leaf_array = numpy.nonzero(self.node_count > 0)[0]
+        for node in leaf_array.tolist():
+            order = self.triangle_order[self.node_start[node]:self.node_start[node] + self.node_count[node]]
+            self.node_min[node] = self.triangle_min[order].min(axis=0)
+            self.node_max[node] = self.triangle_max[order].max(axis=0)
+        for depth in range(int(self.node_depth.max(initial=0)), -1, -1):
+            interior_array = numpy.nonzero((self.node_depth == depth) & (self.node_count == 0))[0]
+            child_array = self.node_start[interior_array]
+            self.node_min[interior_array] = numpy.minimum(self.node_min[child_array], self.node_min[child_array + 1])
+            self.node_max[interior_array] = numpy.maximum(self.node_max[child_array], self.node_max[child_array + 1])
+        self._update_node_lists()
+        return self
+
+    @staticmethod
+    def _ray_box_distance(origin, inverse_direction, box_min, box_max, max_distance):
+        # Return the distance along the ray to where it enters the box, or None if it misses.
+        t_near = 0.0
+        t_far = max_distance
+        for k in range(3):
+            if inverse_direction[k] is None:
+                if origin[k] < box_min[k] or origin[k] > box_max[k]:
+                    return None
+                continue
+            t0 = (box_min[k] - origin[k]) * inverse_direction[k]
+            t1 = (box_max[k] - origin[k]) * inverse_direction[k]
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > t_near:
+                t_near = t0
+            if t1 < t_far:
+                t_far = t1
+            if t_near > t_far:
+                return None
+        return t_near
+
+    @staticmethod
+    def _ray_triangle_distance(origin, direction, corner_list, eps):
+        # This is the Moller-Trumbore test.  Both sides of the triangle count as a hit.
+        a, b, c = corner_list
+        e1 = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+        e2 = (c[0] - a[0], c[1] - a[1], c[2] - a[2])
+        p = (direction[1] * e2[2] - direction[2] * e2[1], direction[2] * e2[0] - direction[0] * e2[2], direction[0] * e2[1] - direction[1] * e2[0])
+        det = e1[0] * p[0] + e1[1] * p[1] + e1[2] * p[2]
+        if math.fabs(det) < 1e-300:
+            return None
+        inverse_det = 1.0 / det
+        s = (origin[0] - a[0], origin[1] - a[1], origin[2] - a[2])
+        u = (s[0] * p[0] + s[1] * p[1] + s[2] * p[2]) * inverse_det
+        if u < -eps or u > 1.0 + eps:
+            return None
+        q = (s[1] * e1[2] - s[2] * e1[1], s[2] * e1[0] - s[0] * e1[2], s[0] * e1[1] - s[1] * e1[0])
+        v = (direction[0] * q[0] + direction[1] * q[1] + direction[2] * q[2]) * inverse_det
+        if v < -eps or u + v > 1.0 + eps:
+            return None
+        return (e2[0] * q[0] + e2[1] * q[1] + e2[2] * q[2]) * inverse_det
+
+    def _cast_ray(self, origin, direction, max_distance, find_all, eps):
+        origin = (origin.x, origin.y, origin.z)
+        direction = (direction.x, direction.y, direction.z)
+        inverse_direction = [1.0 / d if d != 0.0 else None for d in direction]
+        hit_list = []
+        best = max_distance
+        stack = [0] if len(self._node_list) > 0 else []
+        while len(stack) > 0:
+            box_min, box_max, start, count = self._node_list[stack.pop()]
+            if self._ray_box_distance(origin, inverse_direction, box_min, box_max, best) is None:
+                continue
+            if count == 0:
+                # Visit the nearer child first, so that we can prune the farther one sooner.
+                near_list = []
+                for child in (start, start + 1):
+                    child_min, child_max = self._node_list[child][0], self._node_list[child][1]
+                    t = self._ray_box_distance(origin, inverse_direction, child_min, child_max, best)
+                    if t is not None:
+                        near_list.append((t, child))
+                near_list.sort(reverse=True)
+                stack += [child for t, child in near_list]
+                continue
+            for i in self._order_list[start:start + count]:
+                t = self._ray_triangle_distance(origin, direction, self._corner_list[i], eps)
+                if t is not None and -eps <= t <= best:
+                    hit_list.append((t, i))
+                    if not find_all:
+                        best = t
+        hit_list.sort()
+        return [(t, i, Vector(origin[0] + direction[0] * t, origin[1] + direction[1] * t, origin[2] + direction[2] * t)) for t, i in hit_list]
+
+    def ray_cast(self, origin, direction, max_distance=math.inf, eps=1e-9):
+        # Return (t, i, point) for the first hit along the ray origin + t * direction, for t >= 0,
+        # where i is the offset of the triangle hit in the mesh's triangle list; or None for no hit.
+        hit_list = self._cast_ray(origin, direction, max_distance, False, eps)
+        return hit_list[0] if len(hit_list) > 0 else None
+
+    def ray_cast_all(self, origin, direction, max_distance=math.inf, eps=1e-9):
+        # Return a list of (t, i, point) for every hit along the ray, ordered by distance.
+        return self._cast_ray(origin, direction, max_distance, True, eps)
+
+    def find_closest_point(self, point, max_distance=math.inf):
+        # Return (closest_point, i, distance) for the point on the mesh nearest the given point,
+        # where i is the offset of the triangle containing it; or None if the mesh is empty or
+        # nothing is within the given maximum distance.
+        point = (point.x, point.y, point.z)
+        best = None
+        best_distance_squared = max_distance * max_distance
+        stack = [0] if len(self._node_list) > 0 else []
+        while len(stack) > 0:
+            box_min, box_max, start, count = self._node_list[stack.pop()]
+            if self._box_distance_squared(point, box_min, box_max) > best_distance_squared:
+                continue
+            if count == 0:
+                child_list = [(self._box_distance_squared(point, self._node_list[child][0], self._node_list[child][1]), child) for child in (start, start + 1)]
+                child_list.sort(reverse=True)
+                stack += [child for distance_squared, child in child_list if distance_squared <= best_distance_squared]
+                continue
+            for i in self._order_list[start:start + count]:
+                closest_point = closest_point_on_triangle(point, *self._corner_list[i])
+                distance_squared = sum([(closest_point[k] - point[k]) ** 2 for k in range(3)])
+                if distance_squared <= best_distance_squared:
+                    best_distance_squared = distance_squared
+                    best = (Vector(*closest_point), i, math.sqrt(distance_squared))
+        return best
+
+    @staticmethod
+    def _box_distance_squared(point, box_min, box_max):
+        total = 0.0
+        for k in range(3):
+            if point[k] < box_min[k]:
+                total += (box_min[k] - point[k]) ** 2
+            elif point[k] > box_max[k]:
+                total += (point[k] - box_max[k]) ** 2
+        return total
+
+    @staticmethod
+    def _boxes_overlap(min_a, max_a, min_b, max_b, eps):
+        return (min_a[0] <= max_b[0] + eps and min_b[0] <= max_a[0] + eps and
+                min_a[1] <= max_b[1] + eps and min_b[1] <= max_a[1] + eps and
+                min_a[2] <= max_b[2] + eps and min_b[2] <= max_a[2] + eps)
+
+    def find_overlapping_boxes(self, box_min, box_max, eps=1e-7):
+        # Return the offsets, in ascending order, of all triangles whose boxes overlap the given box.
+        # The box corners are given as (x, y, z) sequences.
+        found_list = []
+        stack = [0] if len(self._node_list) > 0 else []
+        while len(stack) > 0:
+            node_min, node_max, start, count = self._node_list[stack.pop()]
+            if not self._boxes_overlap(node_min, node_max, box_min, box_max, eps):
+                continue
+            if count == 0:
+                stack += [start, start + 1]
+                continue
+            for i in self._order_list[start:start + count]:
+                if self._boxes_overlap(self.triangle_min[i], self.triangle_max[i], box_min, box_max, eps):
+                    found_list.append(i)
+        found_list.sort()
+        return found_list
+
+    def calc_triangle(self, i):
+        return Triangle(*[Vector(*corner) for corner in self._corner_list[i]], copy=False)
+
+    def find_overlapping_pairs(self, other, exact=False, eps=1e-7):
+        # Return all pairs (i, j) such that the box of triangle i here overlaps that of triangle j in the other hierarchy.
+        # This descends both trees together, always splitting the node with the larger box.  If exact is given,
+        # only those pairs whose triangles actually intersect are kept.
+        pair_list = []
+        if len(self._node_list) == 0 or len(other._node_list) == 0:
+            return pair_list
+        stack = [(0, 0)]
+        while len(stack) > 0:
+            node_a, node_b = stack.pop()
+            min_a, max_a, start_a, count_a = self._node_list[node_a]
+            min_b, max_b, start_b, count_b = other._node_list[node_b]
+            if not self._boxes_overlap(min_a, max_a, min_b, max_b, eps):
+                continue
+            if count_a > 0 and count_b > 0:
+                for i in self._order_list[start_a:start_a + count_a]:
+                    for j in other._order_list[start_b:start_b + count_b]:
+                        if self._boxes_overlap(self.triangle_min[i], self.triangle_max[i], other.triangle_min[j], other.triangle_max[j], eps):
+                            if not exact or self.calc_triangle(i).intersect_with(other.calc_triangle(j), eps) is not None:
+                                pair_list.append((i, j))
+                continue
+            area_a = sum([max_a[k] - min_a[k] for k in range(3)])
+            area_b = sum([max_b[k] - min_b[k] for k in range(3)])
+            if count_b > 0 or (count_a == 0 and area_a >= area_b):
+                stack += [(start_a, node_b), (start_a + 1, node_b)]
+            else:
+                stack += [(node_a, start_b), (node_a, start_b + 1)]
+        pair_list.sort()
+        return pair_list
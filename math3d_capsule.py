@@ -5,6 +5,8 @@ import math
 from math3d_line_segment import LineSegment
 
 class Capsule(object):
+    __slots__ = ('line_segment', 'radius')
+
     def __init__(self, point_a, point_b, radius):
         self.line_segment = LineSegment(point_a, point_b)
         self.radius = radius
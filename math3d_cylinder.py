@@ -6,6 +6,8 @@ from math3d_line_segment import LineSegment
 from math3d_vector import Vector
 
 class Cylinder(object):
+    __slots__ = ('line_segment', 'radius')
+
     def __init__(self, point_a, point_b, radius):
         self.line_segment = LineSegment(point_a, point_b)
         self.radius = radius
@@ -0,0 +1,146 @@
+# math3d_downsample.py
+
+import numpy
+
+class VoxelMode:
+    CENTROID = 0            # Each voxel is replaced by the centroid of its points.
+    NEAREST_TO_CENTER = 1   # Each voxel is replaced by the one of its points nearest the center of the voxel.
+
+class VoxelGrid(object):
+    # This thins out a point-cloud by cutting space into cubical voxels and keeping one point per occupied voxel.
+    # Points are fed to it as N x 3 arrays, a chunk at a time, so memory use is bounded by the number of occupied
+    # voxels rather than the number of points.  The occupied voxels are kept as a sorted array of integer coordinates,
+    # and each chunk is folded in by sorting it together with them, so that no Python loop runs per point or voxel.
+    # Grids fed disjoint sets of points (in other processes, say) can be merged.
+
+    def __init__(self, voxel_size, mode=VoxelMode.CENTROID, origin=None):
+        from math3d_vector import Vector
+        self.voxel_size = voxel_size
+        self.mode = mode
+        origin = origin if origin is not None else Vector(0.0, 0.0, 0.0)
+        self.origin = numpy.array([origin.x, origin.y, origin.z], dtype=numpy.float64)
+        self.clear()
+
+    def clear(self):
+        self.key_array = numpy.zeros((0, 3), dtype=numpy.int64)
+        self.point_array = numpy.zeros((0, 3), dtype=numpy.float64)    # Summed points or best points, per the mode.
+        self.value_array = numpy.zeros(0, dtype=numpy.float64)         # Point counts or best distances, per the mode.
+
+    def voxel_count(self):
+        return len(self.key_array)
+
+    def _voxel_center_array(self, key_array):
+        return self.origin + (key_array + 0.5) * self.voxel_size
+
+    def _combine(self, key_array, point_array, value_array):
+        key_array = numpy.concatenate([self.key_array, key_array])
+        point_array = numpy.concatenate([self.point_array, point_array])
+        value_array = numpy.concatenate([self.value_array, value_array])
+        if self.mode == VoxelMode.CENTROID:
+            self.key_array, inverse_array = numpy.unique(key_array, axis=0, return_inverse=True)
+            inverse_array = inverse_array.ravel()
+            count = len(self.key_array)
+            self.point_array = numpy.stack([numpy.bincount(inverse_array, weights=point_array[:, k], minlength=count) for k in range(3)], axis=1)
+            self.value_array = numpy.bincount(inverse_array, weights=value_array, minlength=count)
+        else:
+            # Sort by voxel and then by distance, and keep the first entry of each voxel.
+            order = numpy.lexsort((value_array, key_array[:, 2], key_array[:, 1], key_array[:, 0]))
+            key_array = key_array[order]
+            first = numpy.ones(len(order), dtype=bool)
+            first[1:] = (key_array[1:] != key_array[:-1]).any(axis=1)
+            self.key_array = key_array[first]
+            self.point_array = point_array[order][first]
+            self.value_array = value_array[order][first]
+
+    def add_array(self, point_array):
+        # Add the points of the given N x 3 array (or VectorArray.)  Non-finite points are ignored.
+        from math3d_vector_array import VectorArray
+        point_array = VectorArray(point_array).array
+        point_array = point_array[numpy.isfinite(point_array).all(axis=1)]
+        if len(point_array) == 0:
+            return self
+        key_array = numpy.floor((point_array - self.origin) / self.voxel_size).astype(numpy.int64)
+        if self.mode == VoxelMode.CENTROID:
+            value_array = numpy.ones(len(point_array), dtype=numpy.float64)
+        else:
+            delta_array = point_array - self._voxel_center_array(key_array)
+            value_array = numpy.einsum('ni,ni->n', delta_array, delta_array)
+        self._combine(key_array, point_array, value_array)
+        return self
+
+    def add_chunks(self, chunk_iter):
+        for chunk in chunk_iter:
+            self.add_array(chunk)
+        return self
+
+    def merge(self, other):
+        assert(other.mode == self.mode and other.voxel_size == self.voxel_size and (other.origin == self.origin).all())
+        self._combine(other.key_array, other.point_array, other.value_array)
+        return self
+
+    def to_array(self):
+        # Return an M x 3 array of one point per occupied voxel, in order of voxel coordinates.
+        if self.mode == VoxelMode.CENTROID:
+            return self.point_array / self.value_array[:, numpy.newaxis]
+        return self.point_array.copy()
+
+class RandomSampler(object):
+    # This picks a given number of points uniformly at random, without replacement, from the points fed to it
+    # a chunk at a time.  Every point is given a random key, and we keep the points with the smallest keys seen
+    # so far.  The points kept are returned in the order they were fed, along with their offsets in that order.
+
+    def __init__(self, count, seed=None):
+        self.count = count
+        self.random = numpy.random.default_rng(seed)
+        self.clear()
+
+    def clear(self):
+        self.total = 0
+        self.key_array = numpy.zeros(0, dtype=numpy.float64)
+        self.offset_array = numpy.zeros(0, dtype=numpy.int64)
+        self.point_array = numpy.zeros((0, 3), dtype=numpy.float64)
+
+    def add_array(self, point_array):
+        from math3d_vector_array import VectorArray
+        point_array = VectorArray(point_array).array
+        chunk_count = len(point_array)
+        key_array = numpy.concatenate([self.key_array, self.random.random(chunk_count)])
+        offset_array = numpy.concatenate([self.offset_array, numpy.arange(self.total, self.total + chunk_count, dtype=numpy.int64)])
+        point_array = numpy.concatenate([self.point_array, point_array])
+        self.total += chunk_count
+        if len(key_array) > self.count:
+            keep = numpy.argpartition(key_array, self.count - 1)[:self.count] if self.count > 0 else numpy.zeros(0, dtype=numpy.int64)
+            key_array, offset_array, point_array = key_array[keep], offset_array[keep], point_array[keep]
+        self.key_array, self.offset_array, self.point_array = key_array, offset_array, point_array
+        return self
+
+    def add_chunks(self, chunk_iter):
+        for chunk in chunk_iter:
+            self.add_array(chunk)
+        return self
+
+    def to_array(self):
+        # Return (point_array, offset_array) for the points picked, in the order they were fed.
+        order = numpy.argsort(self.offset_array)
+        return self.point_array[order], self.offset_array[order]
+
+def farthest_point_sample(point_array, count, start=0):
+    # Return the offsets of count points of the given N x 3 array (or VectorArray), picked greedily so that each is
+    # the point farthest from all those picked before it, beginning with the point at the given offset.  This spreads
+    # the points evenly over the cloud.  We keep the distance from every point to the nearest point picked so far,
+    # so each pick costs one vectorized pass over the points, for O(N * count) work in all.  Unlike the samplers
+    # above, this needs all of the points in memory at once, so it is best run on what they leave.
+    from math3d_vector_array import VectorArray
+    point_array = VectorArray(point_array).array
+    count = min(count, len(point_array))
+    offset_array = numpy.zeros(count, dtype=numpy.int64)
+    if count == 0:
+        return offset_array
+    distance_array = numpy.full(len(point_array), numpy.inf)
+    offset = start
+    for i in range(count):
+        offset_array[i] = offset
+        delta_array = point_array - point_array[offset]
+        numpy.minimum(distance_array, numpy.einsum('ni,ni->n', delta_array, delta_array), out=distance_array)
+        offset = int(numpy.argmax(distance_array))
+    return offset_array
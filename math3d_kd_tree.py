@@ -0,0 +1,314 @@
+# math3d_kd_tree.py
+
+import heapq
+import math
+import numpy
+
+class KDTree(object):
+    # A static tree of axis-aligned boxes over a set of points, stored as flat arrays and built in bulk from an N x 3 array.
+    # Node 0 is the root.  For node i, node_min[i] and node_max[i] bound the points beneath it, which are the points
+    # point_order[node_lo[i]:node_hi[i]].  A leaf has node_left[i] == -1; otherwise its children are nodes node_left[i]
+    # and node_left[i] + 1, found by cutting the points at the median of the longest axis of the box.  Offsets returned
+    # by the queries are offsets into the array the tree was built from.  Non-finite points are left out of the tree.
+
+    def __init__(self, point_array=None, max_leaf_size=8):
+        self.max_leaf_size = max_leaf_size
+        self.build(point_array if point_array is not None else numpy.zeros((0, 3), dtype=numpy.float64))
+
+    def build(self, point_array):
+        from math3d_vector_array import VectorArray
+        self.point_array = VectorArray(point_array).array
+        self.point_order = numpy.flatnonzero(numpy.isfinite(self.point_array).all(axis=1))
+
+        node_min_list = []
+        node_max_list = []
+        node_lo_list = []
+        node_hi_list = []
+        node_left_list = []
+        def add_node(lo, hi):
+            node_min_list.append(None)
+            node_max_list.append(None)
+            node_lo_list.append(lo)
+            node_hi_list.append(hi)
+            node_left_list.append(-1)
+            return len(node_lo_list) - 1
+
+        stack = [add_node(0, len(self.point_order))] if len(self.point_order) > 0 else []
+        while len(stack) > 0:
+            node = stack.pop()
+            lo, hi = node_lo_list[node], node_hi_list[node]
+            order = self.point_order[lo:hi]
+            node_point_array = self.point_array[order]
+            box_min = node_point_array.min(axis=0)
+            box_max = node_point_array.max(axis=0)
+            node_min_list[node] = box_min
+            node_max_list[node] = box_max
+            if hi - lo <= self.max_leaf_size:
+                continue
+            axis = int(numpy.argmax(box_max - box_min))
+            middle = (hi - lo) // 2
+            partition = numpy.argpartition(node_point_array[:, axis], middle)
+            self.point_order[lo:hi] = order[partition]
+            left_child = add_node(lo, lo + middle)
+            add_node(lo + middle, hi)
+            node_left_list[node] = left_child
+            stack += [left_child + 1, left_child]
+
+        self.node_min = numpy.array(node_min_list, dtype=numpy.float64).reshape(-1, 3)
+        self.node_max = numpy.array(node_max_list, dtype=numpy.float64).reshape(-1, 3)
+        self.node_lo = numpy.array(node_lo_list, dtype=numpy.int64)
+        self.node_hi = numpy.array(node_hi_list, dtype=numpy.int64)
+        self.node_left = numpy.array(node_left_list, dtype=numpy.int64)
+
+        # Single queries are answered in plain Python, where lists are much faster to index than numpy arrays.
+        self._node_list = list(zip(self.node_min.tolist(), self.node_max.tolist(), node_lo_list, node_hi_list, node_left_list))
+        self._order_list = self.point_order.tolist()
+        self._point_list = self.point_array[self.point_order].tolist()
+        return self
+
+    def __len__(self):
+        return len(self.point_order)
+
+    @staticmethod
+    def _box_distance_squared(point, box_min, box_max):
+        total = 0.0
+        for k in range(3):
+            if point[k] < box_min[k]:
+                total += (box_min[k] - point[k]) ** 2
+            elif point[k] > box_max[k]:
+                total += (point[k] - box_max[k]) ** 2
+        return total
+
+    def _find_in_ball(self, point, radius_squared, strict):
+        # Return (distance_squared, offset) for every point within the given distance of the given (x, y, z) point.
+        found_list = []
+        stack = [0] if len(self._node_list) > 0 else []
+        while len(stack) > 0:
+            box_min, box_max, lo, hi, left = self._node_list[stack.pop()]
+            if self._box_distance_squared(point, box_min, box_max) > radius_squared:
+                continue
+            if left >= 0:
+                stack += [left, left + 1]
+                continue
+            for j in range(lo, hi):
+                other = self._point_list[j]
+                distance_squared = (other[0] - point[0]) ** 2 + (other[1] - point[1]) ** 2 + (other[2] - point[2]) ** 2
+                if distance_squared < radius_squared or (not strict and distance_squared == radius_squared):
+                    found_list.append((distance_squared, self._order_list[j]))
+        return found_list
+
+    def find_nearest(self, point, k=1, max_distance=math.inf):
+        # Return a list of (distance, i) for the k points nearest the given point, nearest first,
+        # leaving out any further than the given maximum distance.  Ties are broken by offset.
+        point = (point.x, point.y, point.z)
+        heap = []   # The best k found so far, as (-distance_squared, -i), so that heap[0] is the worst of them.
+        bound = max_distance * max_distance
+        stack = [(0.0, 0)] if len(self._node_list) > 0 and k > 0 else []
+        while len(stack) > 0:
+            box_distance_squared, node = stack.pop()
+            if box_distance_squared > bound:
+                continue
+            box_min, box_max, lo, hi, left = self._node_list[node]
+            if left >= 0:
+                # Visit the nearer child first, so that we can prune the farther one sooner.
+                child_list = [(self._box_distance_squared(point, self._node_list[child][0], self._node_list[child][1]), child) for child in (left, left + 1)]
+                child_list.sort(reverse=True)
+                stack += [child for child in child_list if child[0] <= bound]
+                continue
+            for j in range(lo, hi):
+                other = self._point_list[j]
+                distance_squared = (other[0] - point[0]) ** 2 + (other[1] - point[1]) ** 2 + (other[2] - point[2]) ** 2
+                if distance_squared > bound:
+                    continue
+                entry = (-distance_squared, -self._order_list[j])
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+                else:
+                    continue
+                if len(heap) == k:
+                    bound = -heap[0][0]
+        heap.sort(reverse=True)
+        return [(math.sqrt(-distance_squared), -i) for distance_squared, i in heap]
+
+    def find_within_radius(self, point, radius):
+        # Return the offsets, in ascending order, of all points at most the given distance from the given point.
+        found_list = self._find_in_ball((point.x, point.y, point.z), radius * radius, False)
+        return sorted([i for distance_squared, i in found_list])
+
+    def find_duplicate(self, point, eps=1e-7):
+        # Return the smallest offset i of a point less than eps from the given point, or None if there is no such point.
+        # This is what a linear search for the first such point would return.
+        if not (math.isfinite(point.x) and math.isfinite(point.y) and math.isfinite(point.z)):
+            return None
+        found_list = self._find_in_ball((point.x, point.y, point.z), eps * eps, True)
+        return min([i for distance_squared, i in found_list]) if len(found_list) > 0 else None
+
+    def _find_pairs_in_balls(self, query_array, radius_squared_array, strict):
+        # Return arrays (query, i, distance_squared) listing every point i within the given distance of each query point.
+        # The distances are given squared, so that a bound measured as a squared distance is not lost to round-off.
+        # Rather than walk the tree once per query, we walk it once for all of them: the frontier is a list of
+        # (query, node) pairs, and each step replaces the pairs whose boxes are within reach by the pairs of their
+        # children, or, for leaves, by the (query, point) pairs of the points they hold.
+        query_list = []
+        offset_list = []
+        distance_list = []
+        frontier_query = numpy.arange(len(query_array), dtype=numpy.int64) if len(self._node_list) > 0 else numpy.zeros(0, dtype=numpy.int64)
+        frontier_node = numpy.zeros(len(frontier_query), dtype=numpy.int64)
+        while len(frontier_query) > 0:
+            query_point_array = query_array[frontier_query]
+            gap_array = numpy.maximum(self.node_min[frontier_node] - query_point_array, 0.0) + numpy.maximum(query_point_array - self.node_max[frontier_node], 0.0)
+            keep = numpy.einsum('ni,ni->n', gap_array, gap_array) <= radius_squared_array[frontier_query]
+            frontier_query = frontier_query[keep]
+            frontier_node = frontier_node[keep]
+            left_array = self.node_left[frontier_node]
+            leaf = left_array < 0
+
+            leaf_query = frontier_query[leaf]
+            leaf_node = frontier_node[leaf]
+            count_array = self.node_hi[leaf_node] - self.node_lo[leaf_node]
+            pair_query = numpy.repeat(leaf_query, count_array)
+            first_array = numpy.cumsum(count_array) - count_array
+            slot_array = numpy.arange(len(pair_query), dtype=numpy.int64) - numpy.repeat(first_array - self.node_lo[leaf_node], count_array)
+            pair_offset = self.point_order[slot_array]
+            delta_array = self.point_array[pair_offset] - query_array[pair_query]
+            distance_squared_array = numpy.einsum('ni,ni->n', delta_array, delta_array)
+            radius_squared = radius_squared_array[pair_query]
+            within = distance_squared_array < radius_squared if strict else distance_squared_array <= radius_squared
+            query_list.append(pair_query[within])
+            offset_list.append(pair_offset[within])
+            distance_list.append(distance_squared_array[within])
+
+            interior = ~leaf
+            frontier_query = numpy.repeat(frontier_query[interior], 2)
+            frontier_node = numpy.repeat(left_array[interior], 2)
+            frontier_node[1::2] += 1
+        if len(query_list) == 0:
+            return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.float64)
+        return numpy.concatenate(query_list), numpy.concatenate(offset_list), numpy.concatenate(distance_list)
+
+    @staticmethod
+    def _query_array(point_array):
+        from math3d_vector_array import VectorArray
+        return VectorArray(point_array).array
+
+    def find_within_radius_array(self, point_array, radius):
+        # Answer find_within_radius for every point of the given N x 3 array (or VectorArray) at once.  The radius
+        # may be one for all points or an array of one per point.  The result is in compressed form, as a pair
+        # (start_array, offset_array), where the offsets found for query q are offset_array[start_array[q]:start_array[q + 1]].
+        query_array = self._query_array(point_array)
+        radius_array = numpy.broadcast_to(numpy.asarray(radius, dtype=numpy.float64), (len(query_array),))
+        query, offset, distance_squared = self._find_pairs_in_balls(query_array, radius_array * radius_array, False)
+        order = numpy.lexsort((offset, query))
+        start_array = numpy.zeros(len(query_array) + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(query, minlength=len(query_array)), out=start_array[1:])
+        return start_array, offset[order]
+
+    def find_duplicate_array(self, point_array, eps=1e-7):
+        # Answer find_duplicate for every point of the given N x 3 array (or VectorArray) at once, with -1 for None.
+        query_array = self._query_array(point_array)
+        query, offset, distance_squared = self._find_pairs_in_balls(query_array, numpy.full(len(query_array), eps * eps), True)
+        found_array = numpy.full(len(query_array), len(self.point_array), dtype=numpy.int64)
+        numpy.minimum.at(found_array, query, offset)
+        found_array[found_array == len(self.point_array)] = -1
+        return found_array
+
+    def find_nearest_array(self, point_array, k=1):
+        # Answer find_nearest for every point of the given N x 3 array (or VectorArray) at once.  The result is a pair
+        # of N x k arrays (distance_array, offset_array), nearest first, padded with inf and -1 if there are fewer than
+        # k points in the tree.  We first bound the distance to the k-th nearest point of each query by descending to
+        # the smallest node holding at least k points and measuring the distances to all of them.  A batched ball
+        # query with that bound then finds every candidate, and the k nearest of those are picked out by sorting.
+        query_array = self._query_array(point_array)
+        query_count = len(query_array)
+        distance_array = numpy.full((query_count, k), numpy.inf)
+        offset_array = numpy.full((query_count, k), -1, dtype=numpy.int64)
+        if query_count == 0 or k <= 0 or len(self._node_list) == 0:
+            return distance_array, offset_array
+
+        node_array = numpy.zeros(query_count, dtype=numpy.int64)
+        while True:
+            left_array = self.node_left[node_array]
+            active = numpy.flatnonzero(left_array >= 0)
+            left_array = left_array[active]
+            if len(active) == 0:
+                break
+            # Go to the child whose box is nearer, so long as it holds at least k points.
+            query_point_array = query_array[active]
+            gap_list = []
+            for child_array in (left_array, left_array + 1):
+                gap_array = numpy.maximum(self.node_min[child_array] - query_point_array, 0.0) + numpy.maximum(query_point_array - self.node_max[child_array], 0.0)
+                gap_list.append(numpy.einsum('ni,ni->n', gap_array, gap_array))
+            child_array = numpy.where(gap_list[1] < gap_list[0], left_array + 1, left_array)
+            deeper = self.node_hi[child_array] - self.node_lo[child_array] >= k
+            if not deeper.any():
+                break
+            node_array[active[deeper]] = child_array[deeper]
+
+        count_array = self.node_hi[node_array] - self.node_lo[node_array]
+        pair_query = numpy.repeat(numpy.arange(query_count, dtype=numpy.int64), count_array)
+        first_array = numpy.cumsum(count_array) - count_array
+        slot_array = numpy.arange(len(pair_query), dtype=numpy.int64) - numpy.repeat(first_array - self.node_lo[node_array], count_array)
+        delta_array = self.point_array[self.point_order[slot_array]] - query_array[pair_query]
+        distance_squared_array = numpy.einsum('ni,ni->n', delta_array, delta_array)
+        order = numpy.lexsort((distance_squared_array, pair_query))
+        rank = numpy.minimum(count_array, k) - 1
+        bound_array = distance_squared_array[order][first_array + rank]
+        bound_array[count_array < k] = numpy.inf
+
+        query, offset, distance_squared = self._find_pairs_in_balls(query_array, bound_array, False)
+        order = numpy.lexsort((offset, distance_squared, query))
+        query, offset, distance_squared = query[order], offset[order], distance_squared[order]
+        start_array = numpy.cumsum(numpy.bincount(query, minlength=query_count)) - numpy.bincount(query, minlength=query_count)
+        rank_array = numpy.arange(len(query), dtype=numpy.int64) - start_array[query]
+        keep = rank_array < k
+        distance_array[query[keep], rank_array[keep]] = numpy.sqrt(distance_squared[keep])
+        offset_array[query[keep], rank_array[keep]] = offset[keep]
+        return distance_array, offset_array
+
+class IncrementalKDTree(object):
+    # A set of KD-trees over a growing list of points, owned by the caller, for finding duplicates as points are added.
+    # This has the same interface as the SpatialHash class, but the cost of a query doesn't depend on how the points
+    # are spread out relative to some cell size.  A KD-tree can't be cheaply added to, so we keep the points in a short
+    # tail that is searched linearly, and a list of KD-trees over consecutive runs of the list, each at least twice
+    # the size of the next.  When the tail fills up, it becomes a tree, and trees are merged as needed to keep the
+    # sizes decreasing.  This is the logarithmic method of Bentley and Saxe; every point is rebuilt into a tree
+    # O(log n) times, and a query visits O(log n) trees.
+
+    def __init__(self, tail_size=32, max_leaf_size=8):
+        self.tail_size = tail_size
+        self.max_leaf_size = max_leaf_size
+        self.clear()
+
+    def clear(self):
+        self.tree_list = []     # A list of (start, KDTree) where the tree holds the points from offset start on.
+        self.tail_start = 0
+        self.count = 0
+
+    def add_point_list(self, point_list, start=0):
+        assert(start == self.count)
+        self.count = len(point_list)
+        while self.count - self.tail_start >= self.tail_size:
+            end = min(self.tail_start + self.tail_size, self.count)
+            start = self.tail_start
+            while len(self.tree_list) > 0 and len(self.tree_list[-1][1].point_array) <= 2 * (end - start):
+                start = self.tree_list.pop()[0]
+            self.tree_list.append((start, self._build_tree(point_list, start, end)))
+            self.tail_start = end
+
+    def _build_tree(self, point_list, start, end):
+        from math3d_vector_array import VectorArray
+        return KDTree(VectorArray().from_vector_list(point_list[start:end]).array, self.max_leaf_size)
+
+    def find_point(self, point_list, given_point, eps=1e-7):
+        # Return the smallest offset i such that (point_list[i] - given_point).length() < eps, or None if there is no such offset.
+        # The trees hold ever later runs of the list, so the first one to find anything has found the smallest offset.
+        for start, tree in self.tree_list:
+            i = tree.find_duplicate(given_point, eps)
+            if i is not None:
+                return start + i
+        for i in range(self.tail_start, self.count):
+            if (point_list[i] - given_point).length() < eps:
+                return i
+        return None
@@ -1,6 +1,8 @@
 # math3d_line.py
 
 class Line(object):
+    __slots__ = ('center', 'unit_normal')
+
     def __init__(self, center, unit_normal):
         self.center = center.clone()
         self.unit_normal = unit_normal.clone()
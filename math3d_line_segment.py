@@ -5,9 +5,12 @@ import math
 from math3d_line import Line
 
 class LineSegment(object):
-    def __init__(self, point_a, point_b):
-        self.point_a = point_a.clone()
-        self.point_b = point_b.clone()
+    __slots__ = ('point_a', 'point_b')
+
+    def __init__(self, point_a, point_b, copy=True):
+        # Pass copy=False to have the segment share the given points rather than clone them.
+        self.point_a = point_a.clone() if copy else point_a
+        self.point_b = point_b.clone() if copy else point_b
 
     def clone(self):
         return LineSegment(self.point_a, self.point_b)
@@ -0,0 +1,111 @@
+# math3d_mapped_point_cloud.py
+
+import numpy
+
+from math3d_vector import Vector
+from math3d_point_cloud import PointCloud
+from math3d_binary_file import BinaryFile, BinaryFileKind
+from math3d_side import SideCode
+from math3d_vector_array import VectorArray
+
+class MappedPointCloud(PointCloud):
+    # A point-cloud kept out-of-core, in a binary file (see BinaryFile) mapped into memory as an N x 3 array.
+    # Nothing is read from the file until needed, and the methods overridden here go through the points a
+    # chunk at a time, so memory use is bounded by the chunk size rather than the number of points.  Methods
+    # not overridden here see the point_list property, which reads every point of the file into a list.
+
+    def __init__(self, path=None, mode='r', chunk_size=1 << 20):
+        self.binary_file = None
+        self.point_array = numpy.zeros((0, 3), dtype=numpy.float64)
+        self.chunk_size = chunk_size
+        self._drawn_render_buffer = None
+        self.invalidate_caches()
+        if path is not None:
+            self.open(path, mode)
+
+    def open(self, path, mode='r'):
+        # Open with mode 'r+' to be able to change the points in place.
+        self.binary_file = BinaryFile(path, mode)
+        if self.binary_file.kind != BinaryFileKind.POINT_CLOUD:
+            raise Exception('The file does not hold a point-cloud.')
+        self.point_array = self.binary_file.vertex_array
+        return self
+
+    @staticmethod
+    def create(path, chunk_iter, single_precision=False, mode='r'):
+        # Write the points given as a sequence of N x 3 arrays to the given path, and open it.
+        BinaryFile.write_chunks(path, chunk_iter, BinaryFileKind.POINT_CLOUD, single_precision)
+        return MappedPointCloud(path, mode)
+
+    @property
+    def point_list(self):
+        return VectorArray(self.point_array).to_vector_list()
+
+    @point_list.setter
+    def point_list(self, point_list):
+        raise Exception('The points of a mapped point-cloud cannot be replaced by a list.')
+
+    def point_count(self):
+        return len(self.point_array)
+
+    def _point_source(self):
+        return self.point_array
+
+    def flush(self):
+        if isinstance(self.point_array, numpy.memmap):
+            self.point_array.flush()
+
+    def save_binary(self, path, single_precision=False):
+        BinaryFile.write_chunks(path, self.yield_chunks(), BinaryFileKind.POINT_CLOUD, single_precision)
+
+    def load_binary(self, path):
+        return self.open(path)
+
+    def yield_chunks(self, chunk_size=None):
+        chunk_size = chunk_size if chunk_size is not None else self.chunk_size
+        for start in range(0, len(self.point_array), chunk_size):
+            yield numpy.asarray(self.point_array[start:start + chunk_size], dtype=numpy.float64)
+
+    def calc_center(self):
+        total = numpy.zeros(3, dtype=numpy.float64)
+        for chunk in self.yield_chunks():
+            total += chunk.sum(axis=0)
+        return Vector(*(total / float(len(self.point_array))).tolist())
+
+    def scale_about_center(self, scale):
+        if self.binary_file is not None and self.binary_file.mode == 'r':
+            raise Exception('The point-cloud was opened read-only.')
+        center = self.calc_center()
+        center = numpy.array([center.x, center.y, center.z])
+        for start in range(0, len(self.point_array), self.chunk_size):
+            chunk = self.point_array[start:start + self.chunk_size]
+            chunk[:] = center + (numpy.asarray(chunk, dtype=numpy.float64) - center) * scale
+        self.flush()
+        self.invalidate_caches()
+
+    def add_point(self, new_point, eps=1e-7):
+        raise Exception('Points cannot be added to a mapped point-cloud.')
+
+    def planar_sort_array(self, plane, eps=1e-7, return_distances=False):
+        back_list = []
+        front_list = []
+        neither_list = []
+        distance_list = []
+        start = 0
+        for chunk in self.yield_chunks():
+            distance_array = plane.point_distance_array(chunk)
+            side_array = SideCode.from_distance_array(distance_array, eps)
+            back_list.append(numpy.flatnonzero(side_array == SideCode.BACK) + start)
+            front_list.append(numpy.flatnonzero(side_array == SideCode.FRONT) + start)
+            neither_list.append(numpy.flatnonzero(side_array == SideCode.NEITHER) + start)
+            if return_distances:
+                distance_list.append(distance_array)
+            start += len(chunk)
+        def concatenate(array_list, dtype):
+            return numpy.concatenate(array_list) if len(array_list) > 0 else numpy.zeros(0, dtype=dtype)
+        back_array = concatenate(back_list, numpy.int64)
+        front_array = concatenate(front_list, numpy.int64)
+        neither_array = concatenate(neither_list, numpy.int64)
+        if return_distances:
+            return back_array, front_array, neither_array, concatenate(distance_list, numpy.float64)
+        return back_array, front_array, neither_array
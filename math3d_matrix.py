@@ -1,87 +1,105 @@
 # math3d_matrix.py
 
-import copy
+import math
 
 from math3d_vector import Vector
 
 class Matrix3x3(object):
+    # The nine elements are stored flat, in row-major order, so that
+    # element (i, j) is found at offset 3 * i + j.
+    __slots__ = ('elements',)
+
     def __init__(self, other=None):
         if other is None:
             self.make_identity()
         elif isinstance(other, Matrix3x3):
-            self.elements = copy.deepcopy(other.elements)
+            self.elements = other.elements[:]
+        else:
+            self.elements = [float(element) for element in other]
+            assert(len(self.elements) == 9)
             
     def clone(self):
         return Matrix3x3(self)
     
     def make_identity(self):
-        self.elements = [[1.0 if i == j else 0.0 for j in range(3)] for i in range(3)]
+        self.elements = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0]
+        return self
+    
+    def __getitem__(self, index):
+        i, j = index
+        return self.elements[3 * i + j]
+    
+    def __setitem__(self, index, value):
+        i, j = index
+        self.elements[3 * i + j] = value
     
     def get_row(self, i):
-        return Vector(self.elements[i][0], self.elements[i][1], self.elements[i][2])
+        e = self.elements
+        return Vector(e[3 * i], e[3 * i + 1], e[3 * i + 2])
     
     def set_row(self, i, vector):
-        self.elements[i][0] = vector.x
-        self.elements[i][1] = vector.y
-        self.elements[i][2] = vector.z
+        self.elements[3 * i] = vector.x
+        self.elements[3 * i + 1] = vector.y
+        self.elements[3 * i + 2] = vector.z
     
     def get_col(self, j):
-        return Vector(self.elements[0][j], self.elements[1][j], self.elements[2][j])
+        e = self.elements
+        return Vector(e[j], e[3 + j], e[6 + j])
     
     def set_col(self, j, vector):
-        self.elements[0][j] = vector.x
-        self.elements[1][j] = vector.y
-        self.elements[2][j] = vector.z
+        self.elements[j] = vector.x
+        self.elements[3 + j] = vector.y
+        self.elements[6 + j] = vector.z
     
     def calc_inverse(self):
-        adjoint = self.calc_adjoint()
-        det = self.calc_determinant()
+        # The inverse is the adjoint over the determinant, all written out in closed form.
+        a, b, c, d, e, f, g, h, i = self.elements
+        c00 = e * i - f * h
+        c01 = f * g - d * i
+        c02 = d * h - e * g
+        det = a * c00 + b * c01 + c * c02
         try:
-            inverse = adjoint / det
-            return inverse
+            scale = 1.0 / det
         except ZeroDivisionError:
             return None
+        inverse = Matrix3x3.__new__(Matrix3x3)
+        inverse.elements = [
+            c00 * scale, (c * h - b * i) * scale, (b * f - c * e) * scale,
+            c01 * scale, (a * i - c * g) * scale, (c * d - a * f) * scale,
+            c02 * scale, (b * g - a * h) * scale, (a * e - b * d) * scale
+        ]
+        return inverse
     
     def calc_determinant(self):
-        det = 0.0
-        for i in range(3):
-            det += self.elements[0][i] * self.calc_cofactor(0, i)
-        return det
+        a, b, c, d, e, f, g, h, i = self.elements
+        return a * (e * i - f * h) + b * (f * g - d * i) + c * (d * h - e * g)
     
     def calc_adjoint(self):
         return self.calc_cofactor_matrix().make_transpose()
         
     def calc_cofactor_matrix(self):
-        cofactor_matrix = Matrix3x3()
-        for i in range(3):
-            for j in range(3):
-                cofactor_matrix.elements[i][j] = self.calc_cofactor(i, j)
+        a, b, c, d, e, f, g, h, i = self.elements
+        cofactor_matrix = Matrix3x3.__new__(Matrix3x3)
+        cofactor_matrix.elements = [
+            e * i - f * h, f * g - d * i, d * h - e * g,
+            c * h - b * i, a * i - c * g, b * g - a * h,
+            b * f - c * e, c * d - a * f, a * e - b * d
+        ]
         return cofactor_matrix
     
     def calc_cofactor(self, i, j):
-        element_list = []
-        for row in range(3):
-            for col in range(3):
-                if row != i and col != j:
-                    element_list.append(self.elements[row][col])
-        det = element_list[0] * element_list[3] - element_list[1] * element_list[2]
-        if (i + j) % 2 == 1:
-            det *= -1.0
-        return det
+        return self.calc_cofactor_matrix().elements[3 * i + j]
 
     def make_transpose(self):
-        tranpose = Matrix3x3()
-        for i in range(3):
-            for j in range(3):
-                tranpose.elements[i][j] = self.elements[j][i]
+        a, b, c, d, e, f, g, h, i = self.elements
+        tranpose = Matrix3x3.__new__(Matrix3x3)
+        tranpose.elements = [a, d, g, b, e, h, c, f, i]
         return tranpose
     
     def __truediv__(self, other):
         if isinstance(other, float):
-            result = Matrix3x3()
-            for i in range(3):
-                for j in range(3):
-                    result.elements[i][j] = self.elements[i][j] / other
+            result = Matrix3x3.__new__(Matrix3x3)
+            result.elements = [element / other for element in self.elements]
         if isinstance(other, Matrix3x3):
             inverse = other.calc_inverse()
             result = self * inverse
@@ -90,29 +108,35 @@ class Matrix3x3(object):
     def __mul__(self, other):
         result = None
         if isinstance(other, float):
-            result = Matrix3x3()
-            for i in range(3):
-                for j in range(3):
-                    result.elements[i][j] = self.elements[i][j] * other
+            result = Matrix3x3.__new__(Matrix3x3)
+            result.elements = [element * other for element in self.elements]
         elif isinstance(other, Matrix3x3):
-            result = Matrix3x3()
-            for i in range(3):
-                for j in range(3):
-                    result.elements[i][j] = self.get_row(i).dot(other.get_col(j))
+            a, b, c, d, e, f, g, h, i = self.elements
+            A, B, C, D, E, F, G, H, I = other.elements
+            result = Matrix3x3.__new__(Matrix3x3)
+            result.elements = [
+                a * A + b * D + c * G, a * B + b * E + c * H, a * C + b * F + c * I,
+                d * A + e * D + f * G, d * B + e * E + f * H, d * C + e * F + f * I,
+                g * A + h * D + i * G, g * B + h * E + i * H, g * C + h * F + i * I
+            ]
         elif isinstance(other, Vector):
-            result = Vector()
-            result.x = self.get_row(0).dot(other)
-            result.y = self.get_row(1).dot(other)
-            result.z = self.get_row(2).dot(other)
+            a, b, c, d, e, f, g, h, i = self.elements
+            result = Vector(
+                a * other.x + b * other.y + c * other.z,
+                d * other.x + e * other.y + f * other.z,
+                g * other.x + h * other.y + i * other.z
+            )
         return result
 
     def __rmul__(self, other):
         result = None
         if isinstance(other, Vector):
-            result = Vector()
-            result.x = other.dot(self.get_col(0))
-            result.y = other.dot(self.get_col(1))
-            result.z = other.dot(self.get_col(2))
+            a, b, c, d, e, f, g, h, i = self.elements
+            result = Vector(
+                other.x * a + other.y * d + other.z * g,
+                other.x * b + other.y * e + other.z * h,
+                other.x * c + other.y * f + other.z * i
+            )
         elif isinstance(other, float):
             result = self * other
         return result
@@ -120,32 +144,113 @@ class Matrix3x3(object):
     def __add__(self, other):
         result = None
         if isinstance(other, Matrix3x3):
-            result = Matrix3x3()
-            for i in range(3):
-                for j in range(3):
-                    result.elements[i][j] = self.elements[i][j] + other.elements[i][j]
+            result = Matrix3x3.__new__(Matrix3x3)
+            result.elements = [x + y for x, y in zip(self.elements, other.elements)]
         return result
     
     def __sub__(self, other):
         result = None
         if isinstance(other, Matrix3x3):
-            result = Matrix3x3()
-            for i in range(3):
-                for j in range(3):
-                    result.elements[i][j] = self.elements[i][j] - other.elements[i][j]
+            result = Matrix3x3.__new__(Matrix3x3)
+            result.elements = [x - y for x, y in zip(self.elements, other.elements)]
         return result
     
     def calc_bestfit_orientation(self):
-        pass # TODO: Use singular-value decomposition to find the orthogonal matrix that best fits this matrix.
+        # Return the rotation matrix nearest this matrix (in the Frobenius norm sense.)
+        # If this matrix is M = U*S*V^T, then that rotation is U*V^T, unless that's a
+        # reflection, in which case we flip the column of U having the smallest singular value.
+        u_matrix, singular_value_list, v_matrix = self.calc_singular_value_decomposition()
+        if u_matrix.calc_determinant() * v_matrix.calc_determinant() < 0.0:
+            u_matrix.set_col(2, -u_matrix.get_col(2))
+        return u_matrix * v_matrix.make_transpose()
     
     def calc_singular_value_decomposition(self):
-        pass
+        # Return U, [s0, s1, s2], V such that this matrix is U*S*V^T, where U and V are orthogonal,
+        # and S is the diagonal matrix of the singular values, which are given in descending order.
+        # The columns of V are the eigen-vectors of M^T*M.  The columns of U are then found by
+        # orthonormalizing the columns of M*V, which holds up even when M is rank-deficient.
+        value_list, v_matrix = (self.make_transpose() * self).calc_eigen_value_decomposition()
+        v_matrix = Matrix3x3([v_matrix.elements[3 * i + 2 - j] for i in range(3) for j in range(3)])
+        column_list = [self * v_matrix.get_col(j) for j in range(3)]
+        tiny = 1e-12 * max(column_list[0].length(), 1e-300)
+        u_list = [column_list[0].normalized() if column_list[0].length() > tiny else Vector(1.0, 0.0, 0.0)]
+        column = column_list[1].rejected(u_list[0])
+        u_list.append(column.normalized() if column.length() > tiny else u_list[0].perpendicular_vector().normalized())
+        u_list.append(u_list[0].cross(u_list[1]))
+        if u_list[2].dot(column_list[2]) < 0.0:
+            u_list[2] = -u_list[2]
+        singular_value_list = [u_list[j].dot(column_list[j]) for j in range(3)]
+        u_matrix = Matrix3x3()
+        for j in range(3):
+            u_matrix.set_col(j, u_list[j])
+        return u_matrix, singular_value_list, v_matrix
     
-    def calc_eigen_value_decomposition(self):
-        pass
+    def calc_eigen_value_decomposition(self, max_sweeps=50):
+        # Assuming this matrix is symmetric, return [l0, l1, l2], V, where the eigen-values are given
+        # in ascending order, and where V is an orthogonal matrix whose columns are the corresponding
+        # unit-length eigen-vectors.  We use the cyclic Jacobi method, which repeatedly applies plane
+        # rotations that zero out one off-diagonal element at a time until the matrix is diagonal.
+        a = [[self.elements[3 * i + j] for j in range(3)] for i in range(3)]
+        v = [[1.0 if i == j else 0.0 for j in range(3)] for i in range(3)]
+        for sweep in range(max_sweeps):
+            off_diagonal = a[0][1] * a[0][1] + a[0][2] * a[0][2] + a[1][2] * a[1][2]
+            diagonal = a[0][0] * a[0][0] + a[1][1] * a[1][1] + a[2][2] * a[2][2]
+            if off_diagonal <= 1e-30 * diagonal or off_diagonal == 0.0:
+                break
+            for p, q in [(0, 1), (0, 2), (1, 2)]:
+                if a[p][q] == 0.0:
+                    continue
+                theta = (a[q][q] - a[p][p]) / (2.0 * a[p][q])
+                t = 1.0 / (math.fabs(theta) + math.sqrt(theta * theta + 1.0))
+                if theta < 0.0:
+                    t = -t
+                c = 1.0 / math.sqrt(t * t + 1.0)
+                s = t * c
+                for k in range(3):
+                    a_kp = a[k][p]
+                    a_kq = a[k][q]
+                    a[k][p] = c * a_kp - s * a_kq
+                    a[k][q] = s * a_kp + c * a_kq
+                for k in range(3):
+                    a_pk = a[p][k]
+                    a_qk = a[q][k]
+                    a[p][k] = c * a_pk - s * a_qk
+                    a[q][k] = s * a_pk + c * a_qk
+                for k in range(3):
+                    v_kp = v[k][p]
+                    v_kq = v[k][q]
+                    v[k][p] = c * v_kp - s * v_kq
+                    v[k][q] = s * v_kp + c * v_kq
+        order = sorted(range(3), key=lambda i: a[i][i])
+        value_list = [a[i][i] for i in order]
+        vector_matrix = Matrix3x3([v[i][j] for i in range(3) for j in order])
+        return value_list, vector_matrix
     
     def calc_graham_schmidt_decomposition(self):
-        pass
+        # Return Q, R such that this matrix is Q*R, where Q is orthogonal and R is upper-triangular.
+        # The columns of Q are found by orthonormalizing the columns of this matrix in order.
+        # If the columns are linearly dependent, Q is completed to an orthonormal basis anyway.
+        q_list = []
+        r_matrix = Matrix3x3([0.0] * 9)
+        for j in range(3):
+            column = self.get_col(j)
+            for i, q in enumerate(q_list):
+                r_matrix[i, j] = q.dot(column)
+                column.add_scaled(q, -r_matrix[i, j])
+            length = column.length()
+            r_matrix[j, j] = length
+            if length > 1e-12:
+                q_list.append(column / length)
+            elif j == 0:
+                q_list.append(Vector(1.0, 0.0, 0.0))
+            elif j == 1:
+                q_list.append(q_list[0].perpendicular_vector().normalized())
+            else:
+                q_list.append(q_list[0].cross(q_list[1]))
+        q_matrix = Matrix3x3()
+        for j in range(3):
+            q_matrix.set_col(j, q_list[j])
+        return q_matrix, r_matrix
 
     def __str__(self):
         matrix_str = ''
@@ -155,16 +260,11 @@ class Matrix3x3(object):
         return matrix_str
 
 if __name__ == '__main__':
-    matrix = Matrix3x3()
-    matrix.elements[0][0] = 3.0
-    matrix.elements[0][1] = 0.0
-    matrix.elements[0][2] = 2.0
-    matrix.elements[1][0] = 2.0
-    matrix.elements[1][1] = 0.0
-    matrix.elements[1][2] = -2.0
-    matrix.elements[2][0] = 0.0
-    matrix.elements[2][1] = 1.0
-    matrix.elements[2][2] = 1.0
+    matrix = Matrix3x3([
+        3.0, 0.0, 2.0,
+        2.0, 0.0, -2.0,
+        0.0, 1.0, 1.0
+    ])
     print(matrix)
     inv_matrix = matrix.calc_inverse()
     print(inv_matrix)
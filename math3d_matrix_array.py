@@ -0,0 +1,200 @@
+# math3d_matrix_array.py
+
+import numpy
+
+from math3d_matrix import Matrix3x3
+from math3d_vector import Vector
+from math3d_vector_array import VectorArray
+
+class Matrix3x3Array(object):
+    # An N x 3 x 3 array of matrices.  This is the batched counterpart of Matrix3x3;
+    # each operation here is carried out on all of the matrices in one vectorized call.
+
+    def __init__(self, array=None, copy=False):
+        if array is None:
+            array = numpy.zeros((0, 3, 3), dtype=numpy.float64)
+        elif isinstance(array, Matrix3x3Array):
+            array = array.array
+        array = numpy.ascontiguousarray(array, dtype=numpy.float64).reshape(-1, 3, 3)
+        self.array = array.copy() if copy else array
+
+    def clone(self):
+        return Matrix3x3Array(self.array, copy=True)
+
+    @staticmethod
+    def identity(count):
+        return Matrix3x3Array(numpy.tile(numpy.eye(3), (count, 1, 1)))
+
+    def from_matrix_list(self, matrix_list):
+        self.array = numpy.array([matrix.elements for matrix in matrix_list], dtype=numpy.float64).reshape(-1, 3, 3)
+        return self
+
+    def to_matrix_list(self):
+        return [Matrix3x3(elements) for elements in self.array.reshape(-1, 9).tolist()]
+
+    def from_rows(self, x_axes, y_axes, z_axes):
+        # Each of the given arguments is a VectorArray supplying one row of every matrix.
+        self.array = numpy.stack([x_axes.array, y_axes.array, z_axes.array], axis=1)
+        return self
+
+    def get_row(self, i):
+        return VectorArray(self.array[:, i, :])
+
+    def get_col(self, j):
+        return VectorArray(self.array[:, :, j])
+
+    def __len__(self):
+        return self.array.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, numpy.integer)):
+            return Matrix3x3(self.array[i].ravel().tolist())
+        return Matrix3x3Array(self.array[i])
+
+    def calc_determinant(self):
+        m = self.array
+        return (m[:, 0, 0] * (m[:, 1, 1] * m[:, 2, 2] - m[:, 1, 2] * m[:, 2, 1]) +
+                m[:, 0, 1] * (m[:, 1, 2] * m[:, 2, 0] - m[:, 1, 0] * m[:, 2, 2]) +
+                m[:, 0, 2] * (m[:, 1, 0] * m[:, 2, 1] - m[:, 1, 1] * m[:, 2, 0]))
+
+    def calc_adjoint(self):
+        # The rows of the adjoint are the cross products of the columns taken in pairs.
+        m = self.array
+        adjoint = numpy.empty_like(m)
+        adjoint[:, 0, :] = numpy.cross(m[:, :, 1], m[:, :, 2])
+        adjoint[:, 1, :] = numpy.cross(m[:, :, 2], m[:, :, 0])
+        adjoint[:, 2, :] = numpy.cross(m[:, :, 0], m[:, :, 1])
+        return Matrix3x3Array(adjoint)
+
+    def calc_inverse(self):
+        # Where Matrix3x3.calc_inverse would return None, the corresponding matrix here is all NaN.
+        adjoint = self.calc_adjoint().array
+        det = self.calc_determinant()
+        singular = det == 0.0
+        det[singular] = numpy.nan
+        return Matrix3x3Array(adjoint / det[:, numpy.newaxis, numpy.newaxis])
+
+    def make_transpose(self):
+        return Matrix3x3Array(self.array.transpose(0, 2, 1).copy())
+
+    @staticmethod
+    def _operand(other):
+        if isinstance(other, Matrix3x3Array):
+            return other.array
+        if isinstance(other, Matrix3x3):
+            return numpy.array(other.elements, dtype=numpy.float64).reshape(3, 3)
+        return other
+
+    def __mul__(self, other):
+        result = None
+        if isinstance(other, float):
+            result = Matrix3x3Array(self.array * other)
+        elif isinstance(other, (Matrix3x3Array, Matrix3x3)):
+            result = Matrix3x3Array(numpy.matmul(self.array, self._operand(other)))
+        elif isinstance(other, VectorArray):
+            result = VectorArray(numpy.einsum('nij,nj->ni', self.array, other.array))
+        elif isinstance(other, Vector):
+            result = VectorArray(self.array @ numpy.array([other.x, other.y, other.z], dtype=numpy.float64))
+        return result
+
+    def __rmul__(self, other):
+        result = None
+        if isinstance(other, float):
+            result = self * other
+        elif isinstance(other, Matrix3x3):
+            result = Matrix3x3Array(numpy.matmul(self._operand(other), self.array))
+        elif isinstance(other, VectorArray):
+            result = VectorArray(numpy.einsum('ni,nij->nj', other.array, self.array))
+        elif isinstance(other, Vector):
+            result = VectorArray(numpy.array([other.x, other.y, other.z], dtype=numpy.float64) @ self.array)
+        return result
+
+    def __truediv__(self, other):
+        result = None
+        if isinstance(other, float):
+            result = Matrix3x3Array(self.array / other)
+        elif isinstance(other, (Matrix3x3Array, Matrix3x3)):
+            if isinstance(other, Matrix3x3):
+                other = Matrix3x3Array(self._operand(other))
+            result = self * other.calc_inverse()
+        return result
+
+    def __add__(self, other):
+        return Matrix3x3Array(self.array + self._operand(other))
+
+    def __sub__(self, other):
+        return Matrix3x3Array(self.array - self._operand(other))
+
+    def calc_eigen_value_decomposition(self, max_sweeps=50):
+        # This is the batched form of Matrix3x3.calc_eigen_value_decomposition.  Every matrix is
+        # assumed to be symmetric.  An N x 3 array of eigen-values (ascending along each row) is
+        # returned along with a Matrix3x3Array whose columns are the corresponding unit eigen-vectors.
+        # The Jacobi rotations are applied to all matrices at once; those already diagonal get the identity.
+        a = self.array.copy()
+        v = numpy.tile(numpy.eye(3), (a.shape[0], 1, 1))
+        for sweep in range(max_sweeps):
+            off_diagonal = a[:, 0, 1] ** 2 + a[:, 0, 2] ** 2 + a[:, 1, 2] ** 2
+            diagonal = a[:, 0, 0] ** 2 + a[:, 1, 1] ** 2 + a[:, 2, 2] ** 2
+            if not numpy.any(off_diagonal > 1e-30 * diagonal):
+                break
+            for p, q in [(0, 1), (0, 2), (1, 2)]:
+                a_pq = a[:, p, q]
+                active = a_pq != 0.0
+                theta = numpy.divide(a[:, q, q] - a[:, p, p], 2.0 * a_pq, out=numpy.zeros_like(a_pq), where=active)
+                with numpy.errstate(over='ignore'):
+                    t = numpy.where(theta < 0.0, -1.0, 1.0) / (numpy.fabs(theta) + numpy.sqrt(theta * theta + 1.0))
+                t = numpy.where(active, t, 0.0)
+                c = (1.0 / numpy.sqrt(t * t + 1.0))[:, numpy.newaxis]
+                s = t[:, numpy.newaxis] * c
+                a_kp = a[:, :, p].copy()
+                a_kq = a[:, :, q].copy()
+                a[:, :, p] = c * a_kp - s * a_kq
+                a[:, :, q] = s * a_kp + c * a_kq
+                a_pk = a[:, p, :].copy()
+                a_qk = a[:, q, :].copy()
+                a[:, p, :] = c * a_pk - s * a_qk
+                a[:, q, :] = s * a_pk + c * a_qk
+                v_kp = v[:, :, p].copy()
+                v_kq = v[:, :, q].copy()
+                v[:, :, p] = c * v_kp - s * v_kq
+                v[:, :, q] = s * v_kp + c * v_kq
+        value_array = numpy.diagonal(a, axis1=1, axis2=2)
+        order = numpy.argsort(value_array, axis=1)
+        value_array = numpy.take_along_axis(value_array, order, axis=1)
+        vector_array = numpy.take_along_axis(v, order[:, numpy.newaxis, :], axis=2)
+        return value_array, Matrix3x3Array(vector_array)
+
+    def calc_singular_value_decomposition(self):
+        # This is the batched form of Matrix3x3.calc_singular_value_decomposition.  It returns
+        # U, S, V, where S is an N x 3 array of singular values, descending along each row.
+        value_array, v_matrices = (self.make_transpose() * self).calc_eigen_value_decomposition()
+        v = v_matrices.array[:, :, ::-1].copy()
+        columns = numpy.matmul(self.array, v)
+        u = numpy.empty_like(columns)
+        length = numpy.linalg.norm(columns[:, :, 0], axis=1)
+        tiny = 1e-12 * numpy.maximum(length, 1e-300)
+        u[:, :, 0] = numpy.where((length > tiny)[:, numpy.newaxis], columns[:, :, 0] / numpy.where(length > tiny, length, 1.0)[:, numpy.newaxis], [1.0, 0.0, 0.0])
+        column = columns[:, :, 1] - u[:, :, 0] * numpy.einsum('ni,ni->n', u[:, :, 0], columns[:, :, 1])[:, numpy.newaxis]
+        length = numpy.linalg.norm(column, axis=1)
+        u[:, :, 1] = numpy.where((length > tiny)[:, numpy.newaxis], column / numpy.where(length > tiny, length, 1.0)[:, numpy.newaxis], self._perpendicular(u[:, :, 0]))
+        u[:, :, 2] = numpy.cross(u[:, :, 0], u[:, :, 1])
+        flip = numpy.einsum('ni,ni->n', u[:, :, 2], columns[:, :, 2]) < 0.0
+        u[flip, :, 2] *= -1.0
+        singular_value_array = numpy.einsum('nij,nij->nj', u, columns)
+        return Matrix3x3Array(u), singular_value_array, Matrix3x3Array(v)
+
+    @staticmethod
+    def _perpendicular(unit_vectors):
+        # Return some unit vector perpendicular to each of the given unit vectors.
+        axis = numpy.zeros_like(unit_vectors)
+        axis[numpy.arange(len(unit_vectors)), numpy.argmin(numpy.fabs(unit_vectors), axis=1)] = 1.0
+        perpendicular = numpy.cross(unit_vectors, axis)
+        return perpendicular / numpy.linalg.norm(perpendicular, axis=1)[:, numpy.newaxis]
+
+    def calc_bestfit_orientation(self):
+        # This is the batched form of Matrix3x3.calc_bestfit_orientation.
+        u_matrices, singular_value_array, v_matrices = self.calc_singular_value_decomposition()
+        u = u_matrices.array
+        flip = u_matrices.calc_determinant() * v_matrices.calc_determinant() < 0.0
+        u[flip, :, 2] *= -1.0
+        return Matrix3x3Array(numpy.matmul(u, v_matrices.make_transpose().array))
@@ -0,0 +1,122 @@
+# math3d_mesh_cutter.py
+
+import numpy
+
+from collections import deque
+
+from math3d_side import Side, SideCode
+from math3d_triangle import Triangle
+from math3d_line_segment import LineSegment
+from math3d_bvh import BoundingVolumeHierarchy
+from math3d_plane_array import PlaneArray
+from math3d_vector_array import VectorArray
+
+class MeshCutter(object):
+    # This does the work of TriangleMesh.split_against_mesh for a convex cut-shape.  Everything we need
+    # to know about the cut-shape is worked out once, up front: the plane of each of its triangles, and
+    # a BVH of their bounds to quickly find those that might meet a given triangle.  Each source triangle
+    # is then cut independently of the others, so the triangles may be divided among processes, each
+    # with a cutter of its own.
+
+    def __init__(self, tri_mesh, eps=1e-7):
+        self.eps = eps
+        self.cutting_triangle_list = tri_mesh.to_triangle_list()
+        self.cutting_plane_list = [cutting_triangle.calc_plane() for cutting_triangle in self.cutting_triangle_list]
+        self.cutting_plane_array = PlaneArray(self.cutting_plane_list)
+        self.bvh = BoundingVolumeHierarchy(tri_mesh)
+
+    def split_triangle_list(self, vertex_list, triangle_list):
+        # Cut up the given triples of offsets into the given vertex list, returning the triples inside the
+        # cut-shape and those outside it.  Cut points are appended to the vertex list.  Candidates are tried
+        # in the order of the cut-shape's triangle list.  Each edge is cut by a given plane at most once, so
+        # triangles sharing an edge also share the cut point on it.  The side of each vertex with respect to
+        # the cut-shape is worked out only once, a vertex being inside only if it is behind every plane.
+        eps = self.eps
+        inside_list = []
+        cut_map = {}
+
+        def is_inside(i):
+            if i >= len(inside_list):
+                side_array = self.cutting_plane_array.side_array(VectorArray().from_vector_list(vertex_list[len(inside_list):]), eps)
+                inside_list.extend(numpy.all(side_array != SideCode.FRONT, axis=1).tolist())
+            return inside_list[i]
+
+        back_triangle_list = []
+        front_triangle_list = []
+        queue = deque(triangle_list)
+        while len(queue) > 0:
+            triple = queue.popleft()
+            if all([is_inside(i) for i in triple]):
+                back_triangle_list.append(triple)
+                continue
+            point_a, point_b, point_c = vertex_list[triple[0]], vertex_list[triple[1]], vertex_list[triple[2]]
+            triangle = Triangle(point_a, point_b, point_c, copy=False)
+            box_min = (min(point_a.x, point_b.x, point_c.x), min(point_a.y, point_b.y, point_c.y), min(point_a.z, point_b.z, point_c.z))
+            box_max = (max(point_a.x, point_b.x, point_c.x), max(point_a.y, point_b.y, point_c.y), max(point_a.z, point_b.z, point_c.z))
+            for j in self.bvh.find_overlapping_boxes(box_min, box_max, 4.0 * eps):
+                if triangle.intersect_with(self.cutting_triangle_list[j]) is not None:
+                    back_list, front_list = self._split_triple_against_plane(vertex_list, triple, j, cut_map)
+                    if len(back_list) > 0 and len(front_list) > 0:
+                        queue.extend(back_list + front_list)
+                        break
+            else:
+                front_triangle_list.append(triple)
+        return back_triangle_list, front_triangle_list
+
+    def _split_triple_against_plane(self, vertex_list, triple, j, cut_map):
+        # This is Triangle.split_against_plane for a triple of offsets into the given vertex list and the plane of
+        # the j-th cutting triangle.  Cut points are appended to the list, and remembered in the given map by edge
+        # and plane.  The cut point of an edge is worked out from its lower offset end so that it never depends on
+        # which of the triangles sharing the edge gets there first.
+        plane = self.cutting_plane_list[j]
+        back_list = []
+        front_list = []
+        triple_list = [triple]
+        while len(triple_list) > 0:
+            triple = triple_list.pop(0)
+            side_list = [plane.side(vertex_list[i], self.eps) for i in triple]
+            if all([side == Side.NEITHER for side in side_list]):
+                pass
+            elif all([side == Side.BACK or side == Side.NEITHER for side in side_list]):
+                back_list.append(triple)
+            elif all([side == Side.FRONT or side == Side.NEITHER for side in side_list]):
+                front_list.append(triple)
+            else:
+                for i in range(3):
+                    k = (i + 1) % 3
+                    if (side_list[i] == Side.BACK and side_list[k] == Side.FRONT or
+                            side_list[i] == Side.FRONT and side_list[k] == Side.BACK):
+                        key = (min(triple[i], triple[k]), max(triple[i], triple[k]), j)
+                        cut = cut_map.get(key)
+                        if cut is None:
+                            line_segment = LineSegment(vertex_list[key[0]], vertex_list[key[1]], copy=False)
+                            alpha = plane.intersect_line_segment(line_segment)
+                            vertex_list.append(line_segment.lerp(alpha))
+                            cut = len(vertex_list) - 1
+                            cut_map[key] = cut
+                        triple_list.append((triple[i], cut, triple[(i + 2) % 3]))
+                        triple_list.append((cut, triple[k], triple[(i + 2) % 3]))
+                        break
+        return back_list, front_list
+
+# Each worker process of TriangleMesh.split_against_mesh is handed the cut-shape and the source mesh once,
+# as arrays, when it starts.  After that, it's only ever sent ranges of source triangles to cut.
+_worker_state = None
+
+def _init_worker(cutter_vertex_array, cutter_index_array, vertex_array, index_array, eps):
+    from math3d_triangle_mesh import TriangleMesh
+    global _worker_state
+    cutter = MeshCutter(TriangleMesh().from_arrays(cutter_vertex_array, cutter_index_array), eps)
+    _worker_state = (cutter, vertex_array, index_array)
+
+def _split_range(triangle_range):
+    # Cut the given range of source triangles, returning the vertices used (as an array) along with the back
+    # and front triples, both indexing into that array.
+    cutter, vertex_array, index_array = _worker_state
+    start, end = triangle_range
+    index_array = index_array[start:end]
+    used_array, index_array = numpy.unique(index_array, return_inverse=True)
+    vertex_list = VectorArray(vertex_array[used_array]).to_vector_list()
+    triangle_list = [(i, j, k) for i, j, k in index_array.reshape(-1, 3).tolist()]
+    back_list, front_list = cutter.split_triangle_list(vertex_list, triangle_list)
+    return VectorArray().from_vector_list(vertex_list).array, back_list, front_list
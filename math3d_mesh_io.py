@@ -0,0 +1,343 @@
+# math3d_mesh_io.py
+
+import os
+import struct
+import numpy
+
+from math3d_vector import Vector
+from math3d_triangle import Triangle
+from math3d_triangle_mesh import TriangleMesh
+from math3d_vector_array import VectorArray
+
+# Readers and writers for the OBJ, STL (binary and ASCII) and PLY (binary and ASCII) file formats.
+# Files are read a line or a fixed-size chunk at a time, so that memory use is bounded by the size
+# of the mesh being built rather than that of the file.  Likewise, meshes are written out a chunk
+# at a time.  Each reader can add to an existing mesh, and if asked to weld, adds each vertex with
+# TriangleMesh.find_or_add_vertex so that vertices within eps of one another are merged.
+
+_STL_RECORD = numpy.dtype([('normal', '<f4', (3,)), ('points', '<f4', (3, 3)), ('attribute', '<u2')])
+
+_PLY_TYPE_MAP = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'
+}
+
+class _VertexSink(object):
+    # Where a reader puts the vertices it reads.  Each vertex read gets the offset in the mesh of
+    # the vertex that stands for it, which is a new vertex unless we are welding.
+    def __init__(self, tri_mesh, weld, eps):
+        self.tri_mesh = tri_mesh
+        self.weld = weld
+        self.eps = eps
+
+    def add_vertex(self, x, y, z):
+        vertex = Vector(x, y, z)
+        if self.weld:
+            return self.tri_mesh.find_or_add_vertex(vertex, self.eps)
+        self.tri_mesh.vertex_list.append(vertex)
+        return len(self.tri_mesh.vertex_list) - 1
+
+    def add_vertex_array(self, vertex_array):
+        if self.weld:
+            return [self.add_vertex(x, y, z) for x, y, z in vertex_array.tolist()]
+        start = len(self.tri_mesh.vertex_list)
+        self.tri_mesh.vertex_list += VectorArray(vertex_array).to_vector_list()
+        return list(range(start, len(self.tri_mesh.vertex_list)))
+
+    def add_polygon(self, offset_list):
+        # Polygons are triangulated as a fan about their first vertex.
+        for k in range(1, len(offset_list) - 1):
+            self.tri_mesh.triangle_list.append((offset_list[0], offset_list[k], offset_list[k + 1]))
+
+def read_mesh(path, tri_mesh=None, weld=False, eps=1e-7, chunk_size=65536):
+    # Read the given file, choosing the reader by the file's extension.
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.obj':
+        return read_obj(path, tri_mesh, weld, eps)
+    elif extension == '.stl':
+        return read_stl(path, tri_mesh, weld, eps, chunk_size)
+    elif extension == '.ply':
+        return read_ply(path, tri_mesh, weld, eps, chunk_size)
+    raise Exception('Unsupported mesh file extension: %s' % extension)
+
+def write_mesh(tri_mesh, path, binary=True, chunk_size=65536):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.obj':
+        return write_obj(tri_mesh, path, chunk_size)
+    elif extension == '.stl':
+        return write_stl(tri_mesh, path, binary, chunk_size)
+    elif extension == '.ply':
+        return write_ply(tri_mesh, path, binary, chunk_size)
+    raise Exception('Unsupported mesh file extension: %s' % extension)
+
+def _parse_obj_index(token, vertex_count):
+    # A face corner is v, v/vt, v//vn or v/vt/vn, and v is one-based, or relative to the end if negative.
+    i = int(token.split('/')[0])
+    return i - 1 if i > 0 else vertex_count + i
+
+def yield_obj_triangles(path):
+    # Generate the triangles of the given OBJ file.  Only the vertex positions are kept in memory.
+    vertex_list = []
+    with open(path, 'r') as handle:
+        for line in handle:
+            token_list = line.split()
+            if len(token_list) == 0:
+                continue
+            if token_list[0] == 'v':
+                vertex_list.append(Vector(float(token_list[1]), float(token_list[2]), float(token_list[3])))
+            elif token_list[0] == 'f':
+                offset_list = [_parse_obj_index(token, len(vertex_list)) for token in token_list[1:]]
+                for k in range(1, len(offset_list) - 1):
+                    yield Triangle(vertex_list[offset_list[0]], vertex_list[offset_list[k]], vertex_list[offset_list[k + 1]])
+
+def read_obj(path, tri_mesh=None, weld=False, eps=1e-7):
+    tri_mesh = tri_mesh if tri_mesh is not None else TriangleMesh()
+    sink = _VertexSink(tri_mesh, weld, eps)
+    offset_map = []
+    with open(path, 'r') as handle:
+        for line in handle:
+            token_list = line.split()
+            if len(token_list) == 0:
+                continue
+            if token_list[0] == 'v':
+                offset_map.append(sink.add_vertex(float(token_list[1]), float(token_list[2]), float(token_list[3])))
+            elif token_list[0] == 'f':
+                sink.add_polygon([offset_map[_parse_obj_index(token, len(offset_map))] for token in token_list[1:]])
+    return tri_mesh
+
+def write_obj(tri_mesh, path, chunk_size=65536):
+    with open(path, 'w') as handle:
+        for start in range(0, len(tri_mesh.vertex_list), chunk_size):
+            vertex_array = VectorArray().from_vector_list(tri_mesh.vertex_list[start:start + chunk_size]).array
+            handle.write(''.join(['v %r %r %r\n' % (x, y, z) for x, y, z in vertex_array.tolist()]))
+        for start in range(0, len(tri_mesh.triangle_list), chunk_size):
+            triangle_list = tri_mesh.triangle_list[start:start + chunk_size]
+            handle.write(''.join(['f %d %d %d\n' % (i + 1, j + 1, k + 1) for i, j, k in triangle_list]))
+
+def _is_binary_stl(path):
+    # An ASCII STL file starts with "solid", but so do some binary ones, so we go by the size instead.
+    size = os.path.getsize(path)
+    if size < 84:
+        return False
+    with open(path, 'rb') as handle:
+        handle.seek(80)
+        count = struct.unpack('<I', handle.read(4))[0]
+    return size == 84 + count * _STL_RECORD.itemsize
+
+def yield_stl_chunks(path, chunk_size=65536):
+    # Generate the triangles of the given STL file as arrays of up to chunk_size x 3 x 3 coordinates.
+    if _is_binary_stl(path):
+        with open(path, 'rb') as handle:
+            handle.seek(80)
+            count = struct.unpack('<I', handle.read(4))[0]
+            while count > 0:
+                record_count = min(count, chunk_size)
+                buffer = handle.read(record_count * _STL_RECORD.itemsize)
+                record_count = len(buffer) // _STL_RECORD.itemsize
+                if record_count == 0:
+                    break
+                yield numpy.frombuffer(buffer, dtype=_STL_RECORD, count=record_count)['points'].astype(numpy.float64)
+                count -= record_count
+    else:
+        with open(path, 'r') as handle:
+            coordinate_list = []
+            for line in handle:
+                token_list = line.split()
+                if len(token_list) == 4 and token_list[0] == 'vertex':
+                    coordinate_list.append((float(token_list[1]), float(token_list[2]), float(token_list[3])))
+                    if len(coordinate_list) == 9 * chunk_size:
+                        yield numpy.array(coordinate_list, dtype=numpy.float64).reshape(-1, 3, 3)
+                        coordinate_list = []
+            if len(coordinate_list) >= 3:
+                yield numpy.array(coordinate_list[:len(coordinate_list) - len(coordinate_list) % 3], dtype=numpy.float64).reshape(-1, 3, 3)
+
+def yield_stl_triangles(path, chunk_size=65536):
+    for point_array in yield_stl_chunks(path, chunk_size):
+        for a, b, c in point_array.tolist():
+            yield Triangle(Vector(*a), Vector(*b), Vector(*c), copy=False)
+
+def read_stl(path, tri_mesh=None, weld=False, eps=1e-7, chunk_size=65536):
+    # STL files list the corners of each triangle separately, so unless we weld, every triangle gets vertices of its own.
+    tri_mesh = tri_mesh if tri_mesh is not None else TriangleMesh()
+    sink = _VertexSink(tri_mesh, weld, eps)
+    for point_array in yield_stl_chunks(path, chunk_size):
+        offset_list = sink.add_vertex_array(point_array.reshape(-1, 3))
+        tri_mesh.triangle_list += [tuple(offset_list[k:k + 3]) for k in range(0, len(offset_list), 3)]
+    return tri_mesh
+
+def _calc_unit_normal_array(point_array):
+    normal_array = numpy.cross(point_array[:, 1] - point_array[:, 0], point_array[:, 2] - point_array[:, 0])
+    length_array = numpy.linalg.norm(normal_array, axis=1)
+    valid = length_array > 0.0
+    normal_array[valid] /= length_array[valid, numpy.newaxis]
+    return normal_array
+
+def _yield_triangle_point_chunks(tri_mesh, chunk_size):
+    # Generate the corners of the mesh's triangles as arrays of up to chunk_size x 3 x 3 coordinates.
+    for start in range(0, len(tri_mesh.triangle_list), chunk_size):
+        triangle_list = tri_mesh.triangle_list[start:start + chunk_size]
+        yield VectorArray().from_vector_list([tri_mesh.vertex_list[i] for triple in triangle_list for i in triple]).array.reshape(-1, 3, 3)
+
+def write_stl(tri_mesh, path, binary=True, chunk_size=65536):
+    if binary:
+        with open(path, 'wb') as handle:
+            handle.write(b'math3d'.ljust(80, b'\0'))
+            handle.write(struct.pack('<I', len(tri_mesh.triangle_list)))
+            for point_array in _yield_triangle_point_chunks(tri_mesh, chunk_size):
+                record_array = numpy.zeros(len(point_array), dtype=_STL_RECORD)
+                record_array['normal'] = _calc_unit_normal_array(point_array)
+                record_array['points'] = point_array
+                record_array.tofile(handle)
+    else:
+        with open(path, 'w') as handle:
+            handle.write('solid math3d\n')
+            for point_array in _yield_triangle_point_chunks(tri_mesh, chunk_size):
+                text_list = []
+                for normal, (a, b, c) in zip(_calc_unit_normal_array(point_array).tolist(), point_array.tolist()):
+                    text_list.append('facet normal %r %r %r\n outer loop\n' % tuple(normal))
+                    text_list.append('  vertex %r %r %r\n  vertex %r %r %r\n  vertex %r %r %r\n' % tuple(a + b + c))
+                    text_list.append(' endloop\nendfacet\n')
+                handle.write(''.join(text_list))
+            handle.write('endsolid math3d\n')
+
+def _read_ply_header(handle):
+    # Return the format and a list of (name, count, property_list) for each element, where each property
+    # is (name, type) for a scalar or (name, count_type, item_type) for a list.
+    if handle.readline().strip() != b'ply':
+        raise Exception('The file is not a PLY file.')
+    format = None
+    element_list = []
+    while True:
+        line = handle.readline()
+        if len(line) == 0:
+            raise Exception('The PLY header is incomplete.')
+        token_list = line.decode('ascii').split()
+        if len(token_list) == 0 or token_list[0] in ('comment', 'obj_info'):
+            continue
+        if token_list[0] == 'end_header':
+            break
+        if token_list[0] == 'format':
+            format = token_list[1]
+        elif token_list[0] == 'element':
+            element_list.append((token_list[1], int(token_list[2]), []))
+        elif token_list[0] == 'property':
+            if token_list[1] == 'list':
+                element_list[-1][2].append((token_list[4], _PLY_TYPE_MAP[token_list[2]], _PLY_TYPE_MAP[token_list[3]]))
+            else:
+                element_list[-1][2].append((token_list[2], _PLY_TYPE_MAP[token_list[1]]))
+    if format not in ('ascii', 'binary_little_endian', 'binary_big_endian'):
+        raise Exception('Unsupported PLY format: %s' % format)
+    return format, element_list
+
+def _yield_ply_element_rows(handle, format, count, property_list, chunk_size):
+    # Generate the rows of an element, in chunks, as lists of values, with each list property as a list.
+    if format == 'ascii':
+        row_list = []
+        for n in range(count):
+            token_list = handle.readline().split()
+            row = []
+            k = 0
+            for property in property_list:
+                if len(property) == 3:
+                    length = int(token_list[k])
+                    row.append([float(token) if 'f' in property[2] else int(token) for token in token_list[k + 1:k + 1 + length]])
+                    k += 1 + length
+                else:
+                    row.append(float(token_list[k]) if 'f' in property[1] else int(token_list[k]))
+                    k += 1
+            row_list.append(row)
+            if len(row_list) == chunk_size:
+                yield row_list
+                row_list = []
+        if len(row_list) > 0:
+            yield row_list
+        return
+    order = '<' if format == 'binary_little_endian' else '>'
+    if all([len(property) == 2 for property in property_list]):
+        # Rows of fixed size can be read a whole chunk at a time.
+        dtype = numpy.dtype([(property[0], order + property[1]) for property in property_list])
+        while count > 0:
+            row_count = min(count, chunk_size)
+            array = numpy.frombuffer(handle.read(row_count * dtype.itemsize), dtype=dtype, count=row_count)
+            yield [list(row) for row in array.tolist()]
+            count -= row_count
+        return
+    row_list = []
+    for n in range(count):
+        row = []
+        for property in property_list:
+            if len(property) == 3:
+                count_type = struct.Struct(order + numpy.dtype(property[1]).char)
+                item_type = numpy.dtype(property[2]).newbyteorder(order)
+                length = count_type.unpack(handle.read(count_type.size))[0]
+                row.append(numpy.frombuffer(handle.read(length * item_type.itemsize), dtype=item_type, count=length).tolist())
+            else:
+                scalar_type = struct.Struct(order + numpy.dtype(property[1]).char)
+                row.append(scalar_type.unpack(handle.read(scalar_type.size))[0])
+        row_list.append(row)
+        if len(row_list) == chunk_size:
+            yield row_list
+            row_list = []
+    if len(row_list) > 0:
+        yield row_list
+
+def _yield_ply_records(path, chunk_size):
+    # Generate ('vertex', vertex_array) and ('face', polygon_list) chunks in file order.
+    with open(path, 'rb') as handle:
+        format, element_list = _read_ply_header(handle)
+        for name, count, property_list in element_list:
+            name_list = [property[0] for property in property_list]
+            for row_list in _yield_ply_element_rows(handle, format, count, property_list, chunk_size):
+                if name == 'vertex':
+                    x, y, z = name_list.index('x'), name_list.index('y'), name_list.index('z')
+                    yield 'vertex', numpy.array([(row[x], row[y], row[z]) for row in row_list], dtype=numpy.float64).reshape(-1, 3)
+                elif name == 'face':
+                    k = name_list.index('vertex_indices') if 'vertex_indices' in name_list else name_list.index('vertex_index')
+                    yield 'face', [row[k] for row in row_list]
+
+def yield_ply_triangles(path, chunk_size=65536):
+    vertex_list = []
+    for kind, data in _yield_ply_records(path, chunk_size):
+        if kind == 'vertex':
+            vertex_list += VectorArray(data).to_vector_list()
+        else:
+            for polygon in data:
+                for k in range(1, len(polygon) - 1):
+                    yield Triangle(vertex_list[polygon[0]], vertex_list[polygon[k]], vertex_list[polygon[k + 1]])
+
+def read_ply(path, tri_mesh=None, weld=False, eps=1e-7, chunk_size=65536):
+    tri_mesh = tri_mesh if tri_mesh is not None else TriangleMesh()
+    sink = _VertexSink(tri_mesh, weld, eps)
+    offset_map = []
+    for kind, data in _yield_ply_records(path, chunk_size):
+        if kind == 'vertex':
+            offset_map += sink.add_vertex_array(data)
+        else:
+            for polygon in data:
+                sink.add_polygon([offset_map[i] for i in polygon])
+    return tri_mesh
+
+def write_ply(tri_mesh, path, binary=True, chunk_size=65536):
+    header = 'ply\nformat %s 1.0\ncomment math3d\n' % ('binary_little_endian' if binary else 'ascii')
+    header += 'element vertex %d\nproperty double x\nproperty double y\nproperty double z\n' % len(tri_mesh.vertex_list)
+    header += 'element face %d\nproperty list uchar int vertex_indices\nend_header\n' % len(tri_mesh.triangle_list)
+    with open(path, 'wb') as handle:
+        handle.write(header.encode('ascii'))
+        for start in range(0, len(tri_mesh.vertex_list), chunk_size):
+            vertex_array = VectorArray().from_vector_list(tri_mesh.vertex_list[start:start + chunk_size]).array
+            if binary:
+                vertex_array.astype('<f8').tofile(handle)
+            else:
+                handle.write(''.join(['%r %r %r\n' % (x, y, z) for x, y, z in vertex_array.tolist()]).encode('ascii'))
+        face_dtype = numpy.dtype([('count', 'u1'), ('indices', '<i4', (3,))])
+        for start in range(0, len(tri_mesh.triangle_list), chunk_size):
+            triangle_list = tri_mesh.triangle_list[start:start + chunk_size]
+            if binary:
+                face_array = numpy.zeros(len(triangle_list), dtype=face_dtype)
+                face_array['count'] = 3
+                face_array['indices'] = numpy.array(triangle_list, dtype=numpy.int64).reshape(-1, 3)
+                face_array.tofile(handle)
+            else:
+                handle.write(''.join(['3 %d %d %d\n' % (i, j, k) for i, j, k in triangle_list]).encode('ascii'))
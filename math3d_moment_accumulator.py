@@ -0,0 +1,93 @@
+# math3d_moment_accumulator.py
+
+import numpy
+
+from math3d_vector import Vector
+from math3d_plane import Plane
+
+class MomentAccumulator(object):
+    # This keeps the count, mean and 3x3 matrix of summed deviation products (the scatter matrix) of the points
+    # it is fed, which is all we need to fit a plane to them by least squares.  Points may be added one at a time
+    # or a chunk at a time, and accumulators fed disjoint sets of points (in other processes, say) can be merged.
+    # Chunks are combined by the pair-wise update of Chan et al., which, unlike summing raw second moments, does
+    # not lose precision when the points lie far from the origin.
+
+    def __init__(self):
+        self.count = 0
+        self.mean = numpy.zeros(3, dtype=numpy.float64)
+        self.scatter = numpy.zeros((3, 3), dtype=numpy.float64)
+
+    def clone(self):
+        accumulator = MomentAccumulator()
+        accumulator.count = self.count
+        accumulator.mean = self.mean.copy()
+        accumulator.scatter = self.scatter.copy()
+        return accumulator
+
+    def to_dict(self):
+        data = {
+            'count': self.count,
+            'mean': self.mean.tolist(),
+            'scatter': self.scatter.ravel().tolist()
+        }
+        return data
+
+    def from_dict(self, data):
+        self.count = data.get('count', 0)
+        self.mean = numpy.array(data.get('mean', [0.0, 0.0, 0.0]), dtype=numpy.float64)
+        self.scatter = numpy.array(data.get('scatter', [0.0] * 9), dtype=numpy.float64).reshape(3, 3)
+        return self
+
+    def _combine(self, count, mean, scatter):
+        total_count = self.count + count
+        if count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.scatter = count, mean.copy(), scatter.copy()
+            return
+        delta = mean - self.mean
+        self.scatter = self.scatter + scatter + numpy.outer(delta, delta) * (float(self.count) * float(count) / float(total_count))
+        self.mean = self.mean + delta * (float(count) / float(total_count))
+        self.count = total_count
+
+    def add_point(self, point):
+        self._combine(1, numpy.array([point.x, point.y, point.z], dtype=numpy.float64), numpy.zeros((3, 3), dtype=numpy.float64))
+        return self
+
+    def add_array(self, point_array):
+        # Add the points of the given N x 3 array (or VectorArray.)
+        from math3d_vector_array import VectorArray
+        point_array = VectorArray(point_array).array
+        if len(point_array) == 0:
+            return self
+        mean = point_array.mean(axis=0)
+        deviation_array = point_array - mean
+        self._combine(len(point_array), mean, deviation_array.T @ deviation_array)
+        return self
+
+    def add_chunks(self, chunk_iter):
+        for chunk in chunk_iter:
+            self.add_array(chunk)
+        return self
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.scatter)
+        return self
+
+    def calc_centroid(self):
+        return Vector(*self.mean.tolist())
+
+    def calc_covariance(self):
+        return self.scatter / float(self.count) if self.count > 0 else numpy.zeros((3, 3), dtype=numpy.float64)
+
+    def fit_plane(self):
+        # We want the plane minimizing the sum of squared distances from the points to it.
+        # Such a plane always passes through the centroid c of the points, and if n is its unit normal,
+        # the sum in question is n^T*C*n, where C = Sum_i (p_i - c)(p_i - c)^T is the 3x3 scatter
+        # matrix of the points.  This is minimized by the eigen-vector of C with the smallest eigen-value.
+        # Since C is symmetric, its eigen-values are real and the Jacobi method finds them reliably.
+        from math3d_matrix import Matrix3x3
+        if self.count == 0:
+            raise Exception('Cannot fit a plane to no points.')
+        value_list, vector_matrix = Matrix3x3(self.scatter.ravel().tolist()).calc_eigen_value_decomposition()
+        return Plane(self.calc_centroid(), vector_matrix.get_col(0))
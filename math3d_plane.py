@@ -1,12 +1,15 @@
 # math3d_plane.py
 
-from math3d_side import Side
+from math3d_side import Side, SideCode
 from math3d_vector import Vector
 
 class Plane(object):
-    def __init__(self, center, normal):
-        self.center = center.clone()
-        self.unit_normal = normal.clone()
+    __slots__ = ('center', 'unit_normal')
+
+    def __init__(self, center, normal, copy=True):
+        # Pass copy=False when the given vectors are not shared with anyone else.
+        self.center = center.clone() if copy else center
+        self.unit_normal = normal.clone() if copy else normal
         self.normalize()
 
     def normalize(self):
@@ -48,11 +51,24 @@ class Plane(object):
             return Side.BACK
         return Side.NEITHER
 
+    def side_array(self, point_array, eps=1e-7):
+        # Classify every point of the given VectorArray (or N x 3 array) at once, returning an
+        # array of SideCode values.  This agrees point for point with the side method.
+        return SideCode.from_distance_array(self.point_distance_array(point_array), eps)
+
     def nearest_point(self, point):
         return point - (point - self.center).projected(self.unit_normal)
     
     def point_distance(self, point):
         return (point - self.center).dot(self.unit_normal)
+
+    def point_distance_array(self, point_array):
+        # Return the signed distances of all the points of the given VectorArray (or N x 3 array) from the plane.
+        # The arithmetic is done in the same order as in point_distance, so the results match it exactly.
+        from math3d_vector_array import VectorArray
+        point_array = VectorArray(point_array).array
+        center, normal = self.center, self.unit_normal
+        return (point_array[:, 0] - center.x) * normal.x + (point_array[:, 1] - center.y) * normal.y + (point_array[:, 2] - center.z) * normal.z
     
     def intersect_line_segment(self, line_segment):
         numer = (self.center - line_segment.point_a).dot(self.unit_normal)
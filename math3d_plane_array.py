@@ -0,0 +1,46 @@
+# math3d_plane_array.py
+
+import numpy
+
+from math3d_plane import Plane
+from math3d_side import SideCode
+from math3d_vector import Vector
+from math3d_vector_array import VectorArray
+
+class PlaneArray(object):
+    # A list of K planes kept as a K x 3 array of centers and a K x 3 array of unit normals.
+    # This lets N points be classified against all K planes in one vectorized pass, giving
+    # N x K arrays whose column k is what Plane.point_distance_array or Plane.side_array
+    # would give for the k-th plane.
+
+    def __init__(self, plane_list=None):
+        self.center_array = numpy.zeros((0, 3), dtype=numpy.float64)
+        self.normal_array = numpy.zeros((0, 3), dtype=numpy.float64)
+        if plane_list is not None:
+            self.from_plane_list(plane_list)
+
+    def from_plane_list(self, plane_list):
+        self.center_array = VectorArray().from_vector_list([plane.center for plane in plane_list]).array
+        self.normal_array = VectorArray().from_vector_list([plane.unit_normal for plane in plane_list]).array
+        return self
+
+    def to_plane_list(self):
+        return [self[k] for k in range(len(self))]
+
+    def __len__(self):
+        return self.center_array.shape[0]
+
+    def __getitem__(self, k):
+        return Plane(Vector(*self.center_array[k].tolist()), Vector(*self.normal_array[k].tolist()), copy=False)
+
+    def point_distance_array(self, point_array):
+        # Return the N x K array of signed distances from each of the given points to each plane.
+        point_array = VectorArray(point_array).array
+        distance_array = numpy.zeros((point_array.shape[0], len(self)), dtype=numpy.float64)
+        for i in range(3):
+            distance_array += (point_array[:, i, numpy.newaxis] - self.center_array[:, i]) * self.normal_array[:, i]
+        return distance_array
+
+    def side_array(self, point_array, eps=1e-7):
+        # Return the N x K array of SideCode values of each of the given points with respect to each plane.
+        return SideCode.from_distance_array(self.point_distance_array(point_array), eps)
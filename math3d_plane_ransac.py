@@ -0,0 +1,84 @@
+# math3d_plane_ransac.py
+
+import numpy
+
+from math3d_moment_accumulator import MomentAccumulator
+
+class PlaneRansac(object):
+    # This fits a plane to a point-cloud containing outliers by random sample consensus.  Each hypothesis is
+    # the plane through three points picked at random, and is scored by how many points are within the given
+    # distance of it.  The plane of the best hypothesis is then refit by least squares to just those points.
+    # All the hypotheses are drawn up front and scored together, in batches, on a single pass over the points,
+    # so the point-cloud is only ever gone through three times (to sample, to score and to refit), a chunk at a
+    # time, which suits a MappedPointCloud as well as an ordinary one.
+
+    def __init__(self, distance_threshold, hypothesis_count=256, batch_size=64, seed=None, eps=1e-7):
+        self.distance_threshold = distance_threshold
+        self.hypothesis_count = hypothesis_count
+        self.batch_size = batch_size
+        self.seed = seed
+        self.eps = eps
+        self.inlier_count = 0
+        self.inlier_array = None
+
+    def _gather_points(self, point_cloud, index_array):
+        # Return the points at the given offsets as a K x 3 array, going through the point-cloud a chunk at a time.
+        order_array = numpy.argsort(index_array, kind='stable')
+        sorted_array = index_array[order_array]
+        point_array = numpy.zeros((len(index_array), 3), dtype=numpy.float64)
+        start = 0
+        for chunk in point_cloud.yield_chunks():
+            first, last = numpy.searchsorted(sorted_array, [start, start + len(chunk)])
+            point_array[order_array[first:last]] = chunk[sorted_array[first:last] - start]
+            start += len(chunk)
+        return point_array
+
+    def _make_hypotheses(self, point_cloud, point_count):
+        # Return the unit normals and offsets of the planes through random triples of points, dropping degenerate triples.
+        # A triple is degenerate if its cross product is short next to the square of the extent of all the points sampled,
+        # so that the test doesn't depend on the units the points are given in.
+        rng = numpy.random.default_rng(self.seed)
+        index_array = rng.integers(0, point_count, size=3 * self.hypothesis_count)
+        point_array = self._gather_points(point_cloud, index_array)
+        extent = numpy.linalg.norm(point_array.max(axis=0) - point_array.min(axis=0))
+        point_array = point_array.reshape(-1, 3, 3)
+        normal_array = numpy.cross(point_array[:, 1] - point_array[:, 0], point_array[:, 2] - point_array[:, 0])
+        length_array = numpy.linalg.norm(normal_array, axis=1)
+        valid = length_array > self.eps * extent * extent
+        normal_array = normal_array[valid] / length_array[valid, numpy.newaxis]
+        offset_array = numpy.einsum('ij,ij->i', normal_array, point_array[valid, 0])
+        return normal_array, offset_array
+
+    def _score_hypotheses(self, point_cloud, normal_array, offset_array):
+        # Count the inliers of every hypothesis.  Points are taken in chunks, and each chunk against batches
+        # of hypotheses, with chunks small enough that the matrix of distances worked out at once stays under
+        # about four million entries.
+        count_array = numpy.zeros(len(normal_array), dtype=numpy.int64)
+        for chunk in point_cloud.yield_chunks(max(1, (1 << 22) // self.batch_size)):
+            for start in range(0, len(normal_array), self.batch_size):
+                end = start + self.batch_size
+                distance_array = numpy.fabs(chunk @ normal_array[start:end].T - offset_array[start:end])
+                count_array[start:end] += numpy.count_nonzero(distance_array <= self.distance_threshold, axis=0)
+        return count_array
+
+    def fit_plane(self, point_cloud):
+        point_count = point_cloud.point_count()
+        if point_count < 3:
+            raise Exception('Cannot fit a plane to fewer than three points.')
+        normal_array, offset_array = self._make_hypotheses(point_cloud, point_count)
+        if len(normal_array) == 0:
+            raise Exception('Every sampled triple of points was degenerate.')
+        count_array = self._score_hypotheses(point_cloud, normal_array, offset_array)
+        best = int(numpy.argmax(count_array))
+        normal, offset = normal_array[best], offset_array[best]
+        accumulator = MomentAccumulator()
+        inlier_list = []
+        start = 0
+        for chunk in point_cloud.yield_chunks():
+            inlier_mask = numpy.fabs(chunk @ normal - offset) <= self.distance_threshold
+            accumulator.add_array(chunk[inlier_mask])
+            inlier_list.append(numpy.flatnonzero(inlier_mask) + start)
+            start += len(chunk)
+        self.inlier_count = accumulator.count
+        self.inlier_array = numpy.concatenate(inlier_list)
+        return accumulator.fit_plane()
@@ -2,14 +2,20 @@
 
 import random
 
-from math3d_side import Side
-from math3d_triangle import Triangle
 from math3d_vector import Vector
-from math3d_plane import Plane
 
 class PointCloud(object):
     def __init__(self, point_list=None):
         self.point_list = point_list if point_list is not None else []
+        self._drawn_render_buffer = None
+        self.invalidate_caches()
+
+    def invalidate_caches(self):
+        # The index used to find duplicate points is kept up to date as points are appended to the
+        # list, or the list is replaced, but call this after modifying any point in place.
+        self._point_index = None
+        self._point_index_list = None
+        self._render_buffer = None
 
     def clone(self):
         return PointCloud([point for point in self.point_list])
@@ -24,10 +30,30 @@ class PointCloud(object):
         self.point_list = [Vector().from_dict(point) for point in data.get('point_list', [])]
         return self
 
+    def save_binary(self, path, single_precision=False):
+        from math3d_binary_file import BinaryFile, BinaryFileKind
+        from math3d_vector_array import VectorArray
+        BinaryFile.write(path, VectorArray().from_vector_list(self.point_list).array, None, BinaryFileKind.POINT_CLOUD, single_precision)
+
+    def load_binary(self, path):
+        from math3d_binary_file import BinaryFile
+        from math3d_vector_array import VectorArray
+        self.point_list = VectorArray(BinaryFile(path).vertex_array).to_vector_list()
+        return self
+
+    def point_count(self):
+        return len(self.point_list)
+
+    def yield_chunks(self, chunk_size=1 << 20):
+        # Generate the points as N x 3 arrays of at most chunk_size points each.
+        from math3d_vector_array import VectorArray
+        for start in range(0, len(self.point_list), chunk_size):
+            yield VectorArray().from_vector_list(self.point_list[start:start + chunk_size]).array
+
     def calc_center(self):
         center = Vector(0.0, 0.0, 0.0)
         for point in self.point_list:
-            center = center + point
+            center += point
         center = center * (1.0 / float(len(self.point_list)))
         return center
 
@@ -35,175 +61,111 @@ class PointCloud(object):
         center = self.calc_center()
         self.point_list = [center + (point - center) * scale for point in self.point_list]
 
+    def find_point(self, given_point, eps=1e-7):
+        # This returns what a linear search for the first point within eps of the given point would, but
+        # we go through an index of KD-trees over the points, which we build on first use and keep up to
+        # date as points are appended.
+        if not eps > 0.0:
+            return None
+        return self._update_point_index().find_point(self.point_list, given_point, eps)
+
+    def _update_point_index(self):
+        from math3d_kd_tree import IncrementalKDTree
+        if self._point_index is None or self._point_index_list is not self.point_list or self._point_index.count > len(self.point_list):
+            self._point_index = IncrementalKDTree()
+            self._point_index_list = self.point_list
+        if self._point_index.count < len(self.point_list):
+            self._point_index.add_point_list(self.point_list, self._point_index.count)
+        return self._point_index
+
     def add_point(self, new_point, eps=1e-7):
-        for point in self.point_list:
-            if (point - new_point).length() < eps:
-                break
-        else:
+        if self.find_point(new_point, eps) is None:
             self.point_list.append(new_point)
 
-    def _find_initial_tetrahedron_for_convex_hull(self):
-        for i in range(len(self.point_list)):
-            point_a = self.point_list[i]
-            for j in range(i + 1, len(self.point_list)):
-                point_b = self.point_list[j]
-                for k in range(j + 1, len(self.point_list)):
-                    point_c = self.point_list[k]
-                    for l in range(k + 1, len(self.point_list)):
-                        point_d = self.point_list[l]
-                        vec_a = point_a - point_d
-                        vec_b = point_b - point_d
-                        vec_c = point_c - point_d
-                        volume = vec_a.cross(vec_b).dot(vec_c)
-                        if volume > 0.0:
-                            return [
-                                Triangle(point_d, point_b, point_a),
-                                Triangle(point_d, point_c, point_b),
-                                Triangle(point_d, point_a, point_c),
-                                Triangle(point_a, point_b, point_c)
-                            ]
-    
+    def make_kd_tree(self, max_leaf_size=8):
+        # Build a KD-tree over the points for nearest-neighbour and radius queries; see KDTree.
+        import numpy
+        from math3d_kd_tree import KDTree
+        chunk_list = list(self.yield_chunks())
+        return KDTree(numpy.concatenate(chunk_list) if len(chunk_list) > 0 else None, max_leaf_size)
+
     def find_convex_hull(self, eps=1e-7):
-        from math3d_triangle_mesh import TriangleMesh
-        
-        if len(self.point_list) < 4:
-            raise Exception('The point-cloud must consist of at least 4 non-co-planar points.')
-        
-        triangle_list = self._find_initial_tetrahedron_for_convex_hull()
-        tri_mesh = TriangleMesh().from_triangle_list(triangle_list)
-        
-        # Proceed by expanding the current convex hull until all points have been incorporated.
-        point_list = [point for point in self.point_list]
-        while True:
-            
-            # Remove any points that lie on or within the current convex hull.
-            i = 0
-            while i < len(point_list):
-                point = point_list[i]
-                if tri_mesh.side(point) == Side.BACK:
-                    del point_list[i]
-                else:
-                    i += 1
-            
-            # We're done when all points have been incorporated into the hull.
-            if len(point_list) == 0:
-                break
-            
-            # Arbitrarily choose the first point in the list.  We know it is outside the hull.
-            new_point = point_list[0]
-            tri_mesh.vertex_list.append(new_point)
-            i = len(tri_mesh.vertex_list) - 1
-            
-            # Build upon any triangles that face toward our new point.
-            triangle_list = [triangle for triangle in tri_mesh.triangle_list]
-            for triple in triangle_list:
-                triangle = tri_mesh.make_triangle(triple)
-                plane = triangle.calc_plane()
-                side = plane.side(new_point)
-                if side == Side.FRONT:
-                    tri_mesh.toggle_triangle(triple, check_forward=True, check_reverse=False)
-                    tri_mesh.toggle_triangle((i, triple[0], triple[1]), check_forward=False, check_reverse=True)
-                    tri_mesh.toggle_triangle((i, triple[1], triple[2]), check_forward=False, check_reverse=True)
-                    tri_mesh.toggle_triangle((i, triple[2], triple[0]), check_forward=False, check_reverse=True)
-        
-        # Finally, return the convex hull.
-        return tri_mesh
+        from math3d_quickhull import QuickHull
+        return QuickHull(self.point_list, eps).find_convex_hull()
     
     def planar_sort(self, plane, eps=1e-7):
-        back_list = []
-        front_list = []
-        neither_list = []
-        for i, point in enumerate(self.point_list):
-            side = plane.side(point, eps)
-            if side == Side.BACK:
-                back_list.append(i)
-            elif side == Side.FRONT:
-                front_list.append(i)
-            elif side == Side.NEITHER:
-                neither_list.append(i)
-        return back_list, front_list, neither_list
+        back_array, front_array, neither_array = self.planar_sort_array(plane, eps)
+        return back_array.tolist(), front_array.tolist(), neither_array.tolist()
+
+    def planar_sort_array(self, plane, eps=1e-7, return_distances=False):
+        # This is planar_sort with the offsets returned as ascending integer arrays.  If asked, the array
+        # of signed distances of all the points from the plane is returned as a fourth value.
+        import numpy
+        from math3d_side import SideCode
+        from math3d_vector_array import VectorArray
+
+        point_array = VectorArray().from_vector_list(self.point_list)
+        distance_array = plane.point_distance_array(point_array)
+        side_array = SideCode.from_distance_array(distance_array, eps)
+        back_array = numpy.flatnonzero(side_array == SideCode.BACK)
+        front_array = numpy.flatnonzero(side_array == SideCode.FRONT)
+        neither_array = numpy.flatnonzero(side_array == SideCode.NEITHER)
+        if return_distances:
+            return back_array, front_array, neither_array, distance_array
+        return back_array, front_array, neither_array
     
     def fit_plane(self):
-        # f(x,y,z) = ax + by + cz + d is the plane equation.
-        # For m points {p_i}, we want to find coefficients a, b, c, d so
-        # that all equations f(p_i)=0 are satisfied or as near satisfied
-        # as they can be in the sense that |f(p_i)| are all minimized.
-        # The least squares method has us define F(a,b,c,d) = Sum_i f^2(p_i),
-        # and then we simply solve for a, b, c, d by setting each of
-        # dF/da, dF/db, dF/dc, dF/dd to zero, which gives us a homogeneous
-        # system of linear equations.  We find a non-trivial solution by
-        # looking for an eigenvector with the smallest associated value.
+        # The moments of the points are summed up a chunk at a time; see MomentAccumulator.
+        from math3d_moment_accumulator import MomentAccumulator
+        return MomentAccumulator().add_chunks(self.yield_chunks()).fit_plane()
+
+    def fit_plane_ransac(self, distance_threshold, hypothesis_count=256, batch_size=64, seed=None):
+        # Fit a plane to the points, ignoring outliers further than the given distance from it; see PlaneRansac.
+        from math3d_plane_ransac import PlaneRansac
+        return PlaneRansac(distance_threshold, hypothesis_count, batch_size, seed).fit_plane(self)
+
+    def voxel_downsample(self, voxel_size, mode=None, origin=None):
+        # Return a point-cloud of one point per occupied voxel of the given size; see VoxelGrid.
+        from math3d_downsample import VoxelGrid, VoxelMode
+        from math3d_vector_array import VectorArray
+        voxel_grid = VoxelGrid(voxel_size, mode if mode is not None else VoxelMode.CENTROID, origin)
+        return PointCloud(VectorArray(voxel_grid.add_chunks(self.yield_chunks()).to_array()).to_vector_list())
+
+    def random_downsample(self, count, seed=None):
+        # Return a point-cloud of the given number of points picked at random, in their order here; see RandomSampler.
+        from math3d_downsample import RandomSampler
+        from math3d_vector_array import VectorArray
+        point_array, offset_array = RandomSampler(count, seed).add_chunks(self.yield_chunks()).to_array()
+        return PointCloud(VectorArray(point_array).to_vector_list())
+
+    def farthest_point_downsample(self, count, start=0):
+        # Return a point-cloud of the given number of points spread evenly over this one; see farthest_point_sample.
         import numpy
-        
-        matrix = [[0.0 for i in range(4)] for j in range(4)]
-        
-        sum_xx = sum([point.x * point.x for point in self.point_list])
-        sum_yy = sum([point.y * point.y for point in self.point_list])
-        sum_zz = sum([point.z * point.z for point in self.point_list])
-        
-        sum_xy = sum([point.x * point.y for point in self.point_list])
-        sum_xz = sum([point.x * point.z for point in self.point_list])
-        sum_yz = sum([point.y * point.z for point in self.point_list])
-        
-        sum_x = sum([point.x for point in self.point_list])
-        sum_y = sum([point.y for point in self.point_list])
-        sum_z = sum([point.z for point in self.point_list])
-
-        matrix[0][0] = sum_xx
-        matrix[0][1] = sum_xy
-        matrix[0][2] = sum_xz
-        matrix[0][3] = sum_x
-        matrix[1][0] = sum_xy
-        matrix[1][1] = sum_yy
-        matrix[1][2] = sum_yz
-        matrix[1][3] = sum_y
-        matrix[2][0] = sum_xz
-        matrix[2][1] = sum_yz
-        matrix[2][2] = sum_zz
-        matrix[2][3] = sum_z
-        matrix[3][0] = sum_x
-        matrix[3][1] = sum_y
-        matrix[3][2] = sum_z
-        matrix[3][3] = float(len(self.point_list))
-
-        matrix = numpy.array(matrix)
-        
-        w, v = numpy.linalg.eig(matrix)
-        
-        j = -1
-        eps = 1e-5
-        smallest_value = None
-        for i in range(4):
-            value = w[i]
-            if isinstance(value, complex):
-                if abs(value.imag) > eps:
-                    continue    # Only consider real eigen values.
-                value = value.real
-            if smallest_value is None or abs(value) < abs(smallest_value):
-                smallest_value = value
-                j = i
-        
-        normal = Vector(v[0][j], v[1][j], v[2][j])
-        normal.x = normal.x.real if isinstance(normal.x, complex) else normal.x
-        normal.y = normal.y.real if isinstance(normal.y, complex) else normal.y
-        normal.z = normal.z.real if isinstance(normal.z, complex) else normal.z
-        length = normal.length()
-        unit_normal = normal / length
-        alpha = v[3][j].real if isinstance(v[3][j], complex) else v[3][j]
-        center = -(alpha / length) * unit_normal
-        
-        plane = Plane(center, unit_normal)
-        return plane
+        from math3d_downsample import farthest_point_sample
+        from math3d_vector_array import VectorArray
+        chunk_list = list(self.yield_chunks())
+        point_array = numpy.concatenate(chunk_list) if len(chunk_list) > 0 else numpy.zeros((0, 3), dtype=numpy.float64)
+        return PointCloud(VectorArray(point_array[farthest_point_sample(point_array, count, start)]).to_vector_list())
+
+    def make_render_buffer(self):
+        # Return a RenderBuffer for drawing the points as GL_POINTS.  It is cached until points are appended or replaced.
+        import numpy
+        from math3d_render_buffer import RenderBuffer
+        key = (self._point_source(), self.point_count())
+        if self._render_buffer is None or self._render_buffer[0] is not key[0] or self._render_buffer[1] != key[1]:
+            chunk_list = [chunk.astype(numpy.float32) for chunk in self.yield_chunks()]
+            vertex_array = numpy.concatenate(chunk_list) if len(chunk_list) > 0 else numpy.zeros((0, 3), dtype=numpy.float32)
+            self._render_buffer = (key[0], key[1], RenderBuffer(vertex_array, numpy.arange(len(vertex_array))))
+        return self._render_buffer[2]
+
+    def _point_source(self):
+        # Return the object holding the points, which is replaced whenever they all are.
+        return self.point_list
 
     def render(self):
-        from OpenGL.GL import GL_POINTS, glBegin, glEnd, glVertex3f
-
-        glBegin(GL_POINTS)
-        try:
-            for point in self.point_list:
-                glVertex3f(point.x, point.y, point.z)
-        except Exception as ex:
-            error = str(ex)
-            error = None
-        finally:
-            glEnd()
\ No newline at end of file
+        from OpenGL.GL import GL_POINTS
+        render_buffer = self.make_render_buffer()
+        if self._drawn_render_buffer is not None and self._drawn_render_buffer is not render_buffer:
+            self._drawn_render_buffer.release()
+        self._drawn_render_buffer = render_buffer
+        render_buffer.draw(GL_POINTS)
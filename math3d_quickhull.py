@@ -0,0 +1,177 @@
+# math3d_quickhull.py
+
+import math
+
+from math3d_vector import Vector
+
+class QuickHullFace(object):
+    # A triangle (a, b, c) of the hull being built, wound CCW when viewed from outside,
+    # along with its plane and the list of points known to be in front of that plane.
+    __slots__ = ('a', 'b', 'c', 'normal', 'offset', 'outside_list', 'alive')
+
+    def __init__(self, point_list, a, b, c):
+        self.a = a
+        self.b = b
+        self.c = c
+        ax, ay, az = point_list[a]
+        bx, by, bz = point_list[b]
+        cx, cy, cz = point_list[c]
+        ux, uy, uz = bx - ax, by - ay, bz - az
+        vx, vy, vz = cx - ax, cy - ay, cz - az
+        nx = uy * vz - uz * vy
+        ny = uz * vx - ux * vz
+        nz = ux * vy - uy * vx
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        if length > 0.0:
+            nx, ny, nz = nx / length, ny / length, nz / length
+        self.normal = (nx, ny, nz)
+        self.offset = nx * ax + ny * ay + nz * az
+        self.outside_list = []
+        self.alive = True
+
+    def distance(self, point):
+        nx, ny, nz = self.normal
+        return nx * point[0] + ny * point[1] + nz * point[2] - self.offset
+
+    def edges(self):
+        return ((self.a, self.b), (self.b, self.c), (self.c, self.a))
+
+class QuickHull(object):
+    # This is the Quickhull algorithm of Barber, Dobkin and Huhdanpaa.  We start with a
+    # tetrahedron spanned by extreme points, and give every other point to the conflict
+    # (outside) list of some face it is in front of.  Then, while any face has a non-empty
+    # conflict list, we take the point of that list farthest from the face, find all faces
+    # it can see, and replace them with a fan of new faces joining the point to the horizon
+    # (the boundary of the visible region.)  The points orphaned by the removed faces are
+    # handed to the new faces or dropped if they are now inside.  A point within eps of a
+    # face plane is not considered in front of it, so co-planar points never become vertices.
+
+    def __init__(self, point_list, eps=1e-7):
+        self.point_list = [(point.x, point.y, point.z) for point in point_list]
+        self.eps = eps
+        self.edge_map = {}
+
+    def _add_face(self, a, b, c):
+        face = QuickHullFace(self.point_list, a, b, c)
+        for edge in face.edges():
+            self.edge_map[edge] = face
+        return face
+
+    def _remove_face(self, face):
+        face.alive = False
+        for edge in face.edges():
+            if self.edge_map.get(edge) is face:
+                del self.edge_map[edge]
+
+    def _assign_point(self, i, face_list):
+        point = self.point_list[i]
+        for face in face_list:
+            if face.distance(point) > self.eps:
+                face.outside_list.append(i)
+                return True
+        return False
+
+    def _find_initial_tetrahedron(self):
+        point_list = self.point_list
+
+        # Of the points extreme along each axis, take the two farthest apart.
+        extreme_list = []
+        for axis in range(3):
+            extreme_list.append(min(range(len(point_list)), key=lambda i: point_list[i][axis]))
+            extreme_list.append(max(range(len(point_list)), key=lambda i: point_list[i][axis]))
+        def distance_squared(i, j):
+            return sum([(point_list[i][k] - point_list[j][k]) ** 2 for k in range(3)])
+        i0, i1 = max([(i, j) for i in extreme_list for j in extreme_list], key=lambda pair: distance_squared(*pair))
+        if math.sqrt(distance_squared(i0, i1)) <= self.eps:
+            return None
+
+        # Next, take the point farthest from the line through those two.
+        p0 = Vector(*point_list[i0])
+        axis = (Vector(*point_list[i1]) - p0).normalized()
+        def line_distance(i):
+            return (Vector(*point_list[i]) - p0).rejected(axis).length()
+        i2 = max(range(len(point_list)), key=line_distance)
+        if line_distance(i2) <= self.eps:
+            return None
+
+        # Lastly, take the point farthest from the plane through those three.
+        face = QuickHullFace(point_list, i0, i1, i2)
+        i3 = max(range(len(point_list)), key=lambda i: math.fabs(face.distance(point_list[i])))
+        if math.fabs(face.distance(point_list[i3])) <= self.eps:
+            return None
+        if face.distance(point_list[i3]) > 0.0:
+            i1, i2 = i2, i1
+        return i0, i1, i2, i3
+
+    def find_convex_hull(self):
+        from math3d_triangle_mesh import TriangleMesh
+
+        tetrahedron = self._find_initial_tetrahedron() if len(self.point_list) >= 4 else None
+        if tetrahedron is None:
+            raise Exception('The point-cloud must consist of at least 4 non-co-planar points.')
+
+        # With i3 behind face (i0, i1, i2), these four faces all face outward.
+        i0, i1, i2, i3 = tetrahedron
+        face_list = [
+            self._add_face(i0, i1, i2),
+            self._add_face(i0, i3, i1),
+            self._add_face(i1, i3, i2),
+            self._add_face(i2, i3, i0)
+        ]
+        for i in range(len(self.point_list)):
+            if i not in tetrahedron:
+                self._assign_point(i, face_list)
+
+        face_stack = [face for face in face_list if len(face.outside_list) > 0]
+        while len(face_stack) > 0:
+            face = face_stack.pop()
+            if not face.alive or len(face.outside_list) == 0:
+                continue
+
+            eye = max(face.outside_list, key=lambda i: face.distance(self.point_list[i]))
+            eye_point = self.point_list[eye]
+
+            # Flood out from the face to find every face visible from the eye point.
+            # Any edge of a visible face whose twin belongs to a face not visible is on the horizon.
+            visible_list = [face]
+            visible_set = {face}
+            horizon_list = []
+            j = 0
+            while j < len(visible_list):
+                visible_face = visible_list[j]
+                j += 1
+                for edge in visible_face.edges():
+                    neighbor = self.edge_map.get((edge[1], edge[0]))
+                    if neighbor is None or neighbor in visible_set:
+                        continue
+                    if neighbor.distance(eye_point) > self.eps:
+                        visible_list.append(neighbor)
+                        visible_set.add(neighbor)
+                    else:
+                        horizon_list.append(edge)
+
+            orphan_list = []
+            for visible_face in visible_list:
+                orphan_list += visible_face.outside_list
+                visible_face.outside_list = []
+                self._remove_face(visible_face)
+
+            new_face_list = [self._add_face(edge[0], edge[1], eye) for edge in horizon_list]
+            for i in orphan_list:
+                if i != eye:
+                    self._assign_point(i, new_face_list)
+            face_stack += [new_face for new_face in new_face_list if len(new_face.outside_list) > 0]
+
+        # Gather up the surviving faces into a mesh having only the hull vertices.
+        tri_mesh = TriangleMesh()
+        offset_map = {}
+        face_set = set(self.edge_map.values())
+        for face in sorted(face_set, key=lambda face: (face.a, face.b, face.c)):
+            triple = []
+            for i in (face.a, face.b, face.c):
+                if i not in offset_map:
+                    offset_map[i] = len(tri_mesh.vertex_list)
+                    tri_mesh.vertex_list.append(Vector(*self.point_list[i]))
+                triple.append(offset_map[i])
+            tri_mesh.triangle_list.append(tuple(triple))
+        return tri_mesh
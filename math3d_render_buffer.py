@@ -0,0 +1,75 @@
+# math3d_render_buffer.py
+
+import numpy
+
+class RenderBuffer(object):
+    # Contiguous arrays ready to be handed to the GPU: an N x 3 (positions) or N x 6 (positions, then normals) float32
+    # vertex array, an optional N x 3 float32 color array, and a flat uint32 index array.  Building these needs no
+    # OpenGL, so they can be made and inspected without a display.  The first call to draw uploads them into vertex
+    # buffer objects of the current OpenGL context; later calls only bind those and issue a single draw call.
+
+    def __init__(self, vertex_array, index_array, color_array=None):
+        self.vertex_array = numpy.ascontiguousarray(vertex_array, dtype=numpy.float32)
+        self.index_array = numpy.ascontiguousarray(index_array, dtype=numpy.uint32).ravel()
+        self.color_array = numpy.ascontiguousarray(color_array, dtype=numpy.float32) if color_array is not None else None
+        for array in (self.vertex_array, self.index_array, self.color_array):
+            if array is not None:
+                array.setflags(write=False)
+        self.buffer_list = None
+
+    def has_normals(self):
+        return self.vertex_array.shape[1] == 6
+
+    def stride(self):
+        return self.vertex_array.shape[1] * self.vertex_array.itemsize
+
+    def upload(self):
+        from OpenGL.GL import GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_STATIC_DRAW, glGenBuffers, glBindBuffer, glBufferData
+        array_list = [(GL_ARRAY_BUFFER, self.vertex_array), (GL_ELEMENT_ARRAY_BUFFER, self.index_array)]
+        if self.color_array is not None:
+            array_list.append((GL_ARRAY_BUFFER, self.color_array))
+        self.buffer_list = []
+        for target, array in array_list:
+            buffer = glGenBuffers(1)
+            glBindBuffer(target, buffer)
+            glBufferData(target, array.nbytes, array, GL_STATIC_DRAW)
+            glBindBuffer(target, 0)
+            self.buffer_list.append(buffer)
+
+    def release(self):
+        # Free the vertex buffer objects.  The OpenGL context they were made in must be current.
+        from OpenGL.GL import glDeleteBuffers
+        if self.buffer_list is not None:
+            glDeleteBuffers(len(self.buffer_list), self.buffer_list)
+            self.buffer_list = None
+
+    def draw(self, mode):
+        from OpenGL.GL import GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_FLOAT, GL_UNSIGNED_INT, GL_VERTEX_ARRAY, GL_NORMAL_ARRAY, GL_COLOR_ARRAY
+        from OpenGL.GL import glBindBuffer, glEnableClientState, glDisableClientState, glVertexPointer, glNormalPointer, glColorPointer, glDrawElements
+        from ctypes import c_void_p
+
+        if len(self.index_array) == 0:
+            return
+        if self.buffer_list is None:
+            self.upload()
+        state_list = [GL_VERTEX_ARRAY]
+        try:
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer_list[0])
+            glEnableClientState(GL_VERTEX_ARRAY)
+            glVertexPointer(3, GL_FLOAT, self.stride(), c_void_p(0))
+            if self.has_normals():
+                state_list.append(GL_NORMAL_ARRAY)
+                glEnableClientState(GL_NORMAL_ARRAY)
+                glNormalPointer(GL_FLOAT, self.stride(), c_void_p(3 * self.vertex_array.itemsize))
+            if self.color_array is not None:
+                state_list.append(GL_COLOR_ARRAY)
+                glBindBuffer(GL_ARRAY_BUFFER, self.buffer_list[2])
+                glEnableClientState(GL_COLOR_ARRAY)
+                glColorPointer(3, GL_FLOAT, 0, c_void_p(0))
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.buffer_list[1])
+            glDrawElements(mode, len(self.index_array), GL_UNSIGNED_INT, c_void_p(0))
+        finally:
+            for state in state_list:
+                glDisableClientState(state)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
@@ -3,4 +3,19 @@
 class Side:
     NEITHER = 'NEITHER'
     BACK = 'BACK'
-    FRONT = 'FRONT'
\ No newline at end of file
+    FRONT = 'FRONT'
+
+class SideCode:
+    # Integer counterparts of the Side constants, as used by the batched side tests.
+    BACK = -1
+    NEITHER = 0
+    FRONT = 1
+
+    @staticmethod
+    def from_distance_array(distance_array, eps=1e-7):
+        # Map an array of signed distances to side codes, using the same thresholds as Plane.side.
+        import numpy
+        code_array = numpy.zeros(distance_array.shape, dtype=numpy.int8)
+        code_array[distance_array >= eps] = SideCode.FRONT
+        code_array[distance_array <= -eps] = SideCode.BACK
+        return code_array
@@ -0,0 +1,77 @@
+# math3d_spatial_hash.py
+
+import math
+
+class SpatialHash(object):
+    # A uniform grid of cubical cells over all of space.  Only the occupied cells
+    # are stored, in a dictionary mapping cell coordinates to the offsets of the
+    # points found in that cell.  The points themselves live in a list owned by
+    # the caller; we only store offsets into that list.
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cell_map = {}
+
+    def clear(self):
+        self.cell_map = {}
+
+    def add_point(self, point, i):
+        if not (math.isfinite(point.x) and math.isfinite(point.y) and math.isfinite(point.z)):
+            return  # Such a point can never be within any distance of another.
+        key = (math.floor(point.x / self.cell_size), math.floor(point.y / self.cell_size), math.floor(point.z / self.cell_size))
+        offset_list = self.cell_map.get(key)
+        if offset_list is None:
+            self.cell_map[key] = [i]
+        else:
+            offset_list.append(i)
+
+    def add_point_list(self, point_list, start=0):
+        for i in range(start, len(point_list)):
+            self.add_point(point_list[i], i)
+
+    def find_point(self, point_list, given_point, eps=1e-7):
+        # Return the smallest offset i such that (point_list[i] - given_point).length() < eps,
+        # or None if there is no such offset.  This is exactly what a linear search of the
+        # list would return, but we only look at points in cells overlapping the cube of
+        # half-width eps about the given point.  That cube is padded a little to make sure
+        # round-off doesn't cause us to miss a cell.
+        if not (math.isfinite(given_point.x) and math.isfinite(given_point.y) and math.isfinite(given_point.z)):
+            return None
+        reach = 1.5 * eps
+        size = self.cell_size
+        x_range = range(math.floor((given_point.x - reach) / size), math.floor((given_point.x + reach) / size) + 1)
+        y_range = range(math.floor((given_point.y - reach) / size), math.floor((given_point.y + reach) / size) + 1)
+        z_range = range(math.floor((given_point.z - reach) / size), math.floor((given_point.z + reach) / size) + 1)
+        found = None
+        for x in x_range:
+            for y in y_range:
+                for z in z_range:
+                    offset_list = self.cell_map.get((x, y, z))
+                    if offset_list is None:
+                        continue
+                    for i in offset_list:
+                        if found is not None and i > found:
+                            break
+                        if (point_list[i] - given_point).length() < eps:
+                            found = i
+                            break
+        return found
+
+    def find_points_in_box(self, min_point, max_point):
+        # Return the offsets of all points in cells overlapping the given box.  Some may lie outside the box.
+        # If the box spans more cells than are occupied, it's quicker to go through the occupied cells instead.
+        size = self.cell_size
+        x_range = range(math.floor(min_point.x / size), math.floor(max_point.x / size) + 1)
+        y_range = range(math.floor(min_point.y / size), math.floor(max_point.y / size) + 1)
+        z_range = range(math.floor(min_point.z / size), math.floor(max_point.z / size) + 1)
+        offset_list = []
+        if len(x_range) * len(y_range) * len(z_range) > len(self.cell_map):
+            for key, cell_offset_list in self.cell_map.items():
+                if key[0] in x_range and key[1] in y_range and key[2] in z_range:
+                    offset_list += cell_offset_list
+        else:
+            for x in x_range:
+                for y in y_range:
+                    for z in z_range:
+                        offset_list += self.cell_map.get((x, y, z), [])
+        return offset_list
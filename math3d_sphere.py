@@ -1,11 +1,14 @@
 # math3d_sphere.py
 
+import functools
 import math
 
 from math3d_side import Side
 from math3d_vector import Vector
 
 class Sphere(object):
+    __slots__ = ('center', 'radius')
+
     def __init__(self, center, radius):
         self.center = center
         self.radius = radius
@@ -24,25 +27,44 @@ class Sphere(object):
     def nearest_point(self, point):
         return (point - self.center).normalized() * self.radius
     
+    def make_mesh_arrays(self, subdivision_level=1):
+        # Return the vertices and triangles of make_mesh as V x 3 and T x 3 arrays; see TriangleMesh.to_arrays.
+        import numpy
+        vertex_array, index_array = make_unit_icosphere(subdivision_level)
+        center = numpy.array([self.center.x, self.center.y, self.center.z], dtype=numpy.float64)
+        return vertex_array * self.radius + center, index_array.copy()
+
     def make_mesh(self, subdivision_level=1):
-        from math3d_triangle_mesh import TriangleMesh, Polyhedron
-        from math3d_triangle import Triangle
-        tri_mesh = TriangleMesh.make_polyhedron(Polyhedron.ICOSAHEDRON)
-        triangle_list = tri_mesh.to_triangle_list()
-        for triangle in triangle_list:
-            for i in range(3):
-                triangle[i] = triangle[i].normalized() * self.radius
-        for i in range(subdivision_level):
-            new_triangle_list = []
-            for triangle in triangle_list:
-                for j in range(3):
-                    new_triangle_list.append(Triangle(triangle[j], (triangle[j] + triangle[j + 1]).normalized() * self.radius, (triangle[j] + triangle[j + 2]).normalized() * self.radius))
-                new_triangle = Triangle()
-                for j in range(3):
-                    new_triangle[j] = (triangle[j] + triangle[j + 1]).normalized() * self.radius
-                new_triangle_list.append(new_triangle)
-            triangle_list = new_triangle_list
-        tri_mesh.from_triangle_list(triangle_list)
-        for i, vertex in enumerate(tri_mesh.vertex_list):
-            tri_mesh.vertex_list[i] = vertex + self.center
-        return tri_mesh
\ No newline at end of file
+        from math3d_triangle_mesh import TriangleMesh
+        return TriangleMesh().from_arrays(*self.make_mesh_arrays(subdivision_level))
+
+@functools.lru_cache(maxsize=16)
+def make_unit_icosphere(subdivision_level):
+    # Return read-only vertex and index arrays for a sphere of radius one about the origin, made by subdividing each
+    # triangle of an icosahedron into four, the given number of times, and pushing the new vertices out onto the sphere.
+    # Each edge is cut once, no matter how many triangles share it: we list the edges of all triangles, find the distinct
+    # ones, and make one midpoint vertex per distinct edge.  The results are cached, as every sphere is a scaled and
+    # translated copy of one of these.
+    import numpy
+    from math3d_triangle_mesh import Polyhedron, make_polyhedron_arrays
+    vertex_array, index_array = make_polyhedron_arrays(Polyhedron.ICOSAHEDRON)
+    vertex_array = vertex_array / numpy.linalg.norm(vertex_array, axis=1)[:, numpy.newaxis]
+    for i in range(subdivision_level):
+        # Edge k of a triangle (a, b, c) runs from its corner k to corner k + 1, so the edges are ab, bc and ca.
+        edge_array = numpy.stack([index_array, numpy.roll(index_array, -1, axis=1)], axis=2).reshape(-1, 2)
+        edge_array.sort(axis=1)
+        edge_array, inverse_array = numpy.unique(edge_array, axis=0, return_inverse=True)
+        midpoint_array = vertex_array[edge_array[:, 0]] + vertex_array[edge_array[:, 1]]
+        midpoint_array /= numpy.linalg.norm(midpoint_array, axis=1)[:, numpy.newaxis]
+        ab, bc, ca = (len(vertex_array) + inverse_array.reshape(-1, 3)).T
+        a, b, c = index_array.T
+        index_array = numpy.stack([
+            numpy.stack([a, ab, ca], axis=1),
+            numpy.stack([b, bc, ab], axis=1),
+            numpy.stack([c, ca, bc], axis=1),
+            numpy.stack([ab, bc, ca], axis=1)
+        ], axis=1).reshape(-1, 3)
+        vertex_array = numpy.concatenate([vertex_array, midpoint_array])
+    vertex_array.setflags(write=False)
+    index_array.setflags(write=False)
+    return vertex_array, index_array
@@ -8,10 +8,50 @@ class Transform(object):
     def __init__(self):
         pass
     
-    def __call__(self, input):
+    def __call__(self, input, in_place=False):
         output = input
         return output
 
+    def calc_matrix_3x4(self):
+        # Return the 3x4 numpy matrix [L|t] of this transform, where L is the linear part and t the translation.
+        # The base transform is the identity.
+        import numpy
+        return numpy.hstack([numpy.eye(3), numpy.zeros((3, 1))])
+
+    def apply_to_array(self, array, in_place=False):
+        # Apply this transform to every row of the given N x 3 numpy array in one matrix multiply.
+        import numpy
+        matrix = self.calc_matrix_3x4()
+        output = array if in_place else None
+        output = numpy.matmul(array, matrix[:, :3].T, out=output)
+        output += matrix[:, 3]
+        return output
+
+    def _apply_in_bulk(self, input, in_place=False):
+        # Transform a list of vectors, a VectorArray, a TriangleMesh or a PointCloud all at once.
+        # Lists and meshes are taken through a temporary array buffer.  When told to work in place,
+        # the given object is updated and returned, which, for a mesh, saves us from cloning it.
+        from math3d_vector_array import VectorArray
+        from math3d_triangle_mesh import TriangleMesh
+        from math3d_point_cloud import PointCloud
+        if isinstance(input, VectorArray):
+            output = input if in_place else VectorArray()
+            output.array = self.apply_to_array(input.array, in_place=in_place)
+        elif isinstance(input, list):
+            output_list = VectorArray(self.apply_to_array(VectorArray().from_vector_list(input).array, in_place=True)).to_vector_list()
+            if in_place:
+                input[:] = output_list
+                output_list = input
+            output = output_list
+        elif isinstance(input, TriangleMesh):
+            output = input if in_place else TriangleMesh()
+            output.vertex_list = self._apply_in_bulk(input.vertex_list)
+            output.triangle_list = input.triangle_list if in_place else [triangle for triangle in input.triangle_list]
+        elif isinstance(input, PointCloud):
+            output = input if in_place else PointCloud()
+            output.point_list = self._apply_in_bulk(input.point_list)
+        return output
+
 class LinearTransform(Transform):
     def __init__(self, x_axis=None, y_axis=None, z_axis=None):
         super().__init__()
@@ -36,23 +76,30 @@ class LinearTransform(Transform):
         self.z_axis = Vector().from_dict(data.get('z_axis'))
         return self
     
-    def __call__(self, input):
-        from math3d_triangle_mesh import TriangleMesh
-        from math3d_point_cloud import PointCloud
-        
+    def __call__(self, input, in_place=False):
         if isinstance(input, Vector):
-            output = self.x_axis * input.x + self.y_axis * input.y + self.z_axis * input.z
-        elif isinstance(input, list):
+            x_axis, y_axis, z_axis = self.x_axis, self.y_axis, self.z_axis
+            output = Vector(
+                x_axis.x * input.x + y_axis.x * input.y + z_axis.x * input.z,
+                x_axis.y * input.x + y_axis.y * input.y + z_axis.y * input.z,
+                x_axis.z * input.x + y_axis.z * input.y + z_axis.z * input.z
+            )
+        elif isinstance(input, list) and not all([isinstance(input_item, Vector) for input_item in input]):
             output = [self.__call__(input_item) for input_item in input]
         elif isinstance(input, LinearTransform):
             output = LinearTransform(x_axis=self(input.x_axis), y_axis=self(input.y_axis), z_axis=self(input.z_axis))
-        elif isinstance(input, TriangleMesh):
-            output = input.clone()
-            output.vertex_list = self(input.vertex_list)
-        elif isinstance(input, PointCloud):
-            output = PointCloud(self(input.point_list))
+        else:
+            output = self._apply_in_bulk(input, in_place=in_place)
         return output
     
+    def calc_matrix_3x4(self):
+        import numpy
+        return numpy.array([
+            [self.x_axis.x, self.y_axis.x, self.z_axis.x, 0.0],
+            [self.x_axis.y, self.y_axis.y, self.z_axis.y, 0.0],
+            [self.x_axis.z, self.y_axis.z, self.z_axis.z, 0.0]
+        ], dtype=numpy.float64)
+    
     def make_identity(self):
         self.x_axis = Vector(1.0, 0.0, 0.0)
         self.y_axis = Vector(0.0, 1.0, 0.0)
@@ -120,22 +167,25 @@ class AffineTransform(Transform):
         self.translation = Vector().from_dict(data.get('translation'))
         return self
     
-    def __call__(self, input):
-        from math3d_triangle_mesh import TriangleMesh
-        
+    def __call__(self, input, in_place=False):
         if isinstance(input, Vector):
-            output = self.linear_transform(input) + self.translation
-        elif isinstance(input, list):
+            output = self.linear_transform(input)
+            output += self.translation
+        elif isinstance(input, list) and not all([isinstance(input_item, Vector) for input_item in input]):
             output = [self.__call__(input_item) for input_item in input]
         elif isinstance(input, AffineTransform):
             output = AffineTransform()
             output.linear_transform = self.linear_transform(input.linear_transform)
             output.translation = self.linear_transform(input.translation) + self.translation
-        elif isinstance(input, TriangleMesh):
-            output = input.clone()
-            output.vertex_list = self(input.vertex_list)
+        else:
+            output = self._apply_in_bulk(input, in_place=in_place)
         return output
     
+    def calc_matrix_3x4(self):
+        matrix = self.linear_transform.calc_matrix_3x4()
+        matrix[:, 3] = (self.translation.x, self.translation.y, self.translation.z)
+        return matrix
+    
     def make_rigid_body_motion(self, unit_axis, angle, translation=None):
         self.linear_transform.make_rotation(unit_axis, angle)
         self.translation = translation.clone() if translation is not None else Vector(0.0, 0.0, 0.0)
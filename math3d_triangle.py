@@ -8,17 +8,25 @@ from math3d_plane import Plane
 from math3d_line_segment import LineSegment
 
 class Triangle(object):
-    def __init__(self, point_a=None, point_b=None, point_c=None):
-        self.point_a = point_a.clone() if point_a is not None else Vector(0.0, 0.0, 0.0)
-        self.point_b = point_b.clone() if point_b is not None else Vector(0.0, 0.0, 0.0)
-        self.point_c = point_c.clone() if point_c is not None else Vector(0.0, 0.0, 0.0)
+    __slots__ = ('point_a', 'point_b', 'point_c')
+
+    def __init__(self, point_a=None, point_b=None, point_c=None, copy=True):
+        # Pass copy=False to have the triangle share the given points rather than clone them.
+        if copy:
+            self.point_a = point_a.clone() if point_a is not None else Vector(0.0, 0.0, 0.0)
+            self.point_b = point_b.clone() if point_b is not None else Vector(0.0, 0.0, 0.0)
+            self.point_c = point_c.clone() if point_c is not None else Vector(0.0, 0.0, 0.0)
+        else:
+            self.point_a = point_a if point_a is not None else Vector(0.0, 0.0, 0.0)
+            self.point_b = point_b if point_b is not None else Vector(0.0, 0.0, 0.0)
+            self.point_c = point_c if point_c is not None else Vector(0.0, 0.0, 0.0)
 
     def clone(self):
         return Triangle(self.point_a, self.point_b, self.point_c)
 
     def calc_plane(self):
         unit_normal = (self.point_b - self.point_a).cross(self.point_c - self.point_a).normalized()
-        return Plane(self.point_a, unit_normal)
+        return Plane(self.point_a, unit_normal, copy=False)
 
     def calc_center(self):
         return (self.point_a + self.point_b + self.point_c) / 3.0
@@ -26,9 +34,9 @@ class Triangle(object):
     def contains_point(self, point, eps=1e-7):
         if not self.calc_plane().contains_point(point, eps):
             return False
-        area_a = Triangle(point, self.point_a, self.point_b).area()
-        area_b = Triangle(point, self.point_b, self.point_c).area()
-        area_c = Triangle(point, self.point_c, self.point_a).area()
+        area_a = Triangle(point, self.point_a, self.point_b, copy=False).area()
+        area_b = Triangle(point, self.point_b, self.point_c, copy=False).area()
+        area_c = Triangle(point, self.point_c, self.point_a, copy=False).area()
         return math.fabs((area_a + area_b + area_c) - self.area()) < eps
 
     def contains_edge_point(self, point, eps=1e-7):
@@ -38,9 +46,9 @@ class Triangle(object):
         return self.contains_point(point, eps) and not self.contains_edge_point(point, eps)
 
     def yield_line_segments(self):
-        yield LineSegment(self.point_a, self.point_b)
-        yield LineSegment(self.point_b, self.point_c)
-        yield LineSegment(self.point_c, self.point_a)
+        yield LineSegment(self.point_a, self.point_b, copy=False)
+        yield LineSegment(self.point_b, self.point_c, copy=False)
+        yield LineSegment(self.point_c, self.point_a, copy=False)
 
     def side(self, point, eps=1e-7):
         return self.calc_plane().side(point, eps)
@@ -49,7 +57,12 @@ class Triangle(object):
         return (self.point_b - self.point_a).cross(self.point_c - self.point_a).length() / 2.0
 
     def __getitem__(self, i):
-        return [self.point_a, self.point_b, self.point_c][i % 3]
+        i %= 3
+        if i == 0:
+            return self.point_a
+        elif i == 1:
+            return self.point_b
+        return self.point_c
 
     def __setitem__(self, i, point):
         setattr(self, ['point_a', 'point_b', 'point_c'][i % 3], point)
@@ -75,38 +88,97 @@ class Triangle(object):
                     if (side_list[i] == Side.BACK and side_list[(i + 1) % 3] == Side.FRONT or
                             side_list[i] == Side.FRONT and side_list[(i + 1) % 3] == Side.BACK):
                         # This might not be the best tessellation, but it will work.
-                        line_segment = LineSegment(triangle[i], triangle[i + 1])
+                        # The new triangles share their corners, so none of them are copied.
+                        line_segment = LineSegment(triangle[i], triangle[i + 1], copy=False)
                         alpha = plane.intersect_line_segment(line_segment)
                         point = line_segment.lerp(alpha)
-                        triangle_list.append(Triangle(triangle[i], point, triangle[i + 2]))
-                        triangle_list.append(Triangle(point, triangle[i + 1], triangle[i + 2]))
+                        triangle_list.append(Triangle(triangle[i], point, triangle[i + 2], copy=False))
+                        triangle_list.append(Triangle(point, triangle[i + 1], triangle[i + 2], copy=False))
                         break
         
         return back_list, front_list
 
     def intersect_with(self, other, eps=1e-7):
         if isinstance(other, Triangle):
-            from math3d_point_cloud import PointCloud
-            point_cloud = PointCloud()
-            for line_segment in self.yield_line_segments():
-                point = other.intersect_with(line_segment)
-                if point is not None:
-                    point_cloud.add_point(point)
-            for line_segment in other.yield_line_segments():
-                point = self.intersect_with(line_segment)
-                if point is not None:
-                    point_cloud.add_point(point)
-            point_list = point_cloud.point_list
-            if len(point_list) == 2:
-                line_segment = LineSegment(point_list[0], point_list[1])
-                if line_segment.length() >= eps:
-                    return line_segment
-            elif len(point_list) > 0:
-                return point_cloud
+            return self._intersect_with_triangle(other, eps)
         elif isinstance(other, LineSegment):
             plane = self.calc_plane()
             alpha = plane.intersect_line_segment(other)
             if alpha is not None and 0.0 <= alpha <= 1.0:
                 point = other.lerp(alpha)
                 if self.contains_point(point, eps):
-                    return point
\ No newline at end of file
+                    return point
+
+    def _calc_plane_crossing(self, normal, offset, eps):
+        # Return the signed distances of our corners from the plane n.p = offset (those within eps
+        # of it being snapped to zero), along with the points where our boundary meets that plane.
+        distance_list = []
+        for point in (self.point_a, self.point_b, self.point_c):
+            distance = point.dot(normal) - offset
+            distance_list.append(distance if math.fabs(distance) >= eps else 0.0)
+        point_list = []
+        for i in range(3):
+            j = (i + 1) % 3
+            if distance_list[i] == 0.0:
+                point_list.append(self[i])
+            elif distance_list[i] * distance_list[j] < 0.0:
+                alpha = distance_list[i] / (distance_list[i] - distance_list[j])
+                point_list.append(self[i] + (self[j] - self[i]) * alpha)
+        return distance_list, point_list
+
+    def _intersect_with_triangle(self, other, eps=1e-7):
+        # This is the interval-overlap test of Moller ("A Fast Triangle-Triangle Intersection Test", 1997.)
+        # Each triangle must straddle (or touch) the plane of the other, or else they can't meet.  If they do,
+        # each triangle crosses the line where the two planes meet in an interval, and the triangles
+        # intersect in the overlap of those intervals.  The result is a LineSegment, a PointCloud of
+        # a single point where the triangles merely touch, or None.
+        # If any corner of either triangle lies within eps of the other's plane (the triangles are co-planar,
+        # or touch, or share an edge or a corner), we fall back on the edge-by-edge test this replaced, so that
+        # those contact cases give just what they always have.  The interval test only decides the clean crossings.
+        normal_b = (other.point_b - other.point_a).cross(other.point_c - other.point_a).normalized()
+        normal_a = (self.point_b - self.point_a).cross(self.point_c - self.point_a).normalized()
+        if normal_a is None or normal_b is None:
+            return None  # One of the triangles is degenerate.
+        distance_list, crossing_list = self._calc_plane_crossing(normal_b, other.point_a.dot(normal_b), eps)
+        if all([distance > 0.0 for distance in distance_list]) or all([distance < 0.0 for distance in distance_list]):
+            return None
+        other_distance_list, other_crossing_list = other._calc_plane_crossing(normal_a, self.point_a.dot(normal_a), eps)
+        if all([distance > 0.0 for distance in other_distance_list]) or all([distance < 0.0 for distance in other_distance_list]):
+            return None
+
+        direction = normal_a.cross(normal_b)
+        if any([distance == 0.0 for distance in distance_list + other_distance_list]) or direction.length() < eps:
+            return self._intersect_edge_by_edge(other, eps)
+
+        # Sort the crossing points of each triangle along the line to find the ends of its interval.
+        crossing_list.sort(key=lambda point: point.dot(direction))
+        other_crossing_list.sort(key=lambda point: point.dot(direction))
+        start = max(crossing_list[0], other_crossing_list[0], key=lambda point: point.dot(direction))
+        end = min(crossing_list[-1], other_crossing_list[-1], key=lambda point: point.dot(direction))
+        length = (end - start).dot(direction) / direction.length()
+        if length >= eps:
+            return LineSegment(start, end)
+        elif length > -eps:
+            from math3d_point_cloud import PointCloud
+            return PointCloud([start.clone()])
+        return None
+
+    def _intersect_edge_by_edge(self, other, eps=1e-7):
+        # Intersect the edges of each triangle with the other.  This is the original test, kept for co-planar and touching triangles.
+        from math3d_point_cloud import PointCloud
+        point_cloud = PointCloud()
+        for line_segment in self.yield_line_segments():
+            point = other.intersect_with(line_segment)
+            if point is not None:
+                point_cloud.add_point(point)
+        for line_segment in other.yield_line_segments():
+            point = self.intersect_with(line_segment)
+            if point is not None:
+                point_cloud.add_point(point)
+        point_list = point_cloud.point_list
+        if len(point_list) == 2:
+            line_segment = LineSegment(point_list[0], point_list[1])
+            if line_segment.length() >= eps:
+                return line_segment
+        elif len(point_list) > 0:
+            return point_cloud
@@ -0,0 +1,135 @@
+# math3d_triangle_array.py
+
+import numpy
+
+from math3d_triangle import Triangle
+from math3d_vector import Vector
+
+class TriangleArray(object):
+    # N triangles kept as three N x 3 arrays of corners.  This is the batched counterpart of
+    # Triangle, and is mainly here to test many pairs of triangles for intersection at once.
+
+    def __init__(self, point_a_array=None, point_b_array=None, point_c_array=None):
+        empty = numpy.zeros((0, 3), dtype=numpy.float64)
+        self.point_a_array = numpy.ascontiguousarray(point_a_array if point_a_array is not None else empty, dtype=numpy.float64).reshape(-1, 3)
+        self.point_b_array = numpy.ascontiguousarray(point_b_array if point_b_array is not None else empty, dtype=numpy.float64).reshape(-1, 3)
+        self.point_c_array = numpy.ascontiguousarray(point_c_array if point_c_array is not None else empty, dtype=numpy.float64).reshape(-1, 3)
+
+    def from_triangle_list(self, triangle_list):
+        self.point_a_array = numpy.array([(t.point_a.x, t.point_a.y, t.point_a.z) for t in triangle_list], dtype=numpy.float64).reshape(-1, 3)
+        self.point_b_array = numpy.array([(t.point_b.x, t.point_b.y, t.point_b.z) for t in triangle_list], dtype=numpy.float64).reshape(-1, 3)
+        self.point_c_array = numpy.array([(t.point_c.x, t.point_c.y, t.point_c.z) for t in triangle_list], dtype=numpy.float64).reshape(-1, 3)
+        return self
+
+    def from_triangle_mesh(self, tri_mesh):
+        vertex_array, index_array = tri_mesh.to_arrays()
+        self.point_a_array = vertex_array[index_array[:, 0]]
+        self.point_b_array = vertex_array[index_array[:, 1]]
+        self.point_c_array = vertex_array[index_array[:, 2]]
+        return self
+
+    def to_triangle_list(self):
+        return [self[i] for i in range(len(self))]
+
+    def __len__(self):
+        return self.point_a_array.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, numpy.integer)):
+            return Triangle(Vector(*self.point_a_array[i].tolist()), Vector(*self.point_b_array[i].tolist()), Vector(*self.point_c_array[i].tolist()), copy=False)
+        return TriangleArray(self.point_a_array[i], self.point_b_array[i], self.point_c_array[i])
+
+    def calc_area_array(self):
+        return numpy.linalg.norm(numpy.cross(self.point_b_array - self.point_a_array, self.point_c_array - self.point_a_array), axis=1) / 2.0
+
+    def calc_unit_normal_array(self):
+        # Degenerate triangles get a normal of all NaN.
+        normal_array = numpy.cross(self.point_b_array - self.point_a_array, self.point_c_array - self.point_a_array)
+        length_array = numpy.sqrt(numpy.einsum('ni,ni->n', normal_array, normal_array))
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return normal_array * (1.0 / length_array)[:, numpy.newaxis]
+
+    @staticmethod
+    def _dot(u, v):
+        return u[..., 0] * v[..., 0] + u[..., 1] * v[..., 1] + u[..., 2] * v[..., 2]
+
+    @staticmethod
+    def _calc_plane_crossing(corner_list, normal, offset, direction, eps):
+        # This is the batched form of Triangle._calc_plane_crossing.  The corners are arrays broadcasting
+        # against the plane normal and offset.  Rather than the crossing points themselves, return the
+        # snapped distances and the smallest and largest positions of the crossing points along the given
+        # direction, which is where the interval of the triangle along the line of the two planes begins and ends.
+        distance_list = []
+        for point in corner_list:
+            distance = TriangleArray._dot(point, normal) - offset
+            distance_list.append(numpy.where(numpy.fabs(distance) >= eps, distance, 0.0))
+        shape = distance_list[0].shape
+        start = numpy.full(shape, numpy.inf)
+        end = numpy.full(shape, -numpy.inf)
+        for i in range(3):
+            j = (i + 1) % 3
+            position = TriangleArray._dot(corner_list[i], direction)
+            on_plane = distance_list[i] == 0.0
+            start = numpy.where(on_plane, numpy.minimum(start, position), start)
+            end = numpy.where(on_plane, numpy.maximum(end, position), end)
+            crossing = distance_list[i] * distance_list[j] < 0.0
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                alpha = distance_list[i] / (distance_list[i] - distance_list[j])
+                point = corner_list[i] + (corner_list[j] - corner_list[i]) * alpha[..., numpy.newaxis]
+                position = TriangleArray._dot(point, direction)
+            start = numpy.where(crossing, numpy.minimum(start, position), start)
+            end = numpy.where(crossing, numpy.maximum(end, position), end)
+        return distance_list, start, end
+
+    def intersect_mask(self, other, eps=1e-7):
+        # Return the N x M boolean array telling which triangles here intersect which triangles of the other
+        # array.  Entry (i, j) is true just when self[i].intersect_with(other[j], eps) would not be None.
+        # The rare co-planar or touching pairs are handed to Triangle one at a time, as intersect_with does.
+        normal_a = self.calc_unit_normal_array()[:, numpy.newaxis, :]
+        normal_b = other.calc_unit_normal_array()[numpy.newaxis, :, :]
+        corner_list_a = [array[:, numpy.newaxis, :] for array in (self.point_a_array, self.point_b_array, self.point_c_array)]
+        corner_list_b = [array[numpy.newaxis, :, :] for array in (other.point_a_array, other.point_b_array, other.point_c_array)]
+        offset_a = self._dot(corner_list_a[0], normal_a)
+        offset_b = self._dot(corner_list_b[0], normal_b)
+        direction = numpy.stack([
+            normal_a[..., 1] * normal_b[..., 2] - normal_a[..., 2] * normal_b[..., 1],
+            normal_a[..., 2] * normal_b[..., 0] - normal_a[..., 0] * normal_b[..., 2],
+            normal_a[..., 0] * normal_b[..., 1] - normal_a[..., 1] * normal_b[..., 0]], axis=-1)
+        direction_length = numpy.sqrt(self._dot(direction, direction))
+
+        distance_list_a, start_a, end_a = self._calc_plane_crossing(corner_list_a, normal_b, offset_b, direction, eps)
+        distance_list_b, start_b, end_b = self._calc_plane_crossing(corner_list_b, normal_a, offset_a, direction, eps)
+
+        def straddles(distance_list):
+            above = (distance_list[0] > 0.0) & (distance_list[1] > 0.0) & (distance_list[2] > 0.0)
+            below = (distance_list[0] < 0.0) & (distance_list[1] < 0.0) & (distance_list[2] < 0.0)
+            return ~above & ~below
+        candidate = straddles(distance_list_a) & straddles(distance_list_b)
+        candidate &= numpy.isfinite(normal_a[..., 0]) & numpy.isfinite(normal_b[..., 0])
+
+        touching = numpy.zeros(candidate.shape, dtype=bool)
+        for distance in distance_list_a + distance_list_b:
+            touching |= distance == 0.0
+        touching |= direction_length < eps
+        touching &= candidate
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            length = (numpy.minimum(end_a, end_b) - numpy.maximum(start_a, start_b)) / direction_length
+        mask = candidate & ~touching & (length > -eps)
+        for i, j in zip(*numpy.nonzero(touching)):
+            mask[i, j] = self[int(i)]._intersect_edge_by_edge(other[int(j)], eps) is not None
+        return mask
+
+    def find_intersecting_pairs(self, other, eps=1e-7, chunk_size=1 << 20):
+        # Return arrays i and j, in ascending (i, j) order, listing every intersecting pair (self[i], other[j]).
+        # The pairs are tested in blocks of rows of about chunk_size pairs each to bound the memory used.
+        row_count = max(1, chunk_size // max(1, len(other)))
+        i_list = []
+        j_list = []
+        for start in range(0, len(self), row_count):
+            i_array, j_array = numpy.nonzero(self[start:start + row_count].intersect_mask(other, eps))
+            i_list.append(i_array + start)
+            j_list.append(j_array)
+        if len(i_list) == 0:
+            return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+        return numpy.concatenate(i_list), numpy.concatenate(j_list)
@@ -1,11 +1,14 @@
 # math3d_triangle_mesh.py
 
+import functools
+import itertools
 import math
 
 from math3d_side import Side
 from math3d_triangle import Triangle
 from math3d_vector import Vector
 from math3d_line_segment import LineSegment
+from math3d_spatial_hash import SpatialHash
 
 class Polyhedron:
     TETRAHEDRON = 0
@@ -16,18 +19,142 @@ class Polyhedron:
     TRUNCATED_TETRAHEDRON = 5
     TRUNCATED_OCTAHEDRON = 6
 
+class NormalWeighting:
+    UNIFORM = 0     # Each triangle about a vertex counts equally.
+    AREA = 1        # Each triangle counts in proportion to its area.
+    ANGLE = 2       # Each triangle counts in proportion to its angle at the vertex.
+
+class VertexList(list):
+    # The vertex list of a mesh.  This is an ordinary list, except that it counts the changes made to it that
+    # don't simply append vertices, so that the caches kept by the mesh can tell when they have gone stale.
+    # Appending is left uncounted, as the caches are brought up to date with the vertices appended instead.
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.revision = 0
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self.revision += 1
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self.revision += 1
+
+    def __imul__(self, count):
+        self.revision += 1
+        return super().__imul__(count)
+
+    def insert(self, i, value):
+        super().insert(i, value)
+        self.revision += 1
+
+    def pop(self, *args):
+        self.revision += 1
+        return super().pop(*args)
+
+    def remove(self, value):
+        super().remove(value)
+        self.revision += 1
+
+    def clear(self):
+        super().clear()
+        self.revision += 1
+
+    def reverse(self):
+        super().reverse()
+        self.revision += 1
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.revision += 1
+
 class TriangleMesh(object):
     def __init__(self, mesh=None):
+        self.edge_map_enabled = False
+        self._drawn_render_buffer_map = {}
+        self._revision = 0
         if mesh is None:
             self.clear()
         else:
             mesh = mesh.clone()
             self.vertex_list = mesh.vertex_list
             self.triangle_list = mesh.triangle_list
+            self.invalidate_caches()
     
     def clear(self):
         self.vertex_list = []
         self.triangle_list = []
+        self.invalidate_caches()
+    
+    @property
+    def vertex_list(self):
+        return self._vertex_list
+    
+    @vertex_list.setter
+    def vertex_list(self, vertex_list):
+        # Any list given is copied into a VertexList, so that vertices replaced in place are noticed by the caches.
+        self._vertex_list = vertex_list if isinstance(vertex_list, VertexList) else VertexList(vertex_list)
+    
+    def invalidate_caches(self):
+        # Everything derived from the vertices and triangles of the mesh is cached as needed.
+        # Appending to the vertex and triangle lists, replacing them entirely, replacing or removing
+        # vertices, and the changes made by the methods of this class are all detected automatically,
+        # but call this after changing the coordinates of a vertex, or changing the triangle list
+        # other than by appending to it.
+        self._vertex_hash = None
+        self._vertex_hash_list = None
+        self._edge_map = None
+        self._edge_map_list = None
+        self._vertex_normal_map = {}
+        self._render_buffer_map = {}
+    
+    def _calc_cache_key(self):
+        # Along with the identity of the two lists, this tells when a cache of something derived from the mesh is stale.
+        # The revision counts the changes made by the methods here that don't show up in the lengths of the lists.
+        return (len(self.vertex_list), len(self.triangle_list), self._revision, self.vertex_list.revision)
+    
+    def enable_edge_map(self):
+        # With the edge map enabled, every directed edge of the mesh is indexed by the offsets of
+        # the triangles having that edge, so that find_triangle, find_adjacent_triangles and
+        # toggle_triangle need not scan the whole triangle list.  Note that, to keep removal O(1),
+        # toggle_triangle then moves the last triangle into the vacated slot, so the order of the
+        # triangle list is not preserved.
+        self.edge_map_enabled = True
+        return self
+    
+    def disable_edge_map(self):
+        self.edge_map_enabled = False
+        self._edge_map = None
+        self._edge_map_list = None
+        return self
+    
+    def _update_edge_map(self):
+        if self._edge_map is None or self._edge_map_list is not self.triangle_list or self._edge_map_count > len(self.triangle_list):
+            self._edge_map = {}
+            self._edge_map_list = self.triangle_list
+            self._edge_map_count = 0
+        for offset in range(self._edge_map_count, len(self.triangle_list)):
+            self._add_to_edge_map(self.triangle_list[offset], offset)
+        self._edge_map_count = len(self.triangle_list)
+        return self._edge_map
+    
+    def _add_to_edge_map(self, triple, offset):
+        for i in range(3):
+            edge = (triple[i], triple[(i + 1) % 3])
+            offset_list = self._edge_map.get(edge)
+            if offset_list is None:
+                self._edge_map[edge] = [offset]
+            else:
+                offset_list.append(offset)
+    
+    def _remove_from_edge_map(self, triple, offset):
+        for i in range(3):
+            edge = (triple[i], triple[(i + 1) % 3])
+            offset_list = self._edge_map[edge]
+            offset_list.remove(offset)
+            if len(offset_list) == 0:
+                del self._edge_map[edge]
     
     def clone(self):
         new_mesh = TriangleMesh()
@@ -49,9 +176,11 @@ class TriangleMesh(object):
     def is_convex(self):
         pass # TODO: Determine whether the mesh forms a convex or concave shape.
 
-    def yield_triangles(self):
+    def yield_triangles(self, copy=True):
+        # Pass copy=False to get triangles that share this mesh's vertices, which is
+        # cheaper, but then the caller must not modify the triangle points in place.
         for triangle in self.triangle_list:
-            yield self.make_triangle(triangle)
+            yield self.make_triangle(triangle, copy=copy)
     
     def to_dict(self):
         data = {
@@ -65,6 +194,31 @@ class TriangleMesh(object):
         self.triangle_list = [(triple[0], triple[1], triple[2]) for triple in data.get('triangle_list', [])]
         return self
     
+    def save_binary(self, path, single_precision=False):
+        from math3d_binary_file import BinaryFile, BinaryFileKind
+        vertex_array, index_array = self.to_arrays()
+        BinaryFile.write(path, vertex_array, index_array, BinaryFileKind.TRIANGLE_MESH, single_precision)
+    
+    def load_binary(self, path):
+        from math3d_binary_file import BinaryFile
+        binary_file = BinaryFile(path)
+        return self.from_arrays(binary_file.vertex_array, binary_file.index_array)
+    
+    def to_arrays(self):
+        # Return the vertices as a V x 3 float array and the triangles as a T x 3 integer array of vertex offsets.
+        import numpy
+        from math3d_vector_array import VectorArray
+        vertex_array = VectorArray().from_vector_list(self.vertex_list).array
+        index_array = numpy.array(self.triangle_list, dtype=numpy.int64).reshape(-1, 3)
+        return vertex_array, index_array
+    
+    def from_arrays(self, vertex_array, index_array):
+        from math3d_vector_array import VectorArray
+        self.vertex_list = VectorArray(vertex_array).to_vector_list()
+        self.triangle_list = [(i, j, k) for i, j, k in index_array.tolist()]
+        self.invalidate_caches()
+        return self
+    
     def to_triangle_list(self):
         return [triangle for triangle in self.yield_triangles()]
     
@@ -89,6 +243,7 @@ class TriangleMesh(object):
                 self.find_or_add_vertex(triangle.point_c)
             )
             self.triangle_list.append(new_triangle)
+        self._revision += 1
         return self
     
     def add_quad(self, v0, v1, v2, v3):
@@ -103,6 +258,17 @@ class TriangleMesh(object):
             triple_list.append(triangle)
         if check_reverse:
             triple_list.append((triangle[2], triangle[1], triangle[0]))
+        if self.edge_map_enabled:
+            # Any rotation of a triple has the triple's first edge, so we need only look at triangles having that edge.
+            edge_map = self._update_edge_map()
+            found = None
+            for triple in triple_list:
+                for i in edge_map.get((triple[0], triple[1]), []):
+                    existing_triangle = self.triangle_list[i]
+                    if any([existing_triangle[j] == triple[0] and existing_triangle[(j + 1) % 3] == triple[1] and existing_triangle[(j + 2) % 3] == triple[2] for j in range(3)]):
+                        if found is None or i < found:
+                            found = i
+            return found
         for i, existing_triangle in enumerate(self.triangle_list):
             for triple in triple_list:
                 if existing_triangle == triple:
@@ -114,6 +280,19 @@ class TriangleMesh(object):
 
     def find_adjacent_triangles(self, triangle):
         adjacent_triangles_list = []
+        if self.edge_map_enabled:
+            # A triangle is adjacent across edge (a, b) of the given triangle if it has the edge (b, a).
+            edge_map = self._update_edge_map()
+            for i in range(3):
+                for offset in edge_map.get((triangle[(i + 1) % 3], triangle[i]), []):
+                    existing_triangle = self.triangle_list[offset]
+                    if existing_triangle == triangle:
+                        continue
+                    for j in range(3):
+                        if existing_triangle[j] == triangle[i] and existing_triangle[(j - 1) % 3] == triangle[(i + 1) % 3]:
+                            adjacent_triangles_list.append((existing_triangle, (j - 2) % 3, offset))
+            adjacent_triangles_list.sort(key=lambda adjacent_triangle: adjacent_triangle[2])
+            return adjacent_triangles_list
         for offset, existing_triangle in enumerate(self.triangle_list):
             if existing_triangle == triangle:
                 continue
@@ -127,26 +306,53 @@ class TriangleMesh(object):
 
     def toggle_triangle(self, triangle, check_forward=True, check_reverse=False):
         i = self.find_triangle(triangle, check_forward=check_forward, check_reverse=check_reverse)
-        if i is not None:
-            del self.triangle_list[i]
-        else:
+        if i is None:
             self.add_triangle(triangle)
+        elif self.edge_map_enabled:
+            j = len(self.triangle_list) - 1
+            self._remove_from_edge_map(self.triangle_list[i], i)
+            if i != j:
+                self._remove_from_edge_map(self.triangle_list[j], j)
+                self._add_to_edge_map(self.triangle_list[j], i)
+                self.triangle_list[i] = self.triangle_list[j]
+            self.triangle_list.pop()
+            self._edge_map_count -= 1
+            self._revision += 1
+        else:
+            del self.triangle_list[i]
+            self._revision += 1
     
-    def make_triangle(self, triangle):
+    def make_triangle(self, triangle, copy=True):
         if isinstance(triangle, tuple) or isinstance(triangle, list):
             point_a = self.vertex_list[triangle[0]]
             point_b = self.vertex_list[triangle[1]]
             point_c = self.vertex_list[triangle[2]]
-            return Triangle(point_a, point_b, point_c)
+            return Triangle(point_a, point_b, point_c, copy=copy)
         elif isinstance(triangle, int):
-            return self.make_triangle(self.triangle_list[triangle])
+            return self.make_triangle(self.triangle_list[triangle], copy=copy)
     
     def find_vertex(self, given_point, eps=1e-7):
-        # TODO: If a BSP tree was available, using that would speed this up considerably.
-        #       Instead of a linear search, here we would have a logarithmic one.
-        for i, point in enumerate(self.vertex_list):
-            if (point - given_point).length() < eps:
-                return i
+        # This returns what a linear search for the first vertex within eps of the given point would,
+        # but we only visit vertices in nearby cells of a spatial hash, which we build on first use
+        # and keep up to date as vertices are appended.
+        if not eps > 0.0:
+            return None
+        return self._update_vertex_hash(eps).find_point(self.vertex_list, given_point, eps)
+    
+    def _update_vertex_hash(self, eps):
+        # The cells must be large next to eps, or a query would visit a huge number of them, so the hash is
+        # rebuilt when asked for a larger eps than it was built for.  A smaller eps only makes queries filter more.
+        # It is also rebuilt when vertices have been replaced or removed, as the vertex list tells us.
+        if (self._vertex_hash is None or self._vertex_hash_list is not self.vertex_list or self._vertex_hash_count > len(self.vertex_list) or
+                self._vertex_hash_revision != self.vertex_list.revision or self._vertex_hash.cell_size < 16.0 * eps):
+            self._vertex_hash = SpatialHash(cell_size=16.0 * eps)
+            self._vertex_hash_list = self.vertex_list
+            self._vertex_hash_revision = self.vertex_list.revision
+            self._vertex_hash_count = 0
+        if self._vertex_hash_count < len(self.vertex_list):
+            self._vertex_hash.add_point_list(self.vertex_list, self._vertex_hash_count)
+            self._vertex_hash_count = len(self.vertex_list)
+        return self._vertex_hash
     
     def find_or_add_vertex(self, new_point, eps=1e-7):
         i = self.find_vertex(new_point, eps=eps)
@@ -158,7 +364,7 @@ class TriangleMesh(object):
     def side(self, other, eps=1e-7):
         if isinstance(other, Vector):
             # Assuming this mesh to be a convex hull, tell us which side the given point is on.
-            for triangle in self.yield_triangles():
+            for triangle in self.yield_triangles(copy=False):
                 plane = triangle.calc_plane()
                 side = plane.side(other, eps)
                 if side == Side.FRONT:
@@ -170,6 +376,8 @@ class TriangleMesh(object):
         # The correctness of this algorithm depends on the mesh being normalized.
         triangle_mesh_list = []
         visited_triangle_set = set()
+        edge_map_enabled = self.edge_map_enabled
+        self.enable_edge_map()
 
         while True:
 
@@ -187,6 +395,7 @@ class TriangleMesh(object):
             # Otherwise, perform a DFS starting at the found triangle.
             triangle_mesh = TriangleMesh()
             triangle_mesh_list.append(triangle_mesh)
+            queued_triangle_set = set(queue)
             while len(queue) > 0:
                 i = queue.pop()
                 visited_triangle_set.add(i)
@@ -194,13 +403,19 @@ class TriangleMesh(object):
                 adjacent_triangle_list = self.find_adjacent_triangles(self.triangle_list[i])
                 for adjacent_triangle in adjacent_triangle_list:
                     i = adjacent_triangle[2]
-                    if i not in queue and i not in visited_triangle_set:
+                    if i not in queued_triangle_set and i not in visited_triangle_set:
                         queue.append(i)
+                        queued_triangle_set.add(i)
 
+        if not edge_map_enabled:
+            self.disable_edge_map()
         return triangle_mesh_list
 
-    def split_against_mesh(self, tri_mesh):
+    def split_against_mesh(self, tri_mesh, worker_count=1, chunk_size=None):
         # The given mesh must be a convex shape.  If not, the result is left undefined.
+        # Alternatively, a BspTree of the cut-shape may be given, in which case it need not be convex.
+        # Each triangle is cut independently of the others, so with a worker count other than 1, the
+        # triangles are divided among that many processes (or one per available CPU if None is given.)
         # The caller might want to reduce/normalize the returned meshes for efficiency purposes.
         # NOTE: Long after writing this routine, I ran across the following article...
         #       https://www.researchgate.net/publication/220721659_Set_operation_on_polyhedra_using_binary_space_partitioning_trees
@@ -209,32 +424,52 @@ class TriangleMesh(object):
         #       of the cut-shape.  This helps us solve the classification problem for non-convex shapes,
         #       which is part of the underlying problem being solved for the algorithm naively implemented here.
         #       There's surely more to it than just that, but anyhow, it's worth noting if I ever return to this code.
-        back_mesh_list = []
-        front_mesh_list = []
-
-        triangle_list = self.to_triangle_list()
-
-        while len(triangle_list) > 0:
-            triangle = triangle_list.pop(0)
-
-            side_list = [tri_mesh.side(triangle[i]) for i in range(3)]
-            if all([side == Side.BACK for side in side_list]):
-                back_mesh_list.append(triangle)
-            else:
-                for cutting_triangle in tri_mesh.yield_triangles():
-                    result = triangle.intersect_with(cutting_triangle)
-                    if result is not None:
-                        cutting_plane = cutting_triangle.calc_plane()
-                        back_list, front_list = triangle.split_against_plane(cutting_plane)
-                        if len(back_list) > 0 and len(front_list) > 0:
-                            triangle_list += back_list + front_list
-                            break
-                else:
-                    front_mesh_list.append(triangle)
-
-        front_tri_mesh = TriangleMesh().from_triangle_list(front_mesh_list)
-        back_tri_mesh = TriangleMesh().from_triangle_list(back_mesh_list)
+        from math3d_bsp_tree import BspTree
+        if isinstance(tri_mesh, BspTree):
+            back_mesh_list, front_mesh_list = tri_mesh.split_triangle_list(self.to_triangle_list())
+            return TriangleMesh().from_triangle_list(back_mesh_list), TriangleMesh().from_triangle_list(front_mesh_list)
+
+        from math3d_mesh_cutter import MeshCutter
+
+        if worker_count is None:
+            import os
+            worker_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+        if worker_count <= 1 or len(self.triangle_list) <= 1:
+            vertex_list = [vertex.clone() for vertex in self.vertex_list]
+            back_list, front_list = MeshCutter(tri_mesh).split_triangle_list(vertex_list, list(self.triangle_list))
+            return TriangleMesh()._add_vertex_subset(vertex_list, back_list), TriangleMesh()._add_vertex_subset(vertex_list, front_list)
+
+        # Otherwise, the source triangles are cut in ranges of chunk_size by a pool of processes, and the results are
+        # gathered, in order, into the output meshes.  Cut points shared by ranges are computed the same way in each,
+        # so they are welded back together here.
+        import multiprocessing
+        from math3d_mesh_cutter import _init_worker, _split_range
+        from math3d_vector_array import VectorArray
+        if chunk_size is None:
+            chunk_size = max(1, -(-len(self.triangle_list) // (4 * worker_count)))
+        range_list = [(start, min(start + chunk_size, len(self.triangle_list))) for start in range(0, len(self.triangle_list), chunk_size)]
+        back_tri_mesh = TriangleMesh()
+        front_tri_mesh = TriangleMesh()
+        initargs = tri_mesh.to_arrays() + self.to_arrays() + (1e-7,)
+        with multiprocessing.Pool(min(worker_count, len(range_list)), initializer=_init_worker, initargs=initargs) as pool:
+            for vertex_array, back_list, front_list in pool.imap(_split_range, range_list):
+                vertex_list = VectorArray(vertex_array).to_vector_list()
+                back_tri_mesh._add_vertex_subset(vertex_list, back_list)
+                front_tri_mesh._add_vertex_subset(vertex_list, front_list)
         return back_tri_mesh, front_tri_mesh
+
+    def _add_vertex_subset(self, vertex_list, triangle_list):
+        # Add to this mesh the given triples of offsets into the given list, adding only the vertices used.
+        # Vertices within eps of one another are welded, as add_triangle would do.
+        offset_map = {}
+        for triple in triangle_list:
+            new_triple = []
+            for i in triple:
+                if i not in offset_map:
+                    offset_map[i] = self.find_or_add_vertex(vertex_list[i].clone())
+                new_triple.append(offset_map[i])
+            self.triangle_list.append(tuple(new_triple))
+        return self
     
     def calc_center(self):
         from math3d_point_cloud import PointCloud
@@ -243,66 +478,65 @@ class TriangleMesh(object):
     def calc_triangle_center(self):
         from math3d_point_cloud import PointCloud
         point_cloud = PointCloud()
-        for triangle in self.yield_triangles():
+        for triangle in self.yield_triangles(copy=False):
             point_cloud.add_point(triangle.calc_center())
         return point_cloud.calc_center()
     
-    def calc_vertex_normals(self):
-        normal_list = []
-        for i, vertex in enumerate(self.vertex_list):
-            normal = Vector(0.0, 0.0, 0.0)
-            for triple in self.triangle_list:
-                if any([triple[j] == i for j in range(3)]):
-                    triangle = self.make_triangle(triple)
-                    try:
-                        plane = triangle.calc_plane()
-                    except Exception as ex:
-                        error = str(ex)
-                        error = None
-                    else:
-                        normal += plane.unit_normal
-            normal = normal.normalized()
-            if normal is None:
-                normal = Vector(1.0, 0.0, 0.0)
-            normal_list.append(normal)
-        return normal_list
+    def calc_vertex_normals(self, weighting=NormalWeighting.UNIFORM):
+        from math3d_vector_array import VectorArray
+        return VectorArray(self.calc_vertex_normal_array(weighting)).to_vector_list()
+    
+    def calc_vertex_normal_array(self, weighting=NormalWeighting.UNIFORM):
+        # Return a V x 3 array whose i-th row is the unit normal at the i-th vertex: the weighted sum of the normals
+        # of the triangles using it, normalized.  Degenerate triangles are ignored, and a vertex used by no other
+        # triangle gets the normal (1, 0, 0).  Rather than visit the triangles of each vertex, we scatter the normal
+        # of each triangle to its three vertices.  The array is cached until the mesh changes, so it is read-only.
+        import numpy
+        key = self._calc_cache_key()
+        cached = self._vertex_normal_map.get(weighting)
+        if cached is not None and cached[0] is self.vertex_list and cached[1] is self.triangle_list and cached[2] == key:
+            return cached[3]
+
+        vertex_array, index_array = self.to_arrays()
+        corner_list = [vertex_array[index_array[:, k]] for k in range(3)]
+        normal_array = numpy.cross(corner_list[1] - corner_list[0], corner_list[2] - corner_list[0])
+        length_array = numpy.linalg.norm(normal_array, axis=1)
+        valid = length_array > 0.0
+        unit_normal_array = numpy.zeros_like(normal_array)
+        unit_normal_array[valid] = normal_array[valid] / length_array[valid, numpy.newaxis]
+
+        vertex_normal_array = numpy.zeros((len(self.vertex_list), 3), dtype=numpy.float64)
+        for k in range(3):
+            if weighting == NormalWeighting.AREA:
+                contribution_array = normal_array * 0.5
+            elif weighting == NormalWeighting.ANGLE:
+                edge_a = corner_list[(k + 1) % 3] - corner_list[k]
+                edge_b = corner_list[(k + 2) % 3] - corner_list[k]
+                angle_array = numpy.arctan2(numpy.linalg.norm(numpy.cross(edge_a, edge_b), axis=1), numpy.einsum('ni,ni->n', edge_a, edge_b))
+                contribution_array = unit_normal_array * angle_array[:, numpy.newaxis]
+            else:
+                contribution_array = unit_normal_array
+            for axis in range(3):
+                vertex_normal_array[:, axis] += numpy.bincount(index_array[:, k], weights=contribution_array[:, axis], minlength=len(self.vertex_list))
+
+        length_array = numpy.linalg.norm(vertex_normal_array, axis=1)
+        valid = length_array > 0.0
+        vertex_normal_array[valid] /= length_array[valid, numpy.newaxis]
+        vertex_normal_array[~valid] = (1.0, 0.0, 0.0)
+        vertex_normal_array.setflags(write=False)
+        self._vertex_normal_map[weighting] = (self.vertex_list, self.triangle_list, key, vertex_normal_array)
+        return vertex_normal_array
     
     @staticmethod
-    def make_polyhedron(polyhedron):
-        from math3d_point_cloud import PointCloud
-        point_cloud = PointCloud()
-        
-        phi = (1.0 + 5.0 ** 0.5) / 2.0
-        
-        if polyhedron == Polyhedron.TETRAHEDRON:
-            point_cloud.point_list = [point for point in Vector(1.0, 0.0, -1.0 / math.sqrt(2.0)).sign_permute(True, False, False)]
-            point_cloud.point_list += [point for point in Vector(0.0, 1.0, 1.0 / math.sqrt(2.0)).sign_permute(False, True, False)]
-        elif polyhedron == Polyhedron.HEXAHEDRON:
-            point_cloud.point_list = [point for point in Vector(1.0, 1.0, 1.0).sign_permute()]
-        elif polyhedron == Polyhedron.ICOSAHEDRON:
-            point_cloud.point_list = [point for point in Vector(0.0, 1.0, phi).sign_permute(False, True, True)]
-            point_cloud.point_list += [point for point in Vector(phi, 0.0, 1.0).sign_permute(True, False, True)]
-            point_cloud.point_list += [point for point in Vector(1.0, phi, 0.0).sign_permute(True, True, False)]
-        elif polyhedron == Polyhedron.DODECAHEDRON:
-            point_cloud.point_list = [point for point in Vector(1.0, 1.0, 1.0).sign_permute()]
-            point_cloud.point_list += [point for point in Vector(0.0, phi, 1.0 / phi).sign_permute(False, True, True)]
-            point_cloud.point_list += [point for point in Vector(1.0 / phi, 0.0, phi).sign_permute(True, False, True)]
-            point_cloud.point_list += [point for point in Vector(phi, 1.0 / phi, 0.0).sign_permute(True, True, False)]
-        elif polyhedron == Polyhedron.ICOSIDODECAHEDRON:
-            point_cloud.point_list = [point for point in Vector(phi, 0.0, 0.0).sign_permute(True, False, False)]
-            point_cloud.point_list += [point for point in Vector(0.0, phi, 0.0).sign_permute(False, True, False)]
-            point_cloud.point_list += [point for point in Vector(0.0, 0.0, phi).sign_permute(False, False, True)]
-            point_cloud.point_list += [point for point in Vector(0.5, phi / 2.0, phi * phi / 2.0).sign_permute()]
-            point_cloud.point_list += [point for point in Vector(phi * phi / 2.0, 0.5, phi / 2.0).sign_permute()]
-            point_cloud.point_list += [point for point in Vector(phi / 2.0, phi * phi / 2.0, 0.5).sign_permute()]
-        elif polyhedron == Polyhedron.TRUNCATED_TETRAHEDRON:
-            point_cloud.point_list = [Vector(3.0, 1.0, 1.0), Vector(-3.0, -1.0, 1.0), Vector(-3.0, 1.0, -1.0), Vector(3.0, -1.0, -1.0)]
-            point_cloud.point_list += [Vector(1.0, 3.0, 1.0), Vector(-1.0, -3.0, 1.0), Vector(-1.0, 3.0, -1.0), Vector(1.0, -3.0, -1.0)]
-            point_cloud.point_list += [Vector(1.0, 1.0, 3.0), Vector(-1.0, -1.0, 3.0), Vector(-1.0, 1.0, -3.0), Vector(1.0, -1.0, -3.0)]
-        elif polyhedron == Polyhedron.TRUNCATED_OCTAHEDRON:
-            point_cloud.point_list += [point for point in Vector(0.0, 1.0, 2.0).sign_permute()]
-
-        return point_cloud.find_convex_hull()
+    def make_polyhedron(polyhedron, scale=1.0, transform=None):
+        # Return a new mesh of the given polyhedron, scaled about the origin and then, if given, transformed.
+        # The shapes are only worked out once; see make_polyhedron_arrays.
+        vertex_array, index_array = make_polyhedron_arrays(polyhedron)
+        if scale != 1.0:
+            vertex_array = vertex_array * scale
+        if transform is not None:
+            vertex_array = transform.apply_to_array(vertex_array)
+        return TriangleMesh().from_arrays(vertex_array, index_array)
     
     @staticmethod
     def make_disk(center, unit_normal, radius, sides):
@@ -327,43 +561,77 @@ class TriangleMesh(object):
 
     def area(self):
         total = 0.0
-        for triangle in self.yield_triangles():
+        for triangle in self.yield_triangles(copy=False):
             total += triangle.area()
         return total
 
-    def render(self, random_colors=False):
-        from OpenGL.GL import GL_TRIANGLES, glBegin, glEnd, glVertex3f, glNormal3f, glColor3f
-        
-        glBegin(GL_TRIANGLES)
-        try:
-            for triangle in self.yield_triangles():
-                plane = triangle.calc_plane()
-                glNormal3f(plane.unit_normal.x, plane.unit_normal.y, plane.unit_normal.z)
-                if random_colors:
-                    color = Vector().random()
-                    glColor3f(color.x, color.y, color.z)
-                glVertex3f(triangle.point_a.x, triangle.point_a.y, triangle.point_a.z)
-                glVertex3f(triangle.point_b.x, triangle.point_b.y, triangle.point_b.z)
-                glVertex3f(triangle.point_c.x, triangle.point_c.y, triangle.point_c.z)
-        except Exception as ex:
-            error = str(ex)
-            error = None
-        finally:
-            glEnd()
+    def make_render_buffer(self, smooth=False, random_colors=False):
+        # Return a RenderBuffer for drawing the mesh as GL_TRIANGLES.  If smooth is given, the vertices are shared
+        # and carry the vertex normals; otherwise each triangle gets its own three vertices carrying its face normal.
+        # If random_colors is given, each triangle is also given a random color.  The buffer is cached until the mesh changes.
+        return self._cached_render_buffer(('triangles', smooth, random_colors), lambda: self._build_render_buffer(smooth, random_colors))
+
+    def _cached_render_buffer(self, kind, build):
+        key = self._calc_cache_key()
+        cached = self._render_buffer_map.get(kind)
+        if cached is not None and cached[0] is self.vertex_list and cached[1] is self.triangle_list and cached[2] == key:
+            return cached[3]
+        render_buffer = build()
+        self._render_buffer_map[kind] = (self.vertex_list, self.triangle_list, key, render_buffer)
+        return render_buffer
+
+    def _build_render_buffer(self, smooth, random_colors):
+        import numpy
+        from math3d_render_buffer import RenderBuffer
+        vertex_array, index_array = self.to_arrays()
+        color_array = None
+        if smooth and not random_colors:
+            return RenderBuffer(numpy.hstack([vertex_array, self.calc_vertex_normal_array()]), index_array)
+        corner_array = vertex_array[index_array].reshape(-1, 3)
+        if smooth:
+            normal_array = self.calc_vertex_normal_array()[index_array.ravel()]
+        else:
+            normal_array = self._calc_triangle_normal_array(vertex_array, index_array).repeat(3, axis=0)
+        if random_colors:
+            color_array = numpy.random.random((len(index_array), 3)).repeat(3, axis=0)
+        return RenderBuffer(numpy.hstack([corner_array, normal_array]), numpy.arange(len(corner_array)), color_array)
+
+    @staticmethod
+    def _calc_triangle_normal_array(vertex_array, index_array):
+        import numpy
+        corner_list = [vertex_array[index_array[:, k]] for k in range(3)]
+        normal_array = numpy.cross(corner_list[1] - corner_list[0], corner_list[2] - corner_list[0])
+        length_array = numpy.linalg.norm(normal_array, axis=1)
+        valid = length_array > 0.0
+        normal_array[valid] /= length_array[valid, numpy.newaxis]
+        return normal_array
+
+    def make_normals_render_buffer(self, length=1.0):
+        # Return a RenderBuffer for drawing the face normals of the mesh, at the given length, as GL_LINES.
+        import numpy
+        from math3d_render_buffer import RenderBuffer
+        def build():
+            vertex_array, index_array = self.to_arrays()
+            center_array = vertex_array[index_array].mean(axis=1)
+            tip_array = center_array + self._calc_triangle_normal_array(vertex_array, index_array) * length
+            return RenderBuffer(numpy.stack([center_array, tip_array], axis=1).reshape(-1, 3), numpy.arange(2 * len(index_array)))
+        return self._cached_render_buffer(('normals', length), build)
+
+    def _draw_render_buffer(self, render_buffer, mode):
+        # The vertex buffer objects of a buffer made stale by changes to the mesh are freed once we draw its replacement.
+        drawn_buffer = self._drawn_render_buffer_map.get(mode)
+        if drawn_buffer is not None and drawn_buffer is not render_buffer:
+            drawn_buffer.release()
+        self._drawn_render_buffer_map[mode] = render_buffer
+        render_buffer.draw(mode)
+
+    def render(self, random_colors=False, smooth=False):
+        from OpenGL.GL import GL_TRIANGLES
+        self._draw_render_buffer(self.make_render_buffer(smooth, random_colors), GL_TRIANGLES)
     
     def render_normals(self, length=1.0):
-        from OpenGL.GL import GL_LINES, glBegin, glEnd, glVertex3f
-        
-        glBegin(GL_LINES)
-        try:
-            for triangle in self.yield_triangles():
-                plane = triangle.calc_plane()
-                center = triangle.calc_center()
-                tip = center + plane.unit_normal * length
-                glVertex3f(center.x, center.y, center.z)
-                glVertex3f(tip.x, tip.y, tip.z)
-        finally:
-            glEnd()
+        from OpenGL.GL import GL_LINES
+        self._draw_render_buffer(self.make_normals_render_buffer(length), GL_LINES)
     
     def find_boundary_loops(self):
         # If the mesh is not a typical manifold, the results of this function are undefined.
@@ -442,17 +710,11 @@ class TriangleMesh(object):
         return line_loop_list
 
     def remove_degenerate_triangles(self, eps=1e-7):
-        count = 0
-        while True:
-            for triple in self.triangle_list:
-                triangle = self.make_triangle(triple)
-                area = triangle.area()
-                if area < eps:
-                    self.triangle_list.remove(triple)
-                    count += 1
-                    break
-            else:
-                break
+        kept_list = [triple for triple in self.triangle_list if self.make_triangle(triple, copy=False).area() >= eps]
+        count = len(self.triangle_list) - len(kept_list)
+        if count > 0:
+            self.triangle_list[:] = kept_list
+            self.invalidate_caches()
         return count
     
     def normalize(self, eps=1e-7):
@@ -464,59 +726,172 @@ class TriangleMesh(object):
         # it is enough to normalize the mesh, and 2) it may significantly reduce the size of the mesh.
         self.reduce(eps=eps)
 
-        min_area = {'area': 1e-7}
+        # Splitting a triangle never adds a vertex, so whether a triangle needs splitting never changes.
+        # We can therefore look at each triangle just once, and at each of the two halves of any triangle we
+        # split.  Triangles are taken first-in, first-out, and the halves appended, which gives the same list
+        # as repeatedly splitting the first triangle needing it.  A spatial hash of the vertices limits the
+        # search for vertices on an edge to those near its bounding box.
+        from collections import deque
+        
+        edge_length_list = [(self.vertex_list[triple[i]] - self.vertex_list[triple[(i + 1) % 3]]).length() for triple in self.triangle_list for i in range(3)]
+        cell_size = max(sum(edge_length_list) / float(len(edge_length_list)), eps) if len(edge_length_list) > 0 else 1.0
+        spatial_hash = SpatialHash(cell_size)
+        spatial_hash.add_point_list(self.vertex_list)
 
-        def split_triangle(min_area):
-            for triple in self.triangle_list:
-                triangle = self.make_triangle(triple)
-                for i in range(3):
-                    edge = LineSegment(point_a=triangle[i], point_b=triangle[i + 1])
-                    for j, vertex in enumerate(self.vertex_list):
-                        if (vertex - edge.point_a).length() < eps:
-                            continue
-                        if (vertex - edge.point_b).length() < eps:
-                            continue
-                        if not edge.contains_point(vertex, eps=eps):
-                            continue
-                        self.triangle_list.remove(triple)
-                        self.triangle_list.append((j, triple[(i + 2) % 3], triple[i]))
-                        self.triangle_list.append((j, triple[(i + 1) % 3], triple[(i + 2) % 3]))
-                        min_area['area'] = min(self.make_triangle(self.triangle_list[-2]).area(), min_area['area'])
-                        min_area['area'] = min(self.make_triangle(self.triangle_list[-1]).area(), min_area['area'])
-                        return True
-
-        while self.remove_degenerate_triangles(eps=min_area['area']) > 0 or split_triangle(min_area):
-            pass
+        def find_split(triple):
+            triangle = self.make_triangle(triple, copy=False)
+            for i in range(3):
+                edge = LineSegment(point_a=triangle[i], point_b=triangle[i + 1], copy=False)
+                # The edge contains points within eps of its line, and up to eps times its length past its ends.
+                reach = eps * (1.0 + max(1.0, edge.length()))
+                min_point = Vector(min(edge.point_a.x, edge.point_b.x) - reach, min(edge.point_a.y, edge.point_b.y) - reach, min(edge.point_a.z, edge.point_b.z) - reach)
+                max_point = Vector(max(edge.point_a.x, edge.point_b.x) + reach, max(edge.point_a.y, edge.point_b.y) + reach, max(edge.point_a.z, edge.point_b.z) + reach)
+                for j in sorted(spatial_hash.find_points_in_box(min_point, max_point)):
+                    vertex = self.vertex_list[j]
+                    if (vertex - edge.point_a).length() < eps:
+                        continue
+                    if (vertex - edge.point_b).length() < eps:
+                        continue
+                    if not edge.contains_point(vertex, eps=eps):
+                        continue
+                    return i, j
+            return None
+
+        triangle_list = []
+        queue = deque(self.triangle_list)
+        while len(queue) > 0:
+            triple = queue.popleft()
+            split = find_split(triple)
+            if split is None:
+                triangle_list.append(triple)
+            else:
+                i, j = split
+                queue.append((j, triple[(i + 2) % 3], triple[i]))
+                queue.append((j, triple[(i + 1) % 3], triple[(i + 2) % 3]))
+        self.triangle_list[:] = triangle_list
+        self.invalidate_caches()
     
     def reduce(self, eps=1e-7):
-        def merge_triangles():
-            for triangle_a in self.triangle_list:
-                for triangle_b in self.triangle_list:
-                    if triangle_a is triangle_b:
-                        continue
-                    for i in range(3):
-                        for j in range(3):
-                            if triangle_a[(i + 1) % 3] == triangle_b[(j + 2) % 3] and triangle_a[(i + 2) % 3] == triangle_b[(j + 1) % 3]:
-                                vector_a = self.vertex_list[triangle_a[i]] - self.vertex_list[triangle_a[(i + 2) % 3]]
-                                vector_b = self.vertex_list[triangle_b[j]] - self.vertex_list[triangle_b[(j + 1) % 3]]
-                                if math.fabs(vector_a.angle_between(vector_b) - math.pi) < eps:
-                                    self.triangle_list.remove(triangle_a)
-                                    self.triangle_list.remove(triangle_b)
-                                    self.triangle_list.append((triangle_a[i], triangle_a[(i + 1) % 3], triangle_b[j]))
-                                    return True
-                                vector_a = self.vertex_list[triangle_a[i]] - self.vertex_list[triangle_a[(i + 1) % 3]]
-                                vector_b = self.vertex_list[triangle_b[j]] - self.vertex_list[triangle_b[(j + 2) % 3]]
-                                if math.fabs(vector_a.angle_between(vector_b) - math.pi) < eps:
-                                    self.triangle_list.remove(triangle_a)
-                                    self.triangle_list.remove(triangle_b)
-                                    self.triangle_list.append((triangle_b[j], triangle_b[(j + 1) % 3], triangle_a[i]))
-                                    return True
-        
-        while self.remove_degenerate_triangles() > 0 or merge_triangles():
-            pass
-        
+        # Two triangles sharing an edge are merged into one if together they form a triangle, which happens when
+        # one end of the shared edge lies on the line between the vertices opposite the edge.  This gives the same
+        # result as repeatedly making the first merge found in the triangle list (taking the merged triangle to
+        # the end of the list.)  Triangles are kept by a serial number that gives their place in that list, and
+        # indexed by their directed edges.  A heap holds the serial numbers of every triangle that may have
+        # a partner to merge with, and the first of these that does is merged.  Only then can a triangle gain a
+        # partner, and only by being adjacent to the merged triangle, so those are the triangles we add to the heap.
+        import heapq
+
+        self.remove_degenerate_triangles()
+
+        triangle_map = {}
+        edge_map = {}
+        serial_counter = itertools.count()
+
+        def add_triangle(triple):
+            serial = next(serial_counter)
+            triangle_map[serial] = triple
+            for i in range(3):
+                edge_map.setdefault((triple[i], triple[(i + 1) % 3]), set()).add(serial)
+            return serial
+
+        def remove_triangle(serial):
+            triple = triangle_map.pop(serial)
+            for i in range(3):
+                edge = (triple[i], triple[(i + 1) % 3])
+                edge_map[edge].discard(serial)
+                if len(edge_map[edge]) == 0:
+                    del edge_map[edge]
+
+        def find_adjacent(triple):
+            serial_set = set()
+            for i in range(3):
+                serial_set |= edge_map.get((triple[(i + 1) % 3], triple[i]), set())
+            return serial_set
+
+        def find_merge(serial_a):
+            triangle_a = triangle_map[serial_a]
+            for serial_b in sorted(find_adjacent(triangle_a)):
+                if serial_b == serial_a:
+                    continue
+                triangle_b = triangle_map[serial_b]
+                for i in range(3):
+                    for j in range(3):
+                        if triangle_a[(i + 1) % 3] == triangle_b[(j + 2) % 3] and triangle_a[(i + 2) % 3] == triangle_b[(j + 1) % 3]:
+                            vector_a = self.vertex_list[triangle_a[i]] - self.vertex_list[triangle_a[(i + 2) % 3]]
+                            vector_b = self.vertex_list[triangle_b[j]] - self.vertex_list[triangle_b[(j + 1) % 3]]
+                            if math.fabs(vector_a.angle_between(vector_b) - math.pi) < eps:
+                                return serial_b, (triangle_a[i], triangle_a[(i + 1) % 3], triangle_b[j])
+                            vector_a = self.vertex_list[triangle_a[i]] - self.vertex_list[triangle_a[(i + 1) % 3]]
+                            vector_b = self.vertex_list[triangle_b[j]] - self.vertex_list[triangle_b[(j + 2) % 3]]
+                            if math.fabs(vector_a.angle_between(vector_b) - math.pi) < eps:
+                                return serial_b, (triangle_b[j], triangle_b[(j + 1) % 3], triangle_a[i])
+            return None
+
+        heap = [add_triangle(triple) for triple in self.triangle_list]
+        heapq.heapify(heap)
+        while len(heap) > 0:
+            serial_a = heapq.heappop(heap)
+            if serial_a not in triangle_map:
+                continue
+            merge = find_merge(serial_a)
+            if merge is None:
+                continue
+            serial_b, triple = merge
+            remove_triangle(serial_a)
+            remove_triangle(serial_b)
+            serial = add_triangle(triple)
+            heapq.heappush(heap, serial)
+            for adjacent_serial in find_adjacent(triple):
+                heapq.heappush(heap, adjacent_serial)
+
+        self.triangle_list[:] = [triangle_map[serial] for serial in sorted(triangle_map)]
+        self.invalidate_caches()
         self.remove_unused_vertices()
     
     def remove_unused_vertices(self):
         triangle_list = self.to_triangle_list()
-        self.from_triangle_list(triangle_list)
\ No newline at end of file
+        self.from_triangle_list(triangle_list)
+
+@functools.lru_cache(maxsize=None)
+def make_polyhedron_arrays(polyhedron):
+    # Return read-only vertex and index arrays (see TriangleMesh.to_arrays) for the given polyhedron.  Each shape is
+    # the convex hull of a fixed set of points, so we find it on first use and keep it.
+    # Every mesh made from these gets its own vertices and triangles, so changing one never changes the others.
+    from math3d_point_cloud import PointCloud
+    point_cloud = PointCloud()
+    
+    phi = (1.0 + 5.0 ** 0.5) / 2.0
+    
+    if polyhedron == Polyhedron.TETRAHEDRON:
+        point_cloud.point_list = [point for point in Vector(1.0, 0.0, -1.0 / math.sqrt(2.0)).sign_permute(True, False, False)]
+        point_cloud.point_list += [point for point in Vector(0.0, 1.0, 1.0 / math.sqrt(2.0)).sign_permute(False, True, False)]
+    elif polyhedron == Polyhedron.HEXAHEDRON:
+        point_cloud.point_list = [point for point in Vector(1.0, 1.0, 1.0).sign_permute()]
+    elif polyhedron == Polyhedron.ICOSAHEDRON:
+        point_cloud.point_list = [point for point in Vector(0.0, 1.0, phi).sign_permute(False, True, True)]
+        point_cloud.point_list += [point for point in Vector(phi, 0.0, 1.0).sign_permute(True, False, True)]
+        point_cloud.point_list += [point for point in Vector(1.0, phi, 0.0).sign_permute(True, True, False)]
+    elif polyhedron == Polyhedron.DODECAHEDRON:
+        point_cloud.point_list = [point for point in Vector(1.0, 1.0, 1.0).sign_permute()]
+        point_cloud.point_list += [point for point in Vector(0.0, phi, 1.0 / phi).sign_permute(False, True, True)]
+        point_cloud.point_list += [point for point in Vector(1.0 / phi, 0.0, phi).sign_permute(True, False, True)]
+        point_cloud.point_list += [point for point in Vector(phi, 1.0 / phi, 0.0).sign_permute(True, True, False)]
+    elif polyhedron == Polyhedron.ICOSIDODECAHEDRON:
+        point_cloud.point_list = [point for point in Vector(phi, 0.0, 0.0).sign_permute(True, False, False)]
+        point_cloud.point_list += [point for point in Vector(0.0, phi, 0.0).sign_permute(False, True, False)]
+        point_cloud.point_list += [point for point in Vector(0.0, 0.0, phi).sign_permute(False, False, True)]
+        point_cloud.point_list += [point for point in Vector(0.5, phi / 2.0, phi * phi / 2.0).sign_permute()]
+        point_cloud.point_list += [point for point in Vector(phi * phi / 2.0, 0.5, phi / 2.0).sign_permute()]
+        point_cloud.point_list += [point for point in Vector(phi / 2.0, phi * phi / 2.0, 0.5).sign_permute()]
+    elif polyhedron == Polyhedron.TRUNCATED_TETRAHEDRON:
+        point_cloud.point_list = [Vector(3.0, 1.0, 1.0), Vector(-3.0, -1.0, 1.0), Vector(-3.0, 1.0, -1.0), Vector(3.0, -1.0, -1.0)]
+        point_cloud.point_list += [Vector(1.0, 3.0, 1.0), Vector(-1.0, -3.0, 1.0), Vector(-1.0, 3.0, -1.0), Vector(1.0, -3.0, -1.0)]
+        point_cloud.point_list += [Vector(1.0, 1.0, 3.0), Vector(-1.0, -1.0, 3.0), Vector(-1.0, 1.0, -3.0), Vector(1.0, -1.0, -3.0)]
+    elif polyhedron == Polyhedron.TRUNCATED_OCTAHEDRON:
+        for x, y, z in itertools.permutations([0.0, 1.0, 2.0]):
+            point_cloud.point_list += [point for point in Vector(x, y, z).sign_permute(x != 0.0, y != 0.0, z != 0.0)]
+
+    vertex_array, index_array = point_cloud.find_convex_hull().to_arrays()
+    vertex_array.setflags(write=False)
+    index_array.setflags(write=False)
+    return vertex_array, index_array
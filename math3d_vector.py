@@ -4,6 +4,8 @@ import math
 import random
 
 class Vector(object):
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x=0.0, y=0.0, z=0.0):
         self.x = x
         self.y = y
@@ -43,6 +45,46 @@ class Vector(object):
     def __rmul__(self, other):
         return self.__mul__(other)
 
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __imul__(self, other):
+        if isinstance(other, float):
+            self.x *= other
+            self.y *= other
+            self.z *= other
+        elif isinstance(other, Vector):
+            self.x *= other.x
+            self.y *= other.y
+            self.z *= other.z
+        else:
+            return NotImplemented
+        return self
+
+    def add_scaled(self, other, scale):
+        # This is self += other * scale, but without the temporary vector.
+        self.x += other.x * scale
+        self.y += other.y * scale
+        self.z += other.z * scale
+        return self
+
+    def make_lerp(self, point_a, point_b, alpha):
+        # Become the point that LineSegment(point_a, point_b).lerp(alpha) would return.
+        beta = 1.0 - alpha
+        self.x = point_a.x * beta + point_b.x * alpha
+        self.y = point_a.y * beta + point_b.y * alpha
+        self.z = point_a.z * beta + point_b.z * alpha
+        return self
+
     def __truediv__(self, other):
         if isinstance(other, float):
             return Vector(self.x / other, self.y / other, self.z / other)
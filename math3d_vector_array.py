@@ -0,0 +1,147 @@
+# math3d_vector_array.py
+
+import itertools
+import numbers
+import numpy
+
+from math3d_vector import Vector
+
+class VectorArray(object):
+    # An N x 3 array of vectors kept in a single contiguous buffer of floats.
+    # The methods here mirror those of the Vector class, but each one operates
+    # on every vector of the array at once.  Where a method of Vector takes another
+    # vector, the method here accepts either a single Vector (applied to every
+    # row) or another VectorArray of the same length (applied row by row.)
+
+    def __init__(self, array=None, copy=False):
+        if array is None:
+            array = numpy.zeros((0, 3), dtype=numpy.float64)
+        elif isinstance(array, VectorArray):
+            array = array.array
+        array = numpy.ascontiguousarray(array, dtype=numpy.float64).reshape(-1, 3)
+        self.array = array.copy() if copy else array
+
+    def clone(self):
+        return VectorArray(self.array, copy=True)
+
+    @staticmethod
+    def zeros(count):
+        return VectorArray(numpy.zeros((count, 3), dtype=numpy.float64))
+
+    def from_vector_list(self, vector_list):
+        count = len(vector_list)
+        coordinates = itertools.chain.from_iterable((vector.x, vector.y, vector.z) for vector in vector_list)
+        self.array = numpy.fromiter(coordinates, dtype=numpy.float64, count=3 * count).reshape(count, 3)
+        return self
+
+    def to_vector_list(self):
+        return [Vector(x, y, z) for x, y, z in self.array.tolist()]
+
+    def __len__(self):
+        return self.array.shape[0]
+
+    def __iter__(self):
+        for x, y, z in self.array.tolist():
+            yield Vector(x, y, z)
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, numpy.integer)):
+            x, y, z = self.array[i].tolist()
+            return Vector(x, y, z)
+        return VectorArray(self.array[i])
+
+    def __setitem__(self, i, vector):
+        if isinstance(vector, Vector):
+            self.array[i] = (vector.x, vector.y, vector.z)
+        elif isinstance(vector, VectorArray):
+            self.array[i] = vector.array
+        else:
+            self.array[i] = vector
+
+    @staticmethod
+    def _operand(other):
+        # Reduce the given operand to something numpy can broadcast against an N x 3 array.
+        if isinstance(other, VectorArray):
+            return other.array
+        if isinstance(other, Vector):
+            return numpy.array([other.x, other.y, other.z], dtype=numpy.float64)
+        if isinstance(other, numpy.ndarray) and other.ndim == 1:
+            return other[:, numpy.newaxis]  # One scalar per row.
+        return other
+
+    def __neg__(self):
+        return VectorArray(-self.array)
+
+    def __add__(self, other):
+        return VectorArray(self.array + self._operand(other))
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        return VectorArray(self.array - self._operand(other))
+
+    def __rsub__(self, other):
+        return VectorArray(self._operand(other) - self.array)
+
+    def __mul__(self, other):
+        if not isinstance(other, (VectorArray, Vector, numpy.ndarray, numbers.Number)):
+            return NotImplemented
+        return VectorArray(self.array * self._operand(other))
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        return VectorArray(self.array / self._operand(other))
+
+    def dot(self, other):
+        if isinstance(other, Vector):
+            return self.array @ self._operand(other)
+        return numpy.einsum('ij,ij->i', self.array, self._operand(other))
+
+    def cross(self, other):
+        return VectorArray(numpy.cross(self.array, self._operand(other)))
+
+    def length(self):
+        return numpy.sqrt(numpy.einsum('ij,ij->i', self.array, self.array))
+
+    def normalized(self):
+        # Unlike Vector.normalized, a zero-length vector can't be reported as None here,
+        # so any such rows are left as zero vectors.
+        length = self.length()
+        scale = numpy.divide(1.0, length, out=numpy.zeros_like(length), where=length != 0.0)
+        return VectorArray(self.array * scale[:, numpy.newaxis])
+
+    def resized(self, length):
+        return self.normalized() * length
+
+    def scaled(self, scale):
+        return self * scale
+
+    def projected(self, unit_normal):
+        return VectorArray(self._operand(unit_normal) * self.dot(unit_normal)[:, numpy.newaxis])
+
+    def rejected(self, unit_normal):
+        return self - self.projected(unit_normal)
+
+    def angle_between(self, other):
+        dot = self.normalized().dot(other.normalized())
+        return numpy.arccos(numpy.clip(dot, -1.0, 1.0))
+
+    def rotated(self, unit_axis, angle):
+        # This is Rodrigues' rotation formula, which agrees with Vector.rotated.
+        # The angle may be given per row as an array.
+        cos_angle = self._operand(numpy.cos(angle))
+        sin_angle = self._operand(numpy.sin(angle))
+        axis = self._operand(unit_axis)
+        projection = self.projected(unit_axis).array
+        rejection = self.array - projection
+        return VectorArray(projection + rejection * cos_angle + numpy.cross(axis, self.array) * sin_angle)
+
+    def calc_center(self):
+        x, y, z = self.array.mean(axis=0).tolist()
+        return Vector(x, y, z)
+
+    def __str__(self):
+        return '\n'.join(['(%f, %f, %f)' % (x, y, z) for x, y, z in self.array.tolist()])